@@ -0,0 +1,55 @@
+"""bench_compact_frames.py: Compares memory use and set grouping times of object and compact Colorshot frames.
+
+Run from the repository root with `python -m benchmarks.bench_compact_frames`.
+"""
+
+## Imports
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from data_helpers import mark_standards, mark_shade_names, get_groups, split_sets
+from schema import CompactSchema
+
+
+def make_data(row_count: int,
+              seed: int = 0):
+    """Makes marked Colorshot rows spread over a year of days, a few hundred shades, and a few dozen files."""
+    rng = np.random.default_rng(seed)
+    shades = rng.integers(0, 300, row_count)
+    data = pd.DataFrame({
+        "Date":pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, row_count), unit="s"),
+        "Name":[f"Gaiav2Shade{shade}{'STD' if standard else ''}"
+                for shade, standard in zip(shades, rng.random(row_count) < 0.2)],
+        "Nuance":[f"{shade % 9 + 1}.{shade % 7}" for shade in shades],
+        "Formula number":[f"F{number}" for number in rng.integers(0, 2000, row_count)],
+        "Fiber":rng.choice(["BN", "BP"], row_count),
+        "L*":rng.uniform(10, 80, row_count).round(2),
+        "a*":rng.uniform(-10, 30, row_count).round(2),
+        "b*":rng.uniform(-10, 30, row_count).round(2),
+        "File Path":[f"//share/colorshot/2022/data file {number}.xlsx" for number in rng.integers(0, 40, row_count)]})
+    return mark_shade_names(mark_standards(data))
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(row_counts=(10000, 100000)):
+    print(f"{'rows':>8} {'object (MB)':>12} {'compact (MB)':>13} {'object groups (s)':>18} {'compact groups (s)':>19}")
+    for row_count in row_counts:
+        data = make_data(row_count)
+        compact = CompactSchema.from_frame(data).apply(data)
+        object_time, expected = time_call(lambda frame: (get_groups(frame), split_sets(frame)), data)
+        compact_time, actual = time_call(lambda frame: (get_groups(frame), split_sets(frame)), compact)
+        pd.testing.assert_frame_equal(actual[0].astype(object), expected[0].astype(object))
+        object_size = data.memory_usage(deep=True).sum() / 1024**2
+        compact_size = compact.memory_usage(deep=True).sum() / 1024**2
+        print(f"{row_count:>8} {object_size:>12.1f} {compact_size:>13.1f} {object_time:>18.3f} {compact_time:>19.3f}")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (10000, 100000))
@@ -0,0 +1,57 @@
+"""bench_readers.py: Times every installed spreadsheet reader on a generated Colorshot workbook.
+
+Run from the repository root with `python -m benchmarks.bench_readers [rows ...]`.
+"""
+
+## Imports
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from readers import READERS, available_readers
+
+
+def write_workbook(path: str,
+                   row_count: int,
+                   seed: int = 0):
+    """Writes a "Plan" sheet shaped like a Colorshot instrument export."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2022-05-02") + pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, row_count), unit="s")
+    pd.DataFrame({"Date":dates.strftime("%Y%m%d-%H%M%S"),
+                  "User":"user",
+                  "Study":"study",
+                  "Name":[f"Gaiav2Shade{shade}" for shade in rng.integers(0, 300, row_count)],
+                  "Nuance":rng.integers(1, 9, row_count) + rng.integers(0, 9, row_count) / 10,
+                  "Formula number":[f"F{number}" for number in rng.integers(0, 2000, row_count)],
+                  "Fiber":rng.choice(["BN", "BP"], row_count),
+                  "L*":rng.uniform(10, 80, row_count).round(2),
+                  "a*":rng.uniform(-10, 30, row_count).round(2),
+                  "b*":rng.uniform(-10, 30, row_count).round(2),
+                  "C":rng.uniform(0, 40, row_count).round(2),
+                  "h°":rng.uniform(0, 360, row_count).round(2)}).to_excel(path, sheet_name="Plan", index=False)
+
+
+def main(row_counts=(5000, 20000)):
+    readers = available_readers()
+    print(f"{'rows':>8} " + " ".join(f"{name + ' (s)':>14}" for name in readers))
+    with tempfile.TemporaryDirectory() as directory:
+        for row_count in row_counts:
+            path = os.path.join(directory, f"bench {row_count}.xlsx")
+            write_workbook(path, row_count)
+            times = []
+            expected = None
+            for name in readers:
+                start = time.perf_counter()
+                actual = READERS[name](path, "Plan")
+                times.append(time.perf_counter() - start)
+                if expected is None:
+                    expected = actual
+                pd.testing.assert_frame_equal(actual, expected)
+            print(f"{row_count:>8} " + " ".join(f"{seconds:>14.3f}" for seconds in times))
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (5000, 20000))
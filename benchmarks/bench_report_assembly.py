@@ -0,0 +1,69 @@
+"""bench_report_assembly.py: Compares per-row report assembly with the columnar ReportBuilder.
+
+Run from the repository root with `python -m benchmarks.bench_report_assembly`.
+"""
+
+## Imports
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from data_helpers import ReportBuilder, report_comparison
+
+
+def make_sets(set_count: int,
+              comparisons_per_set: int = 4,
+              seed: int = 0):
+    """Makes (standard, comparisons) pairs shaped like the output of `process_set`."""
+    rng = np.random.default_rng(seed)
+    rows_per_set = comparisons_per_set + 1
+    count = set_count * rows_per_set
+    data = pd.DataFrame({
+        "Date":pd.Timestamp("2022-05-04") + pd.to_timedelta(np.arange(count) // rows_per_set, unit="D"),
+        "Name":[f"Shade{index // rows_per_set}" for index in range(count)],
+        "Nuance":[f"{index // rows_per_set % 9}A" for index in range(count)],
+        "Formula number":[f"F{index}" for index in range(count)],
+        "Fiber":"BP",
+        "L*":rng.uniform(10, 80, count),
+        "a*":rng.uniform(-10, 30, count),
+        "b*":rng.uniform(-10, 30, count),
+        "File Path":"./bench.xlsx"})
+    return [(data.iloc[start:start+1], data.iloc[start+1:start+rows_per_set])
+            for start in range(0, count, rows_per_set)]
+
+
+def per_row_report(sets):
+    """The previous approach: one single-row dataframe per comparison, concatenated at the end."""
+    rows = []
+    for standard, comparisons in sets:
+        for index in range(comparisons.shape[0]):
+            rows.append(report_comparison(standard, comparisons.iloc[index:index+1]))
+    return pd.concat(rows, ignore_index=True)
+
+
+def columnar_report(sets):
+    report = ReportBuilder()
+    for standard, comparisons in sets:
+        report.add_set(standard, comparisons)
+    return report.to_frame()
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(set_counts=(100, 1000)):
+    print(f"{'sets':>8} {'rows':>8} {'per-row (s)':>12} {'columnar (s)':>13} {'speedup':>8}")
+    for set_count in set_counts:
+        sets = make_sets(set_count)
+        per_row_time, expected = time_call(per_row_report, sets)
+        columnar_time, actual = time_call(columnar_report, sets)
+        pd.testing.assert_frame_equal(actual, expected)
+        print(f"{set_count:>8} {actual.shape[0]:>8} {per_row_time:>12.3f} {columnar_time:>13.3f} {per_row_time/columnar_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (100, 1000))
@@ -0,0 +1,53 @@
+"""bench_standard_tagging.py: Compares per-row standard tagging and shade name extraction with the vectorized versions.
+
+Run from the repository root with `python -m benchmarks.bench_standard_tagging`.
+"""
+
+## Imports
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from data_helpers import find_standard, extract_shade_name, mark_standards, mark_shade_names
+
+
+def make_names(row_count: int,
+               shade_count: int = 500,
+               seed: int = 0):
+    """Makes a "Name" column where every shade is measured many times and about one in five rows is a standard."""
+    rng = np.random.default_rng(seed)
+    shades = rng.integers(0, shade_count, row_count)
+    tags = np.where(rng.random(row_count) < 0.2, "STD", "")
+    return pd.DataFrame({"Name":[f"Gaiav2Shade{shade}{tag}" for shade, tag in zip(shades, tags)]})
+
+
+def per_row_tagging(data: pd.DataFrame):
+    """The previous approach: `Series.apply` over every row."""
+    data["STD"] = data["Name"].apply(find_standard)
+    data["ShadeName"] = data["Name"].apply(extract_shade_name)
+    return data
+
+
+def vectorized_tagging(data: pd.DataFrame):
+    return mark_shade_names(mark_standards(data))
+
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(row_counts=(10000, 100000)):
+    print(f"{'rows':>8} {'per-row (s)':>12} {'vectorized (s)':>15} {'speedup':>8}")
+    for row_count in row_counts:
+        names = make_names(row_count)
+        per_row_time, expected = time_call(per_row_tagging, names.copy())
+        vectorized_time, actual = time_call(vectorized_tagging, names.copy())
+        pd.testing.assert_frame_equal(actual, expected)
+        print(f"{row_count:>8} {per_row_time:>12.3f} {vectorized_time:>15.3f} {per_row_time/vectorized_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (10000, 100000))
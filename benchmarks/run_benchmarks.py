@@ -0,0 +1,242 @@
+"""run_benchmarks.py: Times the data_helpers functions and the whole driver on synthetic data of several sizes.
+
+Run from the repository root with `python -m benchmarks.run_benchmarks`. Pass `--update-baseline` to store the
+timings as the baseline later runs are checked against; a benchmark slower than its baseline by more than the
+tolerance, or a missing baseline, makes the run exit with an error.
+"""
+
+## Imports
+import io
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import pandas as pd
+
+import driver
+from data_helpers import (get_data,
+                          get_missing_rows,
+                          row_fingerprints,
+                          mark_standards,
+                          mark_shade_names,
+                          get_groups,
+                          split_sets,
+                          process_sets,
+                          calculate_colorimetry_batch,
+                          write_report,
+                          write_used_data,
+                          write_bad_comparisons,
+                          LAB_COLUMNS)
+from benchmarks.synthetic import make_plan_rows, write_plan_files, as_read_data
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+
+def time_call(function,
+              setup,
+              repeat: int):
+    """Returns the best time of repeat calls of function. setup makes fresh arguments for each call, untimed."""
+    best = math.inf
+    for _ in range(repeat):
+        args = setup()
+        with contextlib.redirect_stdout(io.StringIO()):  # Progress bars and messages
+            start = time.perf_counter()
+            function(*args)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def in_memory_benchmarks(plan: pd.DataFrame,
+                         directory: str):
+    """Returns (name, function, setup) for every benchmark that runs on in-memory frames."""
+    data = as_read_data(plan)
+    marked = mark_shade_names(mark_standards(data.copy()))
+    sets = get_groups(marked)
+    with contextlib.redirect_stdout(io.StringIO()):
+        used_rows, report, bad_comparisons = process_sets(sets, marked)
+    used = pd.concat(used_rows + [marked.iloc[:0]], ignore_index=True)
+    bad = pd.concat(bad_comparisons + [marked.iloc[:0]], ignore_index=True)
+    lab = data[LAB_COLUMNS].to_numpy()
+    half = data.sample(frac=0.5, random_state=0)
+    return [("row_fingerprints", row_fingerprints, lambda: (data,)),
+            ("get_missing_rows", get_missing_rows, lambda: (data, half)),
+            ("mark_standards", mark_standards, lambda: (data.copy(),)),
+            ("mark_shade_names", mark_shade_names, lambda: (data.copy(),)),
+            ("get_groups", get_groups, lambda: (marked,)),
+            ("split_sets", split_sets, lambda: (marked,)),
+            ("process_sets", process_sets, lambda: (sets, marked)),
+            ("calculate_colorimetry_batch", calculate_colorimetry_batch, lambda: (lab, lab[::-1])),
+            ("write_report", write_report, lambda: (report, os.path.join(directory, "report.xlsx"))),
+            ("write_used_data", write_used_data, lambda: (used, os.path.join(directory, "used_data.xlsx"))),
+            ("write_bad_comparisons", write_bad_comparisons, lambda: (bad, os.path.join(directory, "bad.xlsx")))]
+
+
+def run_driver(bundle_dir: str,
+               file_paths: list):
+    """Runs the driver on the data files from an empty output folder."""
+    shutil.rmtree(os.path.join(bundle_dir, "Output"), ignore_errors=True)
+    with open(os.path.join(bundle_dir, "data_filepaths.confidential"), "w") as file:
+        file.write("\n".join(file_paths))
+    driver.driver(bundle_dir=bundle_dir, use_cache=False)
+
+
+def file_benchmarks(plan: pd.DataFrame,
+                    directory: str):
+    """Returns (name, function, setup) for the benchmarks that read data files."""
+    file_paths = write_plan_files(plan, os.path.join(directory, "data"))
+    bundle_dir = os.path.join(directory, "bundle")
+    os.makedirs(bundle_dir, exist_ok=True)
+    return [("get_data", get_data, lambda: (file_paths,)),
+            ("driver", run_driver, lambda: (bundle_dir, file_paths))]
+
+
+def run(sizes: list,
+        repeat: int = 3,
+        file_max_rows: int = 100000,
+        only: list = None,
+        seed: int = 0):
+    """Runs every benchmark at every size.
+
+    Args:
+        sizes (list): Row counts to run at.
+        repeat (int, optional): Calls per benchmark, keeping the fastest. Defaults to 3.
+        file_max_rows (int, optional): Largest size the benchmarks that write and read xlsx files run at.
+            Defaults to 100000.
+        only (list, optional): Names of the benchmarks to run. Defaults to None, running all of them.
+        seed (int, optional): Seed of the synthetic data. Defaults to 0.
+
+    Returns:
+        dict: Maps each benchmark name to {rows: seconds}.
+    """
+    results = {}
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)  # The driver makes its backups relative to the working directory
+        try:
+            for size in sizes:
+                plan = make_plan_rows(size, seed=seed)
+                benchmarks = in_memory_benchmarks(plan, directory)
+                if size <= file_max_rows:
+                    benchmarks += file_benchmarks(plan, directory)
+                for name, function, setup in benchmarks:
+                    if only and name not in only:
+                        continue
+                    seconds = time_call(function, setup, 1 if name == "driver" else repeat)
+                    results.setdefault(name, {})[str(size)] = seconds
+                    print(f"{name:<28} {size:>9} rows {seconds:>10.4f} s {seconds / size * 1e6:>9.2f} us/row", flush=True)
+        finally:
+            os.chdir(working_directory)
+    return results
+
+
+def scaling_report(results: dict):
+    """Prints how each benchmark scales: the exponent k in time ~ rows^k between consecutive sizes."""
+    print("\nScaling (time ~ rows^k between consecutive sizes, k = 1 is linear)")
+    for name, timings in results.items():
+        points = sorted((int(rows), seconds) for rows, seconds in timings.items())
+        exponents = [f"{rows_1}->{rows_2}: k={math.log(seconds_2 / seconds_1) / math.log(rows_2 / rows_1):.2f}"
+                     for (rows_1, seconds_1), (rows_2, seconds_2) in zip(points, points[1:])
+                     if seconds_1 > 0 and seconds_2 > 0]
+        print(f"{name:<28} {'  '.join(exponents) if exponents else '(one size)'}")
+
+
+def machine():
+    return {"platform":platform.platform(), "processor":platform.processor(), "python":platform.python_version()}
+
+
+def check_baseline(results: dict,
+                   baseline: dict,
+                   tolerance: float,
+                   minimum_seconds: float):
+    """Finds benchmarks slower than their baseline by more than the tolerance.
+
+    Args:
+        results (dict): Timings of this run.
+        baseline (dict): Stored baseline with "timings" in the same layout as results.
+        tolerance (float): Allowed slowdown as a ratio, _e.g._ 1.5 for 50% slower.
+        minimum_seconds (float): Slowdowns smaller than this many seconds are ignored as noise.
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    regressions = []
+    for name, timings in results.items():
+        for rows, seconds in timings.items():
+            expected = baseline["timings"].get(name, {}).get(rows)
+            if expected is None:
+                continue
+            if seconds > expected * tolerance and seconds - expected > minimum_seconds:
+                regressions.append(f"{name} at {rows} rows: {seconds:.4f} s vs baseline {expected:.4f} s "
+                                   f"({seconds / expected:.2f}x)")
+    return regressions
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmarks the Colorshot pipeline on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000],
+                        help="Row counts to run at (default: 1000 100000). Add 1000000 for the full suite.")
+    parser.add_argument("--repeat", type=int, default=3, help="Calls per benchmark, keeping the fastest (default: 3).")
+    parser.add_argument("--file-max-rows", type=int, default=100000,
+                        help="Largest size the xlsx reading and driver benchmarks run at (default: 100000).")
+    parser.add_argument("--only", nargs="+", help="Names of the benchmarks to run.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline file to check against or update.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run's timings as the baseline.")
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Allowed slowdown against the baseline as a ratio (default: 1.5).")
+    parser.add_argument("--minimum-seconds", type=float, default=0.05,
+                        help="Slowdowns smaller than this are ignored as noise (default: 0.05).")
+    parser.add_argument("--output", help="Also write this run's timings to a JSON file.")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.file_max_rows, args.only)
+    scaling_report(results)
+    run_record = {"machine":machine(), "timings":results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(run_record, file, indent=2)
+
+    if args.update_baseline:
+        baseline = {"machine":machine(), "timings":{}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        for name, timings in results.items():
+            baseline["timings"].setdefault(name, {}).update(timings)
+        baseline["machine"] = machine()
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2)
+        print(f"\nBaseline updated in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, so slowdowns cannot be checked. Run with --update-baseline on "
+              f"this machine to store one.")
+        return 1
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("machine") != machine():
+        print("\nWarning: the baseline was recorded on a different machine, timings may not be comparable.")
+    regressions = check_baseline(results, baseline, args.tolerance, args.minimum_seconds)
+    unchecked = [f"{name} at {rows} rows" for name, timings in results.items() for rows in timings
+                 if baseline["timings"].get(name, {}).get(rows) is None]
+    if regressions:
+        print("\n" + "!" * 80)
+        print(f"PERFORMANCE REGRESSION: {len(regressions)} benchmark(s) slower than the baseline")
+        for regression in regressions:
+            print(f"  {regression}")
+        print("!" * 80)
+    if unchecked:
+        print(f"\nNo baseline for {', '.join(unchecked)}. Run with --update-baseline to store one.")
+    if regressions or unchecked:
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
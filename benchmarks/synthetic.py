@@ -0,0 +1,154 @@
+"""synthetic.py: Seeded generator of realistic Colorshot "Plan" sheets for benchmarks.
+
+Sets are laid out like real measurement sessions: a standard followed by its comparisons, measured a few seconds
+apart on one nuance and hair type. Some sets are re-measured (duplicates) and some are malformed the ways
+`process_set` rejects: no standard, several standards, or a single data point.
+"""
+
+## Imports
+import os
+import math
+import numpy as np
+import pandas as pd
+
+PLAN_COLUMNS = ["Date", "User", "Study", "Name", "Nuance", "Formula number", "Fiber", "L*", "a*", "b*", "C", "h°"]
+NUANCES = [f"{level}{reflect}" for level in range(1, 11) for reflect in ["A", "B", "C", "G", "N", "R", "V"]]
+FIBERS = ["BN", "BP"]
+SET_KINDS = ["valid", "no standard", "multiple standards", "one datapoint"]
+
+
+def make_plan_data(days: int = 10,
+                   sets_per_day: int = 20,
+                   max_comparisons: int = 6,
+                   duplicate_rate: float = 0.1,
+                   malformed_rate: float = 0.1,
+                   start_date: str = "2022-05-02",
+                   seed: int = 0):
+    """Makes the rows of Colorshot "Plan" sheets.
+
+    Args:
+        days (int, optional): Number of measurement days. Defaults to 10.
+        sets_per_day (int, optional): Number of sets measured each day. Defaults to 20.
+        max_comparisons (int, optional): Most comparisons measured against one standard. Defaults to 6.
+        duplicate_rate (float, optional): Share of sets with one comparison measured again. Defaults to 0.1.
+        malformed_rate (float, optional): Share of sets that cannot be reported, split evenly between the ways a
+            set can be malformed. Defaults to 0.1.
+        start_date (str, optional): Day of the first measurements. Defaults to "2022-05-02".
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Rows with PLAN_COLUMNS, dates written as "%Y%m%d-%H%M%S" strings like the instrument does.
+    """
+    rng = np.random.default_rng(seed)
+    set_count = days * sets_per_day
+    malformed_share = malformed_rate / 3
+    kinds = rng.choice(len(SET_KINDS), set_count, p=[1 - malformed_rate] + [malformed_share] * 3)
+    standard_counts = np.select([kinds == 1, kinds == 2], [0, 2], default=1)
+    comparison_counts = np.where(kinds == 3, 0, rng.integers(1, max_comparisons + 1, set_count))
+    duplicated = (rng.random(set_count) < duplicate_rate) & (comparison_counts > 0)
+    set_sizes = standard_counts + comparison_counts + duplicated
+
+    # One entry per row, with the set it belongs to and its position in the set
+    set_ids = np.repeat(np.arange(set_count), set_sizes)
+    positions = np.arange(set_ids.shape[0]) - np.repeat(np.cumsum(set_sizes) - set_sizes, set_sizes)
+    is_standard = positions < standard_counts[set_ids]
+    comparison_number = positions - standard_counts[set_ids]
+    is_duplicate = duplicated[set_ids] & (positions == set_sizes[set_ids] - 1)
+    comparison_number = np.where(is_duplicate, 0, comparison_number)  # Re-measures the set's first comparison
+
+    # Sets of a day start at random times during the working day and are measured 30 seconds per point
+    set_days = np.arange(set_count) // sets_per_day
+    set_starts = (pd.Timestamp(start_date)
+                  + pd.to_timedelta(set_days, unit="D")
+                  + pd.to_timedelta(8 * 3600 + rng.integers(0, 9 * 3600, set_count), unit="s"))
+    dates = set_starts[set_ids] + pd.to_timedelta(positions * 30, unit="s")
+
+    # Sets of the same day get different nuance and hair type pairs so they are not grouped together
+    pair_count = len(NUANCES) * len(FIBERS)
+    pairs = rng.permuted(np.tile(np.arange(pair_count), (days, 1)), axis=1)
+    pairs = pairs[:, np.arange(sets_per_day) % pair_count].reshape(-1)
+    nuances = np.array(NUANCES)[pairs // len(FIBERS)]
+    fibers = np.array(FIBERS)[pairs % len(FIBERS)]
+    shade_names = [f"Gaiav2Shade{nuance}" for nuance in nuances]
+    names = [f"{shade_names[set_id]}{'v' * position}STD" if standard else f"{shade_names[set_id]}T{number}"
+             for set_id, standard, position, number in zip(set_ids, is_standard, positions, comparison_number)]
+    formula_numbers = [f"STD{nuances[set_id]}-{position}" if standard else f"F{set_id * 10 + number}"
+                       for set_id, standard, position, number in zip(set_ids, is_standard, positions, comparison_number)]
+
+    # Comparisons land close to their standard
+    standard_lab = np.column_stack([rng.uniform(15, 75, set_count),
+                                    rng.uniform(-5, 25, set_count),
+                                    rng.uniform(-5, 30, set_count)])
+    lab = standard_lab[set_ids] + np.where(is_standard[:, None], 0.0, rng.normal(0, 1.5, (set_ids.shape[0], 3)))
+    lab = lab + np.where(is_duplicate[:, None], rng.normal(0, 0.2, (set_ids.shape[0], 3)), 0.0)
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    hue = np.degrees(np.arctan2(lab[:, 2], lab[:, 1])) % 360
+
+    return pd.DataFrame({"Date":dates.strftime("%Y%m%d-%H%M%S"),
+                         "User":"colorshot",
+                         "Study":"benchmark",
+                         "Name":names,
+                         "Nuance":nuances[set_ids],
+                         "Formula number":formula_numbers,
+                         "Fiber":fibers[set_ids],
+                         "L*":lab[:, 0].round(2),
+                         "a*":lab[:, 1].round(2),
+                         "b*":lab[:, 2].round(2),
+                         "C":chroma.round(2),
+                         "h°":hue.round(2)},
+                        columns=PLAN_COLUMNS)
+
+
+def make_plan_rows(row_count: int,
+                   sets_per_day: int = 50,
+                   seed: int = 0,
+                   **options):
+    """Makes about row_count rows of "Plan" data, adding days until there are enough.
+
+    Args:
+        row_count (int): Number of rows to make.
+        sets_per_day (int, optional): Number of sets measured each day. Defaults to 50.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        **options: Other options of `make_plan_data`.
+
+    Returns:
+        pd.DataFrame: Exactly row_count rows, ending on whole sets except perhaps the last one.
+    """
+    rows_per_set = 1 + (options.get("max_comparisons", 6) + 1) / 2
+    days = max(1, math.ceil(row_count / (sets_per_day * rows_per_set) * 1.1))
+    data = make_plan_data(days=days, sets_per_day=sets_per_day, seed=seed, **options)
+    while data.shape[0] < row_count:  # Unlucky draws can come up short
+        days *= 2
+        data = make_plan_data(days=days, sets_per_day=sets_per_day, seed=seed, **options)
+    return data.iloc[:row_count].reset_index(drop=True)
+
+
+def write_plan_files(data: pd.DataFrame,
+                     directory: str,
+                     file_count: int = 4):
+    """Splits Plan rows into consecutive chunks and writes each as a data file.
+
+    Args:
+        data (pd.DataFrame): Rows from `make_plan_data` or `make_plan_rows`.
+        directory (str): Directory the files are written to. Created if missing.
+        file_count (int, optional): Number of data files. Defaults to 4.
+
+    Returns:
+        list: Paths of the data files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, chunk in enumerate(np.array_split(np.arange(data.shape[0]), file_count)):
+        path = os.path.join(directory, f"Colorshot Data {index + 1}.xlsx")
+        data.iloc[chunk].to_excel(path, sheet_name="Plan", index=False)
+        paths.append(path)
+    return paths
+
+
+def as_read_data(data: pd.DataFrame,
+                 file_path: str = "./synthetic.xlsx"):
+    """Converts Plan rows to the frame `data_helpers.get_data` returns for them, without writing files."""
+    data = data.copy()
+    data["Date"] = pd.to_datetime(data["Date"], format="%Y%m%d-%H%M%S")
+    data["File Path"] = file_path
+    return data
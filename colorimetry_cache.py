@@ -0,0 +1,186 @@
+"""colorimetry_cache.py: Remembers the colorimetry of standard/comparison Lab pairs so repeated pairs are not recalculated."""
+
+## Imports
+import os
+import numpy as np
+
+KEY_DECIMALS = 6  # The instrument records Lab values to 2 decimals, so distinct measurements never share a key
+METRIC_COUNT = 7
+
+_active = None  # Cache used by `data_helpers.calculate_colorimetry_batch`, None when caching is off
+
+
+def key_hashes(keys: np.ndarray):
+    """Hashes each key row into one 64 bit integer, so keys can be sorted and searched as plain integers.
+
+    Args:
+        keys (np.ndarray): Pair keys as returned by `ColorimetryCache.keys`.
+
+    Returns:
+        np.ndarray: uint64 hash of each row. Distinct rows can share a hash, so matches are checked on the keys.
+    """
+    bits = np.ascontiguousarray(keys, dtype=np.float64).view(np.uint64)
+    hashes = np.full(bits.shape[0], 0xCBF29CE484222325, dtype=np.uint64)
+    for column in bits.T:
+        hashes ^= column
+        hashes *= np.uint64(0x100000001B3)
+        hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+
+def _same_keys(keys: np.ndarray,
+               other_keys: np.ndarray):
+    """Compares key rows bit for bit, so NaN values match themselves."""
+    row = np.dtype((np.void, 6 * 8))
+    return (np.ascontiguousarray(keys, dtype=np.float64).view(row).ravel()
+            == np.ascontiguousarray(other_keys, dtype=np.float64).view(row).ravel())
+
+
+class ColorimetryCache:
+    """Bounded least recently used cache of colorimetry keyed on the rounded Lab values of both samples.
+
+    Entries are held in arrays sorted by the hash of their keys, so a whole batch of pairs is looked up with one
+    `np.searchsorted` instead of one dictionary lookup per pair. Entries can be saved to and loaded from a .npz file
+    to keep them between runs.
+    """
+
+    def __init__(self,
+                 max_entries: int = 200000,
+                 cache_path: str = None):
+        """
+        Args:
+            max_entries (int, optional): Most pairs kept. The least recently used pairs are evicted past it.
+                Defaults to 200000.
+            cache_path (str, optional): .npz file the entries are loaded from and saved to. Defaults to None,
+                keeping the entries in memory only.
+        """
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._hashes = np.array([], dtype=np.uint64)  # Sorted, the other arrays follow their order
+        self._keys = np.empty((0, 6))
+        self._metrics = np.empty((0, METRIC_COUNT))
+        self._last_used = np.array([], dtype=np.int64)
+        self._clock = 0
+        if cache_path is not None and os.path.exists(cache_path):
+            self.load()
+
+    def __len__(self):
+        return self._hashes.shape[0]
+
+    @staticmethod
+    def keys(std_lab: np.ndarray,
+             comparison_lab: np.ndarray):
+        """Returns the rounded (L*, a*, b*, L*, a*, b*) rows the pairs are keyed on."""
+        return np.round(np.hstack([std_lab, comparison_lab]), KEY_DECIMALS) + 0.0  # Adding 0.0 turns -0.0 into 0.0
+
+    @staticmethod
+    def distinct(keys: np.ndarray):
+        """Finds the distinct keys of a batch like `np.unique(keys, axis=0)`, but sorting hashes instead of rows.
+
+        Args:
+            keys (np.ndarray): Pair keys as returned by `keys`.
+
+        Returns:
+            tuple: Row of the first occurrence of each distinct key, and the distinct key of each row.
+        """
+        if keys.shape[0] == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        order = np.argsort(key_hashes(keys))
+        sorted_hashes = key_hashes(np.take(keys, order, axis=0))
+        starts = np.concatenate([[True], sorted_hashes[1:] != sorted_hashes[:-1]])
+        first_rows = order[starts]
+        inverse = np.empty(keys.shape[0], dtype=np.int64)
+        inverse[order] = np.cumsum(starts) - 1
+        if not _same_keys(keys, np.take(keys, np.take(first_rows, inverse), axis=0)).all():  # Keys share a hash
+            _, first_rows, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        return first_rows, inverse.reshape(-1)
+
+    def _find(self,
+              keys: np.ndarray,
+              hashes: np.ndarray):
+        """Returns the position of each key in the entries and whether it was found."""
+        if len(self) == 0:
+            return np.zeros(keys.shape[0], dtype=np.int64), np.zeros(keys.shape[0], dtype=bool)
+        positions = np.minimum(np.searchsorted(self._hashes, hashes), len(self) - 1)
+        found = (np.take(self._hashes, positions) == hashes) & _same_keys(np.take(self._keys, positions, axis=0), keys)
+        return positions, found
+
+    def lookup(self,
+               keys: np.ndarray):
+        """Finds the metrics of each key.
+
+        Args:
+            keys (np.ndarray): Distinct pair keys as returned by `keys`.
+
+        Returns:
+            tuple: (n, 7) array of metrics with NaN rows for misses, and a boolean array marking the hits.
+        """
+        positions, found = self._find(keys, key_hashes(keys))
+        metrics = np.full((keys.shape[0], METRIC_COUNT), np.nan)
+        metrics[found] = np.take(self._metrics, positions[found], axis=0)
+        self._clock += 1
+        self._last_used[positions[found]] = self._clock
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+        return metrics, found
+
+    def store(self,
+              keys: np.ndarray,
+              metrics: np.ndarray):
+        """Stores the metrics of each key, evicting the least recently used pairs past max_entries."""
+        hashes = key_hashes(keys)
+        new_hashes, rows = np.unique(hashes, return_index=True)  # A hash is only stored once
+        positions = np.searchsorted(self._hashes, new_hashes)
+        new = ~(np.take(self._hashes, np.minimum(positions, len(self) - 1)) == new_hashes) if len(self) > 0 \
+            else np.ones(rows.shape[0], dtype=bool)
+        rows, positions = rows[new], positions[new]
+        self._clock += 1
+        self._hashes = np.insert(self._hashes, positions, hashes[rows])  # Stays sorted
+        self._keys = np.insert(self._keys, positions, np.asarray(keys, dtype=np.float64)[rows], axis=0)
+        self._metrics = np.insert(self._metrics, positions, np.asarray(metrics, dtype=np.float64)[rows], axis=0)
+        self._last_used = np.insert(self._last_used, positions, self._clock)
+        if len(self) > self.max_entries:
+            evicted = len(self) - self.max_entries
+            kept = np.sort(np.argpartition(self._last_used, evicted - 1)[evicted:])
+            self._hashes = self._hashes[kept]
+            self._keys = self._keys[kept]
+            self._metrics = self._metrics[kept]
+            self._last_used = self._last_used[kept]
+
+    def load(self):
+        """Loads the entries saved in cache_path. An unreadable file is ignored."""
+        try:
+            with np.load(self.cache_path) as saved:
+                keys, metrics = saved["keys"], saved["metrics"]
+        except Exception:
+            return
+        if keys.ndim != 2 or keys.shape[1] != 6 or metrics.shape != (keys.shape[0], METRIC_COUNT):
+            return
+        self.store(keys[-self.max_entries:], metrics[-self.max_entries:])
+
+    def save(self):
+        """Saves the entries to cache_path, least recently used first."""
+        if self.cache_path is None:
+            return
+        order = np.argsort(self._last_used, kind="stable")
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        temporary_path = f"{self.cache_path}.tmp.npz"
+        np.savez(temporary_path, keys=self._keys[order], metrics=self._metrics[order])
+        os.replace(temporary_path, self.cache_path)
+
+
+def use_cache(cache: ColorimetryCache = None):
+    """Sets the cache colorimetry is looked up in. Passing None turns caching off.
+
+    Returns:
+        ColorimetryCache: The cache that was in use before.
+    """
+    global _active
+    previous, _active = _active, cache
+    return previous
+
+
+def active_cache():
+    return _active
@@ -2,19 +2,21 @@
 """data_helpers.py: Contains helpful methods for acquiring and manipulating data files and data structures."""
 
 ## Imports
+import io
 import os
 import shutil
 import math
 import string
-import time
 import datetime
 import re
-import progressbar
-from alive_progress import alive_bar
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from decimal import Decimal
 import pandas as pd
 import numpy as np
-from colour.difference import delta_E
+from readers import read_sheet
+from profiling import profiled
+from colorimetry_cache import active_cache
 
 
 def get_filepaths(text_file):
@@ -32,31 +34,125 @@ def get_filepaths(text_file):
     return lines
 
 
+REQUIRED_COLUMNS = ["Date", "Name", "Nuance", "Fiber", "Formula number", "L*", "a*", "b*", "h°"]
+KEY_COLUMNS = REQUIRED_COLUMNS + ["File Path"]
+
+
+def read_data_file(path: str,
+                   sheet_name: str = "Plan",
+                   include_path: bool = True,
+                   content: bytes = None,
+                   reader: str = None,
+                   usecols: list = None,
+                   since = None):
+    """Reads a single excel spreadsheet and prepares it for concatenation.
+
+    Args:
+        path (str): File path of the spreadsheet.
+        sheet_name (str, optional): Sheet to read. Defaults to "Plan".
+        include_path (bool, optional): Tags every row with the file path. Defaults to True.
+        content (bytes, optional): Raw file content already read from path. Defaults to None.
+        reader (str, optional): Spreadsheet reader, see `readers.resolve_reader`. Defaults to None.
+        usecols (list, optional): Names of the columns to read. Defaults to None, reading every column.
+        since (optional): Drops rows dated before this while parsing. Defaults to None.
+
+    Returns:
+        pandas.Dataframe: Data from the file.
+    """
+    source = path if content is None else io.BytesIO(content)
+    current_file_df = read_sheet(source,
+                                 sheet_name,
+                                 reader,
+                                 usecols,
+                                 since)
+    try:
+        current_file_df["Date"] = pd.to_datetime(current_file_df["Date"],
+                                                format="%Y%m%d-%H%M%S")
+    except:
+        pass
+    if include_path:
+        current_file_df["File Path"] = path
+    return current_file_df
+
+
+def _read_file_bytes(path: str):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _read_data_files_parallel(file_paths: list,
+                              sheet_name: str,
+                              include_path: bool,
+                              workers: int,
+                              reader: str = None,
+                              usecols: list = None,
+                              since = None):
+    """Reads files with threads and parses them in a process pool, keeping the order of file_paths."""
+    with ThreadPoolExecutor(max_workers=workers) as io_pool, \
+         ProcessPoolExecutor(max_workers=workers) as parse_pool:
+        contents = io_pool.map(_read_file_bytes, file_paths)
+        futures = [parse_pool.submit(read_data_file, path, sheet_name, include_path, content, reader, usecols, since)
+                   for path, content in zip(file_paths, contents)]
+        return [future.result() for future in futures]
+
+
 #TODO Refactor so there is no default of "Plan" for the sheet name
+@profiled(rows=lambda result, *args, **kwargs: result.shape[0])
 def get_data(file_paths: list,
              sheet_name: str = "Plan",
-             include_path: bool = True):
+             include_path: bool = True,
+             workers: int = 1,
+             cache = None,
+             reader: str = None,
+             usecols: list = None,
+             since = None):
     """Gets data from a list of excel spreadsheets.
 
     Args:
         file_paths (list): A list of file paths to get data from.
+        workers (int, optional): Number of files read and parsed at once. Defaults to 1, reading serially.
+        cache (file_cache.ParsedFileCache, optional): Cache of previously parsed files. Defaults to None.
+        reader (str, optional): Spreadsheet reader, see `readers.resolve_reader`. Defaults to None.
+        usecols (list, optional): Names of the columns to read, _e.g._ REQUIRED_COLUMNS. Defaults to None, reading
+            every column.
+        since (optional): Date or timestamp; rows with an earlier "Date" are dropped while parsing. Defaults to None.
         
     Returns:
         pandas.Dataframe: Data from all files provided in the file_paths list 
     """
     
-    list_of_dfs = []
-    for path in file_paths:
-        current_file_df = pd.read_excel(path,
-                                     sheet_name=sheet_name)
-        try:
-            current_file_df["Date"] = pd.to_datetime(current_file_df["Date"],
-                                                    format="%Y%m%d-%H%M%S")
-        except:
-            pass
-        if include_path:
+    list_of_dfs = [None] * len(file_paths)
+    cache_entries = {}
+    cache_variant = ""
+    if usecols is not None:
+        cache_variant += f"columns={','.join(usecols)};"
+    if since is not None:
+        cache_variant += f"since={pd.Timestamp(since).isoformat()};"
+    if cache is not None:
+        for index, path in enumerate(file_paths):
+            cache_entries[index], list_of_dfs[index] = cache.lookup(path, sheet_name, cache_variant)
+    
+    missing = [index for index, current_file_df in enumerate(list_of_dfs) if current_file_df is None]
+    missing_paths = [file_paths[index] for index in missing]
+    if workers > 1 and len(missing_paths) > 1:
+        parsed_dfs = _read_data_files_parallel(missing_paths,
+                                               sheet_name,
+                                               False,
+                                               min(workers, len(missing_paths)),
+                                               reader,
+                                               usecols,
+                                               since)
+    else:
+        parsed_dfs = [read_data_file(path, sheet_name, False, reader=reader, usecols=usecols, since=since)
+                      for path in missing_paths]
+    for index, current_file_df in zip(missing, parsed_dfs):
+        if cache is not None:
+            cache.store(cache_entries[index], current_file_df)
+        list_of_dfs[index] = current_file_df
+    
+    if include_path:
+        for path, current_file_df in zip(file_paths, list_of_dfs):
             current_file_df["File Path"] = path
-        list_of_dfs.append(current_file_df)
     
     all_data = pd.concat(list_of_dfs,
                          ignore_index=True,
@@ -65,24 +161,121 @@ def get_data(file_paths: list,
     return all_data
 
 
+@profiled(rows=lambda result, df1, df2: df1.shape[0])
 def get_missing_rows(df1, df2):
     """Returns rows in df1 that are not present in df2.
 
+    Rows are compared on the columns both dataframes share using `row_fingerprints`, so missing values match each
+    other and numbers match regardless of dtype. Rows keep the order an outer merge would give them, with duplicate
+    rows grouped at the first occurrence unless df2 is empty, and keep the dtypes of df1.
+
     Args:
         df1 (pandas.Dataframe): Dataframe that has additional rows.
         df2 (pandas.Dataframe): Dataframe to check against.
 
     Returns:
-        _type_: _description_
+        pandas.Dataframe: The rows of df1 missing from df2 with a fresh index.
+    """
+    columns = [column for column in df1.columns if column in df2.columns]
+    if len(columns) == 0:
+        raise pd.errors.MergeError("No common columns to compare rows on")
+    if df2.shape[0] == 0:
+        return df1.reset_index(drop=True)
+    fingerprints = row_fingerprints(df1, columns)
+    present = np.isin(fingerprints, np.unique(row_fingerprints(df2, columns)))
+    return drop_present_rows(df1, fingerprints, present)
+
+
+def drop_present_rows(data: pd.DataFrame,
+                      fingerprints: np.ndarray,
+                      present: np.ndarray):
+    """Drops rows that are already present elsewhere, ordering the rest like `get_missing_rows`.
+
+    Args:
+        data (pd.DataFrame): Rows to filter.
+        fingerprints (np.ndarray): Fingerprints of the rows of data.
+        present (np.ndarray): Boolean mask that is True for rows to drop.
+
+    Returns:
+        pd.DataFrame: The remaining rows with a fresh index.
     """
-    merged_df = pd.merge(df1, df2,
-                         how="outer",
-                         indicator=True)
-    missing_rows = merged_df[merged_df["_merge"] == "left_only"][df1.columns]
+    order = np.argsort(pd.factorize(fingerprints)[0], kind="stable")  # Groups duplicate rows like pd.merge does
+    missing_rows = data.iloc[order[~present[order]]]
     missing_rows = missing_rows.reset_index(drop=True)
     return missing_rows
 
 
+def key_fingerprints(data: pd.DataFrame):
+    """Fingerprints rows on KEY_COLUMNS, the columns that identify a measurement.
+
+    Columns outside the key (_e.g._ "User" or "Study") do not change the fingerprint, so rows read with or without
+    column projection fingerprint the same. Key columns data does not have count as missing values.
+
+    Args:
+        data (pd.DataFrame): Rows to fingerprint.
+
+    Returns:
+        np.ndarray: One uint64 fingerprint per row.
+    """
+    return row_fingerprints(data.reindex(columns=KEY_COLUMNS))
+
+
+def _normalize_fingerprint_column(column: pd.Series):
+    """Maps a column onto strings that are equal whenever `pd.merge` would match the values, whatever the dtype."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        values = column.to_numpy(dtype="datetime64[ns]")
+        normalized = values.view("int64").astype(str).astype(object)
+        normalized[np.isnat(values)] = "\x00NA"
+        return pd.Series(normalized)
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        values = column.to_numpy(dtype=float) + 0.0  # Adding 0.0 turns -0.0 into 0.0
+        codes, uniques = pd.factorize(values)
+        normalized_uniques = np.array([repr(value) for value in uniques.tolist()] + ["\x00NA"], dtype=object)
+        return pd.Series(normalized_uniques[codes])  # Full precision like object columns, whatever the print options
+    codes, uniques = pd.factorize(column.to_numpy(dtype=object))
+    normalized_uniques = np.array([_normalize_fingerprint_value(value) for value in uniques] + ["\x00NA"],
+                                  dtype=object)
+    return pd.Series(normalized_uniques[codes])  # Missing values have code -1 and take the last entry
+
+
+def _normalize_fingerprint_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return repr(float(value))
+    if isinstance(value, (int, float, np.number)):
+        return repr(float(value) + 0.0)
+    if isinstance(value, (datetime.datetime, np.datetime64)):
+        return repr(pd.Timestamp(value).value)
+    return str(value)
+
+
+def row_fingerprints(data: pd.DataFrame,
+                     columns: list = None):
+    """Computes a stable 64-bit fingerprint for every row of a dataframe.
+
+    Values are normalized first, so rows read back from the output files fingerprint the same as freshly read rows.
+    Numbers compare by value regardless of dtype, missing values compare equal, and dates compare by timestamp.
+
+    Args:
+        data (pd.DataFrame): Rows to fingerprint.
+        columns (list, optional): Columns to include in the fingerprint, in order. Defaults to all columns.
+
+    Returns:
+        np.ndarray: One uint64 fingerprint per row.
+    """
+    if columns is None:
+        columns = list(data.columns)
+    normalized = pd.DataFrame({index:_normalize_fingerprint_column(data[column].reset_index(drop=True))
+                               for index, column in enumerate(columns)})
+    if normalized.shape[1] == 0:
+        return np.zeros(data.shape[0], dtype=np.uint64)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+STD_TAG = "STD"
+STD_REGEX = re.compile(".*STD.*")
+# STD_REGEX = re.compile(".*[Ss][Tt][Dd]$")  # Filter for finding STD tag at the end of the line
+
+
 def find_standard(name_string: str):
     """Determines if a string ends with "STD" tag in any case combination.
 
@@ -92,13 +285,21 @@ def find_standard(name_string: str):
     Returns:
         bool: True if the name ends in the "STD" tag. False if not.
     """
-    # std_regex = re.compile(".*[Ss][Tt][Dd]$")  # Filter for finding STD tag at the end of the line
-    std_regex = re.compile(".*STD.*")
-    if std_regex.search(name_string):
+    if STD_REGEX.search(name_string):
         return True
     return False
 
 
+def _factorize_names(data_set: pd.DataFrame):
+    """Splits the "Name" column into codes and a series of its unique names.
+
+    Names repeat across many rows, so string work is done once per unique name and broadcast back with the codes.
+    Missing names get the code -1.
+    """
+    codes, names = pd.factorize(data_set["Name"].to_numpy(dtype=object))
+    return codes, pd.Series(names, dtype=object)
+
+
 def mark_standards(data_set: pd.DataFrame):
     """Adds a column to a dataframe marking standards.
 
@@ -108,7 +309,9 @@ def mark_standards(data_set: pd.DataFrame):
     Returns:
         pd.DataFrame: A new pandas dataframe with a "STD" column added.
     """
-    data_set["STD"] = data_set["Name"].apply(find_standard)
+    codes, names = _factorize_names(data_set)
+    is_standard = names.str.contains(STD_TAG, regex=False, na=False).to_numpy(dtype=bool)
+    data_set["STD"] = np.append(is_standard, False)[codes]  # Missing names (code -1) are never standards
     return data_set
 
 
@@ -122,7 +325,7 @@ def extract_shade_name(name_string: str):
         str: A version of name_string without the "STD" tag.
     """
     if find_standard(name_string):
-        name_string = name_string.replace("STD", "")
+        name_string = name_string.replace(STD_TAG, "")
     return name_string
 
 
@@ -135,10 +338,13 @@ def mark_shade_names(data_set: pd.DataFrame):
     Returns:
         pd.DataFrame: A new pandas dataframe with a "ShadeName" column added.
     """
-    data_set["ShadeName"] = data_set["Name"].apply(extract_shade_name)
+    codes, names = _factorize_names(data_set)
+    shade_names = names.str.replace(STD_TAG, "", regex=False).fillna(names)  # Names that are not strings are kept
+    data_set["ShadeName"] = np.append(shade_names.to_numpy(dtype=object), np.nan)[codes]
     return data_set
 
 
+@profiled(rows=lambda result, data_set, *args, **kwargs: data_set.shape[0])
 def get_groups(data_set: pd.DataFrame,
                group_frequency: str = "1D"):
     """Returns all possible groups based on date, shade name, and hair type
@@ -149,7 +355,9 @@ def get_groups(data_set: pd.DataFrame,
     Returns:
         pd.DataFrame: DataFrame with the same column names where one row is one group.
     """
-    groups = data_set.groupby([pd.Grouper(key="Date", freq=group_frequency),"Nuance","Fiber"]).size().reset_index()
+    groups = data_set.groupby([pd.Grouper(key="Date", freq=group_frequency),"Nuance","Fiber"],
+                             observed=True).size()
+    groups = groups.sort_index().reset_index()  # Observed categorical keys come out in order of appearance
     groups = groups.drop(columns=[0])
     return groups
     
@@ -176,86 +384,262 @@ def filter_for_group(data: pd.DataFrame,
     return filtered_data
 
 
-def calculate_colorimetry(data_std: pd.DataFrame,
-                          data_comparison: pd.DataFrame):
-    std_L = data_std.iloc[0]["L*"]
-    std_a = data_std.iloc[0]["a*"]
-    std_b = data_std.iloc[0]["b*"]
-    std_C = math.sqrt(std_a**2 + std_b**2)
-    std_h = data_std.iloc[0]["h°"]
-    comparison_L = data_comparison.iloc[0]["L*"]
-    comparison_a = data_comparison.iloc[0]["a*"]
-    comparison_b = data_comparison.iloc[0]["b*"]
-    comparison_C = math.sqrt(comparison_a**2 + comparison_b**2)
-    comparison_h = data_comparison.iloc[0]["h°"]
-    
+ROUND_DIGITS = Decimal("1.000")
+LAB_COLUMNS = ["L*", "a*", "b*"]
+
+
+def round_metric(values):
+    """Rounds colorimetry values to 3 decimals exactly like `Decimal.quantize`.
+
+    Values are rounded half-to-even from their exact binary value. Scaling by 1000 can land a value
+    on a false tie, so anything within reach of a tie is settled with `Decimal` instead.
+
+    Args:
+        values (np.ndarray): Values to round.
+
+    Returns:
+        np.ndarray: Rounded values as floats.
+    """
+    values = np.asarray(values, dtype=float)
+    scaled = values * 1000
+    rounded = np.rint(scaled) / 1000
+    near_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [float(Decimal(value).quantize(ROUND_DIGITS)) for value in values[near_tie]]
+    return rounded
+
+
+def _as_lab_array(data):
+    """Returns L*, a*, b* values as an (n, 3) float array from a dataframe or array-like."""
+    if isinstance(data, pd.DataFrame):
+        data = data[LAB_COLUMNS].to_numpy(dtype=float)
+    return np.asarray(data, dtype=float).reshape(-1, 3)
+
+
+def _calculate_colorimetry(std_lab: np.ndarray,
+                           comparison_lab: np.ndarray):
+    from colour.difference import delta_E  # Deferred, colour-science is slow to import
+
+    std_L, std_a, std_b = std_lab.T
+    comparison_L, comparison_a, comparison_b = comparison_lab.T
+    std_C = np.sqrt(std_a**2 + std_b**2)
+    comparison_C = np.sqrt(comparison_a**2 + comparison_b**2)
+
     ave_C = (std_C + comparison_C)/2
-    factor_G = 0.5 * (1 - math.sqrt(ave_C**7/(ave_C**7+25**7)))
+    factor_G = 0.5 * (1 - np.sqrt(ave_C**7/(ave_C**7+25**7)))
     std_a_prime = std_a * (1 + factor_G)
     comparison_a_prime = comparison_a * (1 + factor_G)
-    std_C_prime = math.sqrt(std_a_prime**2 + std_b**2)
-    comparison_C_prime = math.sqrt(comparison_a_prime**2 + comparison_b**2)
-    
-    std_h_prime = math.degrees(math.atan2(std_a_prime,std_b))
-    comparison_h_prime = math.degrees(math.atan2(comparison_a_prime, comparison_b))
-    
+    std_C_prime = np.sqrt(std_a_prime**2 + std_b**2)
+    comparison_C_prime = np.sqrt(comparison_a_prime**2 + comparison_b**2)
+
+    std_h_prime = np.degrees(np.arctan2(std_a_prime, std_b))
+    comparison_h_prime = np.degrees(np.arctan2(comparison_a_prime, comparison_b))
+
     delta_h_prime = -(((comparison_h_prime - std_h_prime) + 180) % 360 - 180)  # Finds smallest angle from std to comparison where '-' is anticlockwise, '+' is clockwise
-    
-    std_lab = np.array([std_L, std_a, std_b]) 
-    comparison_lab = np.array([comparison_L, comparison_a, comparison_b])
+
     delta_E2000 = delta_E(std_lab, comparison_lab,
                           method = "CIE 2000")
-    
-    round_digits = Decimal("1.000")
-    delta_E2000 = float(Decimal(delta_E2000).quantize(round_digits))
-    delta_L = float(Decimal(comparison_L-std_L).quantize(round_digits))
-    delta_a = float(Decimal(comparison_a-std_a).quantize(round_digits))
-    delta_b = float(Decimal(comparison_b-std_b).quantize(round_digits))
-    delta_C = float(Decimal(comparison_C_prime-std_C_prime).quantize(round_digits))
-    delta_h = float(Decimal(delta_h_prime).quantize(round_digits))
-    delta_H = float(Decimal(2 * math.sqrt(std_C_prime * comparison_C_prime) * math.sin(math.radians(delta_h/2))).quantize(round_digits))
-    
+
+    delta_E2000 = round_metric(np.reshape(delta_E2000, -1))
+    delta_L = round_metric(comparison_L-std_L)
+    delta_a = round_metric(comparison_a-std_a)
+    delta_b = round_metric(comparison_b-std_b)
+    delta_C = round_metric(comparison_C_prime-std_C_prime)
+    delta_h = round_metric(delta_h_prime)
+    delta_H = round_metric(2 * np.sqrt(std_C_prime * comparison_C_prime) * np.sin(np.radians(delta_h/2)))
+
     return delta_E2000, delta_L, delta_a, delta_b, delta_C, delta_h, delta_H
 
 
+@profiled(rows=lambda result, *args: len(result[0]))
+def calculate_colorimetry_batch(data_std,
+                                data_comparison):
+    """Calculates colorimetry for many standard/comparison pairs in one pass.
+
+    When a colorimetry cache is in use (see `colorimetry_cache.use_cache`), each distinct pair is looked up first
+    and only the pairs missing from the cache are calculated.
+
+    Args:
+        data_std (pd.DataFrame | np.ndarray): Standard L*, a*, b* values, one pair per row.
+        data_comparison (pd.DataFrame | np.ndarray): Comparison L*, a*, b* values aligned with data_std.
+
+    Returns:
+        tuple: Arrays of delta_E2000, delta_L, delta_a, delta_b, delta_C, delta_h and delta_H.
+    """
+    std_lab = _as_lab_array(data_std)
+    comparison_lab = _as_lab_array(data_comparison)
+    cache = active_cache()
+    if cache is None or std_lab.shape[0] == 0:
+        return _calculate_colorimetry(std_lab, comparison_lab)
+
+    keys = cache.keys(std_lab, comparison_lab)
+    first_rows, inverse = cache.distinct(keys)
+    keys = keys[first_rows]
+    metrics, found = cache.lookup(keys)
+    if not found.all():
+        missing_rows = first_rows[~found]
+        metrics[~found] = np.column_stack(_calculate_colorimetry(std_lab[missing_rows], comparison_lab[missing_rows]))
+        cache.store(keys[~found], metrics[~found])
+    return tuple(np.take(metrics, inverse, axis=0).T.copy())
+
+
+def calculate_colorimetry(data_std: pd.DataFrame,
+                          data_comparison: pd.DataFrame):
+    """Calculates colorimetry between the first rows of a standard and a comparison.
+
+    Args:
+        data_std (pd.DataFrame): Standard data with "L*", "a*", and "b*" columns.
+        data_comparison (pd.DataFrame): Comparison data with "L*", "a*", and "b*" columns.
+
+    Returns:
+        tuple: delta_E2000, delta_L, delta_a, delta_b, delta_C, delta_h and delta_H as floats.
+    """
+    metrics = calculate_colorimetry_batch(data_std.iloc[:1], data_comparison.iloc[:1])
+    return tuple(float(metric[0]) for metric in metrics)
+
+
+REPORT_COLUMNS = ["Date",
+                  "Name Standard",
+                  "Shade Standard",
+                  "FLA Standard",
+                  "Fiber Standard",
+                  "L* Standard",
+                  "a* Standard",
+                  "b* Standard",
+                  " ",
+                  "Name Comparison",
+                  "Shade Comparison",
+                  "FLA Comparison",
+                  "Fiber Comparison",
+                  "L* Comparison",
+                  "a* Comparison",
+                  "b* Comparison",
+                  "Notes",
+                  "dE2000",
+                  "dL*",
+                  "da*",
+                  "db*",
+                  "dC",
+                  "dh",
+                  "dH (metric difference)",
+                  "File Path Standard",
+                  "File Path Comparison"]
+METRIC_COLUMNS = ["dE2000", "dL*", "da*", "db*", "dC", "dh", "dH (metric difference)"]
+STANDARD_FIELDS = {"Name Standard":"Name",
+                   "Shade Standard":"Nuance",
+                   "FLA Standard":"Formula number",
+                   "Fiber Standard":"Fiber",
+                   "L* Standard":"L*",
+                   "a* Standard":"a*",
+                   "b* Standard":"b*",
+                   "File Path Standard":"File Path"}
+COMPARISON_FIELDS = {"Name Comparison":"Name",
+                     "Shade Comparison":"Nuance",
+                     "FLA Comparison":"Formula number",
+                     "Fiber Comparison":"Fiber",
+                     "L* Comparison":"L*",
+                     "a* Comparison":"a*",
+                     "b* Comparison":"b*",
+                     "File Path Comparison":"File Path"}
+
+
+class ReportBuilder:
+    """Collects comparisons column by column and assembles the report frame once.
+
+    Colorimetry for every collected comparison is calculated in a single batch when the frame is built.
+    """
+
+    def __init__(self):
+        self._counts = []
+        self._dates = []
+        self._standard_values = {column:[] for column in STANDARD_FIELDS}
+        self._comparison_values = {column:[] for column in COMPARISON_FIELDS}
+
+    def __len__(self):
+        return sum(self._counts)
+
+    def add_set(self,
+                standard: pd.DataFrame,
+                comparisons: pd.DataFrame):
+        """Adds every comparison measured against one standard.
+
+        Args:
+            standard (pd.DataFrame): The set's standard. Only the first row is used.
+            comparisons (pd.DataFrame): All comparisons to report against the standard.
+        """
+        standard = standard.iloc[0]
+        self._counts.append(comparisons.shape[0])
+        self._dates.append(standard["Date"].date())
+        for column, field in STANDARD_FIELDS.items():
+            self._standard_values[column].append(standard[field])
+        for column, field in COMPARISON_FIELDS.items():
+            self._comparison_values[column].append(comparisons[field].to_numpy())
+
+    def extend(self,
+               other):
+        """Adds every comparison collected by another builder after the ones already collected.
+
+        Args:
+            other (ReportBuilder): Builder to take the comparisons from.
+        """
+        self._counts.extend(other._counts)
+        self._dates.extend(other._dates)
+        for column, values in other._standard_values.items():
+            self._standard_values[column].extend(values)
+        for column, values in other._comparison_values.items():
+            self._comparison_values[column].extend(values)
+
+    def to_frame(self):
+        """Builds the report frame from everything collected so far.
+
+        Returns:
+            pd.DataFrame: One report row per comparison with columns in REPORT_COLUMNS order.
+        """
+        if len(self) == 0:
+            return pd.DataFrame(columns=REPORT_COLUMNS)
+        counts = np.array(self._counts)
+        count = counts.sum()
+        columns = {"Date":pd.Series(self._dates, dtype=object).to_numpy().repeat(counts),
+                   " ":np.full(count, None, dtype=object),
+                   "Notes":np.full(count, "", dtype=object)}
+        for column, values in self._standard_values.items():
+            columns[column] = pd.Series(values).to_numpy().repeat(counts)
+        for column, values in self._comparison_values.items():
+            columns[column] = np.concatenate(values)
+        std_lab = np.column_stack([columns[f"{field} Standard"] for field in LAB_COLUMNS])
+        comparison_lab = np.column_stack([columns[f"{field} Comparison"] for field in LAB_COLUMNS])
+        metrics = calculate_colorimetry_batch(std_lab, comparison_lab)
+        columns.update(zip(METRIC_COLUMNS, metrics))
+        return pd.DataFrame({column:columns[column] for column in REPORT_COLUMNS})
+
+
+def report_comparisons(standard: pd.DataFrame,
+                       comparisons: pd.DataFrame):
+    """Builds report rows for every comparison measured against one standard.
+
+    Args:
+        standard (pd.DataFrame): The set's standard. Only the first row is used.
+        comparisons (pd.DataFrame): All comparisons to report against the standard.
+
+    Returns:
+        pd.DataFrame: One report row per comparison.
+    """
+    report = ReportBuilder()
+    report.add_set(standard, comparisons)
+    return report.to_frame()
+
+
 def report_comparison(standard: pd.DataFrame,
                       comparison: pd.DataFrame):
-    delta_E2000, delta_L, delta_a, delta_b, delta_C, delta_h, delta_H = calculate_colorimetry(standard, comparison)
-    new_row = pd.DataFrame({
-        "Date":[standard.iloc[0]["Date"].date()],
-        "Name Standard":[standard.iloc[0]["Name"]],
-        "Shade Standard":[standard.iloc[0]["Nuance"]],
-        "FLA Standard":[standard.iloc[0]["Formula number"]],
-        "Fiber Standard":[standard.iloc[0]["Fiber"]],
-        "L* Standard":[standard.iloc[0]["L*"]],
-        "a* Standard":[standard.iloc[0]["a*"]],
-        "b* Standard":[standard.iloc[0]["b*"]],
-        " ":[None],
-        "Name Comparison":[comparison.iloc[0]["Name"]],
-        "Shade Comparison":[comparison.iloc[0]["Nuance"]],
-        "FLA Comparison":[comparison.iloc[0]["Formula number"]],
-        "Fiber Comparison":[comparison.iloc[0]["Fiber"]],
-        "L* Comparison":[comparison.iloc[0]["L*"]],
-        "a* Comparison":[comparison.iloc[0]["a*"]],
-        "b* Comparison":[comparison.iloc[0]["b*"]],
-        "Notes":[""],
-        "dE2000":[delta_E2000],
-        "dL*":[delta_L],
-        "da*":[delta_a],
-        "db*":[delta_b],
-        "dC":[delta_C],
-        "dh":[delta_h],
-        "dH (metric difference)":[delta_H],
-        "File Path Standard":[standard.iloc[0]["File Path"]],
-        "File Path Comparison":[comparison.iloc[0]["File Path"]]
-    })
-    return new_row
+    return report_comparisons(standard, comparison.iloc[:1])
 
 
+@profiled(rows=lambda result, all_data, *args: all_data.shape[0])
 def write_used_data(all_data: pd.DataFrame,
                    output_file_path: str):
     all_data = all_data.drop(["STD","ShadeName"],
-                             axis=1)
+                             axis=1,
+                             errors="ignore")
     with pd.ExcelWriter(output_file_path,
                         engine="xlsxwriter") as writer:
         all_data.to_excel(writer,
@@ -263,53 +647,116 @@ def write_used_data(all_data: pd.DataFrame,
                           index=False)
 
 
+@profiled(rows=lambda result, good_data, *args: good_data.shape[0])
 def write_report(good_data: pd.DataFrame,
                output_file_path: str):
-    with pd.ExcelWriter(output_file_path,
-                        engine='xlsxwriter') as writer:
-
-        # Sorts dataframe to group tests together
-        good_data = good_data.sort_values(by=["Date","FLA Comparison"])
-
-        good_data.to_excel(writer,
-                           sheet_name="Report",
-                           index=False,
-                           header=False,
-                           startrow=1)
-        workbook = writer.book
-        worksheet = writer.sheets["Report"]
-        
-        # Get correct columns for formatting
-        alphabet_dict = dict(zip(range(0,26,1), [letter for letter in string.ascii_uppercase]))
-        spacer_column = good_data.columns.get_loc(" ")
-        spacer_column_letter = alphabet_dict[spacer_column]
-        
-        de2000_column = good_data.columns.get_loc("dE2000")
-        de2000_column_letter = alphabet_dict[de2000_column]
-        colorimetry_column_start = de2000_column+1
-        colorimetry_column_start_letter = alphabet_dict[colorimetry_column_start]
-        colorimetry_column_end = colorimetry_column_start+5
-        colorimetry_column_end_letter = alphabet_dict[colorimetry_column_end]
-        
-        worksheet.set_column(f"{spacer_column_letter}:{spacer_column_letter}", 1, workbook.add_format({"bg_color":"#595959"}))
-        worksheet.set_column(f"{de2000_column_letter}:{de2000_column_letter}", 10, workbook.add_format({"bg_color":"#FCD5B4"}))
-        worksheet.set_column(f"{colorimetry_column_start_letter}:{colorimetry_column_end_letter}", 10, workbook.add_format({"bg_color":"#D5E8FF"}))
-        # worksheet.set_row(":W", 10, workbook.add_format({"bg_color":"#D5E8FF"}))
+    # Sorts dataframe to group tests together
+    good_data = good_data.sort_values(by=["Date","FLA Comparison"])
+    write_report_rows(good_data.itertuples(index=False, name=None),
+                      list(good_data.columns),
+                      output_file_path)
+
+
+def _write_report_cell(worksheet,
+                       row_number: int,
+                       col_num: int,
+                       value,
+                       formats: dict):
+    """Writes one report value the way `pd.DataFrame.to_excel` would."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return
+    if isinstance(value, datetime.datetime):
+        worksheet.write_datetime(row_number, col_num, value, formats["datetime"])
+    elif isinstance(value, datetime.date):
+        worksheet.write_datetime(row_number, col_num, datetime.datetime.combine(value, datetime.time()), formats["date"])
+    else:
+        worksheet.write(row_number, col_num, value)
+
+
+@profiled(rows=lambda result, *args, **kwargs: result)
+def write_report_rows(rows,
+                      columns: list,
+                      output_file_path: str,
+                      extra_sheets = None):
+    """Streams sorted report rows into a formatted report workbook.
+
+    The workbook is written in xlsxwriter's constant memory mode, so rows are flushed to disk as they are written and
+    memory use does not grow with the length of the report.
+
+    Args:
+        rows (iterable): Report rows as tuples, already in report order.
+        columns (list): Column names of the rows.
+        output_file_path (str): Path of the workbook to write.
+        extra_sheets (callable, optional): Called once every row is written. Returns a dict of sheet names and
+            dataframes written after the report, _e.g._ the QC summary. Defaults to None.
+
+    Returns:
+        int: Number of rows written.
+    """
+    import xlsxwriter  # Deferred, only needed when writing workbooks
+
+    workbook = xlsxwriter.Workbook(output_file_path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Report")
+    formats = {"date":workbook.add_format({"num_format":"YYYY-MM-DD"}),
+               "datetime":workbook.add_format({"num_format":"YYYY-MM-DD HH:MM:SS"})}
+
+    # Get correct columns for formatting
+    alphabet_dict = dict(zip(range(0,26,1), [letter for letter in string.ascii_uppercase]))
+    spacer_column = columns.index(" ")
+    spacer_column_letter = alphabet_dict[spacer_column]
+    
+    de2000_column = columns.index("dE2000")
+    de2000_column_letter = alphabet_dict[de2000_column]
+    colorimetry_column_start = de2000_column+1
+    colorimetry_column_start_letter = alphabet_dict[colorimetry_column_start]
+    colorimetry_column_end = colorimetry_column_start+5
+    colorimetry_column_end_letter = alphabet_dict[colorimetry_column_end]
+    
+    worksheet.set_column(f"{spacer_column_letter}:{spacer_column_letter}", 1, workbook.add_format({"bg_color":"#595959"}))
+    worksheet.set_column(f"{de2000_column_letter}:{de2000_column_letter}", 10, workbook.add_format({"bg_color":"#FCD5B4"}))
+    worksheet.set_column(f"{colorimetry_column_start_letter}:{colorimetry_column_end_letter}", 10, workbook.add_format({"bg_color":"#D5E8FF"}))
+    # worksheet.set_row(":W", 10, workbook.add_format({"bg_color":"#D5E8FF"}))
+
+    # Add a header format.
+    header_format = workbook.add_format({
+        'bold': True,
+        'text_wrap': True,
+        'valign': 'top',
+        'font_color': '#F2F2F2',
+        'bg_color': '#595959',
+        'border': 1})
+
+    # Write the column headers with the defined format. Rows must be written in order in constant memory mode.
+    for col_num, value in enumerate(columns):
+        worksheet.write(0, col_num, value, header_format)
+
+    row_number = 0
+    for row_number, row in enumerate(rows, start=1):
+        for col_num, value in enumerate(row):
+            _write_report_cell(worksheet, row_number, col_num, value, formats)
 
-        # Add a header format.
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'font_color': '#F2F2F2',
-            'bg_color': '#595959',
-            'border': 1})
+    if "QC Status" in columns and row_number > 0:
+        status_column = columns.index("QC Status")
+        for status, color in [("Pass", "#C6EFCE"), ("Warn", "#FFEB9C"), ("Fail", "#FFC7CE")]:
+            worksheet.conditional_format(1, status_column, row_number, status_column,
+                                         {"type":"cell", "criteria":"==", "value":f'"{status}"',
+                                          "format":workbook.add_format({"bg_color":color})})
 
-        # Write the column headers with the defined format.
-        for col_num, value in enumerate(good_data.columns.values):
-            worksheet.write(0, col_num, value, header_format)
+    for sheet_name, sheet_data in (extra_sheets() if extra_sheets is not None else {}).items():
+        sheet = workbook.add_worksheet(sheet_name)
+        for col_num, value in enumerate(sheet_data.columns):
+            sheet.write(0, col_num, value, header_format)
+        for sheet_row, row in enumerate(sheet_data.itertuples(index=False, name=None), start=1):
+            for col_num, value in enumerate(row):
+                _write_report_cell(sheet, sheet_row, col_num, value, formats)
 
+    workbook.close()
+    return row_number
 
+
+@profiled(rows=lambda result, all_data, *args: all_data.shape[0])
 def write_bad_comparisons(all_data: pd.DataFrame,
                    output_file_path: str):
     with pd.ExcelWriter(output_file_path,
@@ -319,68 +766,312 @@ def write_bad_comparisons(all_data: pd.DataFrame,
                           index=False)
 
 
+@profiled(rows=lambda result, *args, **kwargs: result)
+def write_bad_comparisons_rows(rows,
+                               columns: list,
+                               output_file_path: str):
+    """Streams bad comparison rows into a workbook laid out like `write_bad_comparisons`.
+
+    Args:
+        rows (iterable): Bad comparison rows as tuples.
+        columns (list): Column names of the rows.
+        output_file_path (str): Path of the workbook to write.
+
+    Returns:
+        int: Number of rows written.
+    """
+    import xlsxwriter  # Deferred, only needed when writing workbooks
+
+    workbook = xlsxwriter.Workbook(output_file_path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet("Bad comparisons")
+    formats = {"date":workbook.add_format({"num_format":"YYYY-MM-DD"}),
+               "datetime":workbook.add_format({"num_format":"YYYY-MM-DD HH:MM:SS"})}
+    header_format = workbook.add_format({"bold":True, "border":1, "align":"center", "valign":"top"})
+    for col_num, value in enumerate(columns):
+        worksheet.write(0, col_num, value, header_format)
+    row_number = 0
+    for row_number, row in enumerate(rows, start=1):
+        for col_num, value in enumerate(row):
+            _write_report_cell(worksheet, row_number, col_num, value, formats)
+    workbook.close()
+    return row_number
+
+
 def backup_file(file_name: str,
                 file_directory: str = "./"):
     if not os.path.exists(f"{file_directory}{file_name}"):
         print(f"Failed to back up {file_name} becuase the file does not exist yet.")
         return
-    try:
-        print(f"Backing up {file_name}...", end="", flush=True)
-        shutil.copyfile(f"{file_directory}{file_name}", f"./backups/[{datetime.datetime.today().strftime('%Y%m%d')}] {file_name}")
-        print("Success")
-    except FileNotFoundError as e:
+    if not os.path.exists("./backups"):
         print("backup directory does not exist. Making /backups/")
-        os.mkdir("./backups")
-        backup_file(file_name)
+        os.makedirs("./backups", exist_ok=True)  # Several files can be backed up at once
+    backup_path = f"./backups/[{datetime.datetime.today().strftime('%Y%m%d')}] {file_name}"
+    temporary_path = f"{backup_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.copyfile(f"{file_directory}{file_name}", temporary_path)
+    os.replace(temporary_path, backup_path)  # An interrupted copy never replaces an earlier backup
+    print(f"Backing up {file_name}...Success")
 
 
-def process_sets(sets: pd.DataFrame,
-                 new_data: pd.DataFrame):
+def split_sets(data: pd.DataFrame,
+               group_frequency: str = "1D"):
+    """Splits a dataset into its sets in a single pass.
+
+    Args:
+        data (pd.DataFrame): Dataframe with at least columns `Date`, `Nuance`, and `Fiber`.
+        group_frequency (str, optional): Date frequency the sets are grouped by. Defaults to "1D".
+
+    Returns:
+        dict: Maps each (date, nuance, hair type) set to the positions of its rows in data.
+    """
+    if data.shape[0] == 0:
+        return {}
+    grouped = data.groupby([pd.Grouper(key="Date", freq=group_frequency), "Nuance", "Fiber"], observed=True)
+    group_ids = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)  # Rows outside every set (e.g. missing nuance) get -1
+    order = np.argsort(group_ids, kind="stable")
+    order = order[group_ids[order] >= 0]
+    boundaries = np.cumsum(np.bincount(group_ids[order]))[:-1]
+    return dict(zip(grouped.size().index.tolist(), np.split(order, boundaries)))
+
+
+DUPLICATE_COLUMNS = ["Nuance", "Fiber", "STD", "Name", "ShadeName", "Formula number"]
+
+
+def find_nearest_standards(data: pd.DataFrame,
+                           group_frequency: str = "1D"):
+    """Finds the closest preceding standard of every comparison in its set, for all sets at once.
+
+    Re-measured data points are left out like `process_set` leaves them out. Comparisons are matched with one
+    `pd.merge_asof` over every set instead of comparing each comparison with each standard.
+
+    Args:
+        data (pd.DataFrame): Marked data points with at least columns "Date", "Nuance", "Fiber", and "STD".
+        group_frequency (str, optional): Date frequency the sets are grouped by. Defaults to "1D".
+
+    Returns:
+        np.ndarray: For every row, the position of the latest standard measured at or before it in its set, or -1
+            for standards, comparisons without a preceding standard, and rows outside every set.
+    """
+    nearest = np.full(data.shape[0], -1, dtype=np.int64)
+    if data.shape[0] == 0:
+        return nearest
+    grouped = data.groupby([pd.Grouper(key="Date", freq=group_frequency), "Nuance", "Fiber"], observed=True)
+    rows = pd.DataFrame({"_set":grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64),
+                         "Date":data["Date"].to_numpy(),
+                         "_position":np.arange(data.shape[0]),
+                         "STD":data["STD"].to_numpy(dtype=bool)})
+    duplicates = data[[column for column in DUPLICATE_COLUMNS if column in data.columns]].assign(_set=rows["_set"].to_numpy())
+    rows = rows[(rows["_set"] >= 0).to_numpy() & ~duplicates.duplicated(keep="last").to_numpy()]
+    standards = rows[rows["STD"]].sort_values("Date", kind="stable")
+    comparisons = rows[~rows["STD"]].sort_values("Date", kind="stable")
+    if standards.shape[0] == 0 or comparisons.shape[0] == 0:
+        return nearest
+    matched = pd.merge_asof(comparisons[["Date", "_set", "_position"]],
+                            standards[["Date", "_set", "_position"]],
+                            on="Date",
+                            by="_set",
+                            direction="backward",
+                            suffixes=("", "_standard"))
+    found = matched["_position_standard"].notna().to_numpy()
+    nearest[matched["_position"].to_numpy()[found]] = matched["_position_standard"].to_numpy()[found].astype(np.int64)
+    return nearest
+
+
+def set_nearest_standards(nearest: np.ndarray,
+                          positions: np.ndarray):
+    """Converts nearest standards from `find_nearest_standards` to rows of one set.
+
+    Args:
+        nearest (np.ndarray): Positions of the nearest standards in the whole data.
+        positions (np.ndarray): Sorted positions of the set's rows, as returned by `split_sets`.
+
+    Returns:
+        np.ndarray: For every row of the set, the row of its nearest standard in the set, or -1.
+    """
+    set_nearest = nearest[positions]
+    return np.where(set_nearest >= 0, np.searchsorted(positions, set_nearest), -1)
+
+
+def process_set(set_data: pd.DataFrame,
+                nearest_standards: np.ndarray = None):
+    """Classifies a single set and reports its comparisons when the set is valid.
+
+    Args:
+        set_data (pd.DataFrame): All data points of one set with a fresh index.
+        nearest_standards (np.ndarray, optional): Row of the nearest preceding standard of every row, as returned by
+            `set_nearest_standards`. When given, sets with several standards report each comparison against its
+            nearest preceding standard instead of being rejected. Defaults to None.
+
+    Returns:
+        tuple: Lists of used rows, (standard, comparisons) pairs to report, and bad comparisons for the set.
+    """
     used_rows = []
     good_comparisons = []
     bad_comparisons = []
-    
+
+    # Only keep the most recent measurement and add the duplicates to the used data points list to not be used again
+    duplicates = set_data.duplicated(subset=DUPLICATE_COLUMNS,
+                                     keep="last")
+    duplicated_rows = set_data[duplicates]
+    used_rows.append(duplicated_rows)
+    set_data = set_data[~duplicates]
+    labels = set_data.index.to_numpy()  # Rows of the set before duplicates were dropped
+    set_data = set_data.reset_index(drop=True)
+
+    if set_data.shape[0] <= 1:  # No comparisons can be made if there is only 1 data point in the set.
+        set_data["Reason"] = "One datapoint"
+        bad_comparisons.append(set_data)
+    elif sum(set_data["STD"]) < 1:  # No standards in the set
+        set_data["Reason"] = "No Standard"
+        bad_comparisons.append(set_data)
+    elif sum(set_data["STD"]) >= 2 and nearest_standards is not None:  # Each comparison against its nearest standard
+        is_standard = set_data["STD"].to_numpy(dtype=bool)
+        matched = np.searchsorted(labels, nearest_standards[labels])  # Rows of the standards after dropping duplicates
+        matched[nearest_standards[labels] < 0] = -1
+        unmatched = ~is_standard & (matched < 0)
+        if unmatched.any():
+            unmatched_rows = set_data[unmatched].reset_index(drop=True)
+            unmatched_rows["Reason"] = "No Preceding Standard"
+            bad_comparisons.append(unmatched_rows)
+        used_rows.append(set_data[~unmatched].reset_index(drop=True))
+        for standard_row in np.flatnonzero(is_standard):
+            comparisons = set_data[~is_standard & (matched == standard_row)]
+            if comparisons.shape[0] > 0:
+                good_comparisons.append((set_data.iloc[[standard_row]], comparisons))
+    elif sum(set_data["STD"]) >= 2:  # Too many standards for comparisons.
+        #TODO Mark the correct filepath in the report file
+        #TODO Generate report of sets that need 'STD' nomenclature correction
+        set_data["Reason"] = "Multiple Standards"
+        bad_comparisons.append(set_data)
+    else:
+        used_rows.append(set_data)
+        standard = set_data.loc[set_data["STD"] == True]
+        comparisons = set_data.loc[set_data["STD"] == False]  # Skips testing standards against themselves
+        good_comparisons.append((standard, comparisons))
+
+    return used_rows, good_comparisons, bad_comparisons
+
+
+PARALLEL_MIN_ROWS = 5000  # Below this, starting the process pool costs more than it saves
+PARTITIONS_PER_WORKER = 4
+
+
+def process_set_partition(partition_data: pd.DataFrame,
+                          partition_sets: list,
+                          nearest_standard: bool = False,
+                          on_set = None):
+    """Processes the sets of one partition in order, in this process or in a worker process.
+
+    Args:
+        partition_data (pd.DataFrame): Every data point of the partition's sets.
+        partition_sets (list): Keys of the partition's sets in the order they are processed.
+        nearest_standard (bool, optional): Matches comparisons to their nearest preceding standard, see
+            `process_set`. Defaults to False.
+        on_set (callable, optional): Called without arguments after each set, _e.g._ to advance a progress bar.
+            Defaults to None.
+
+    Returns:
+        tuple: Used rows, a ReportBuilder holding the good comparisons, and bad comparisons of the partition.
+    """
+    used_rows = []
+    good_comparisons = ReportBuilder()
+    bad_comparisons = []
+    set_positions = split_sets(partition_data)
+    nearest = find_nearest_standards(partition_data) if nearest_standard else None
+    for set_key in partition_sets:
+        set_data = partition_data.iloc[set_positions[set_key]].reset_index(drop=True)
+        set_nearest = None if nearest is None else set_nearest_standards(nearest, set_positions[set_key])
+        set_used_rows, set_good_comparisons, set_bad_comparisons = process_set(set_data, set_nearest)
+        used_rows.extend(set_used_rows)
+        for standard, comparisons in set_good_comparisons:
+            good_comparisons.add_set(standard, comparisons)
+        bad_comparisons.extend(set_bad_comparisons)
+        if on_set is not None:
+            on_set()
+    return used_rows, good_comparisons, bad_comparisons
+
+
+def partition_sets(sets: pd.DataFrame,
+                   set_positions: dict,
+                   partition_count: int):
+    """Splits the sets into consecutive partitions of whole days with about the same number of data points.
+
+    Args:
+        sets (pd.DataFrame): Sets as returned by `get_groups`, sorted by date.
+        set_positions (dict): Positions of the rows of each set as returned by `split_sets`.
+        partition_count (int): Number of partitions wanted. Fewer are returned when there are fewer days.
+
+    Returns:
+        list: Lists of set keys, in the order of sets.
+    """
+    keys = list(sets.itertuples(index=False, name=None))
+    if len(keys) == 0:
+        return []
+    days = sets["Date"].dt.normalize().to_numpy()
+    day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    set_sizes = np.array([len(set_positions[key]) for key in keys])
+    rows_before = (np.cumsum(set_sizes) - set_sizes)[day_starts]
+    targets = set_sizes.sum() * np.arange(1, partition_count) / partition_count
+    # Cuts at the first day boundary past each target so no day is split between partitions
+    found = np.searchsorted(rows_before, targets)
+    cuts = sorted(set(day_starts[found[found < day_starts.size]].tolist()) - {0})
+    return [keys[start:end] for start, end in zip([0] + cuts, cuts + [len(keys)])]
+
+
+@profiled(rows=lambda result, sets, new_data, *args, **kwargs: new_data.shape[0])
+def process_sets(sets: pd.DataFrame,
+                 new_data: pd.DataFrame,
+                 workers: int = 1,
+                 min_parallel_rows: int = PARALLEL_MIN_ROWS,
+                 nearest_standard: bool = False):
+    """Processes every set into used rows, a comparison report, and bad comparisons.
+
+    With several workers, the sets are split into partitions of whole days that are processed in a process pool.
+    The partitions are merged in order, so the results are the same as processing the sets one by one.
+
+    Args:
+        sets (pd.DataFrame): Sets to process as returned by `get_groups`.
+        new_data (pd.DataFrame): Marked data points the sets were found in.
+        workers (int, optional): Number of processes the sets are split across, at most one per CPU. Defaults to 1.
+        min_parallel_rows (int, optional): Fewest data points processed in parallel. Smaller inputs are processed
+            in this process. Defaults to PARALLEL_MIN_ROWS.
+        nearest_standard (bool, optional): Matches each comparison of a set with several standards to its nearest
+            preceding standard, see `process_set`. Defaults to False, rejecting those sets.
+
+    Returns:
+        tuple: List of used rows, the report of good comparisons as one dataframe, and list of bad comparisons.
+    """
+    used_rows = []
+    good_comparisons = ReportBuilder()
+    bad_comparisons = []
+
+    from alive_progress import alive_bar
+
+    set_positions = split_sets(new_data)
+    partitions = []
+    workers = min(workers, os.cpu_count() or 1)
+    if workers > 1 and new_data.shape[0] >= min_parallel_rows:
+        partitions = partition_sets(sets, set_positions, workers * PARTITIONS_PER_WORKER)
+
     print("")
     print("Processing sets...")
     with alive_bar(sets.shape[0]) as bar:
-        for _, row in sets.iterrows():
-        
-            date, nuance, hair_type = row
-            filtered_data = filter_for_group(new_data,
-                                            date,
-                                            nuance,
-                                            hair_type).reset_index(drop=True)
-            # Only keep the most recent measurement and add the duplicates to the used data points list to not be used again
-            duplicates = filtered_data.duplicated(subset=["Nuance", "Fiber", "STD", "Name", "ShadeName","Formula number"],
-                                                  keep="last")
-            duplicated_rows = filtered_data[duplicates]
-            used_rows.append(duplicated_rows)
-            filtered_data = filtered_data.drop_duplicates(subset=["Nuance", "Fiber", "STD", "Name", "ShadeName","Formula number"],
-                                                          keep="last").reset_index(drop=True)
-            
-            if filtered_data.shape[0] <= 1:  # No comparisons can be made if there is only 1 data point in the set.
-                filtered_data["Reason"] = "One datapoint"
-                bad_comparisons.append(filtered_data)
-            elif sum(filtered_data["STD"]) < 1:  # No standards in the set
-                filtered_data["Reason"] = "No Standard"
-                bad_comparisons.append(filtered_data)
-            elif sum(filtered_data["STD"]) >= 2:  # Too many standards for comparisons.
-                #TODO Mark the correct filepath in the report file
-                #TODO Generate report of sets that need 'STD' nomenclature correction
-                filtered_data["Reason"] = "Multiple Standards"
-                bad_comparisons.append(filtered_data)
-                # sets_by_hour = get_groups(filtered_data, group_frequency="H")
-                # print(filtered_data[["Date","Nuance","Fiber","STD","Name","ShadeName"]],"\n",duplicates,"\n",sets_by_hour)
-            else:
-                used_rows.append(filtered_data)
-                standard = filtered_data.loc[filtered_data["STD"] == True]
-                for index in filtered_data.index:
-                    if index == standard.index:  # Skips testing standards against themselves
-                        continue
-                    comparison = filtered_data.loc[index:index+1]
-                    good_comparisons.append(report_comparison(standard, comparison))
-            bar()
+        if len(partitions) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = []
+                for partition in partitions:
+                    positions = np.concatenate([set_positions[set_key] for set_key in partition])
+                    futures.append(pool.submit(process_set_partition, new_data.iloc[np.sort(positions)], partition,
+                                               nearest_standard))
+                for partition, future in zip(partitions, futures):  # Merged in partition order
+                    partition_used_rows, partition_good_comparisons, partition_bad_comparisons = future.result()
+                    used_rows.extend(partition_used_rows)
+                    good_comparisons.extend(partition_good_comparisons)
+                    bad_comparisons.extend(partition_bad_comparisons)
+                    bar(len(partition))
+        else:
+            used_rows, good_comparisons, bad_comparisons = process_set_partition(
+                new_data, list(sets.itertuples(index=False, name=None)), nearest_standard, on_set=bar)
 
     print("")
     
-    return used_rows, good_comparisons, bad_comparisons
+    return used_rows, good_comparisons.to_frame(), bad_comparisons
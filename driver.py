@@ -3,132 +3,444 @@
 """driver.py: Drives the colorshot data automation and colorimetry calculations."""
 
 ## Imports
-from os import path, mkdir
+import time
+_imports_started = time.perf_counter()
+from os import path, mkdir, remove
 import sys
-import string
+import argparse
+import datetime
+from multiprocessing import freeze_support
+import numpy as np
 import pandas as pd
+from file_cache import ParsedFileCache
+from manifest import IngestManifest
+from stores import TableStore
+from streaming import process_files_streaming
+from schema import CompactSchema
+from readers import resolve_reader, READERS
+from profiling import start_profiling, stop_profiling, active_profiler, stage, import_times
+from outputs import write_outputs, write_report_output, write_used_data_output
+from colorimetry_cache import ColorimetryCache, use_cache as use_colorimetry_cache
+from lab_store import LabArrayStore
+from qc import (ToleranceTable,
+                QC_COLUMNS,
+                read_applied_fingerprint,
+                write_applied_fingerprint)
 from data_helpers import (get_filepaths, 
                           get_data, 
-                          get_missing_rows,
+                          key_fingerprints,
+                          REQUIRED_COLUMNS,
+                          KEY_COLUMNS,
                           mark_standards,
                           mark_shade_names,
                           process_sets,
                           get_groups,
-                          write_report,
-                          write_used_data,
                           write_bad_comparisons,
                           backup_file)
+PROGRAM_IMPORT_SECONDS = time.perf_counter() - _imports_started
+DEFERRED_IMPORTS = ["colour.difference", "alive_progress", "openpyxl", "xlsxwriter"]  # Imported by the code paths that use them
 
-def driver():
+
+def report_import_times():
+    """Prints how long the program's imports take, including the imports deferred until they are needed.
+
+    Returns:
+        dict: Seconds taken by the program's own imports and by each deferred import.
+    """
+    times = {"driver":PROGRAM_IMPORT_SECONDS}
+    times.update(import_times(DEFERRED_IMPORTS))
+    print("Import times")
+    for module, seconds in times.items():
+        print(f"  {module:<20} {seconds:>7.3f} s")
+    print(f"  {'total':<20} {sum(times.values()):>7.3f} s")
+    return times
+
+
+def write_profile(output_directory: str,
+                  options: dict):
+    """Stops profiling and writes the run summary, and the cProfile stats if collected, to a profiles folder.
+
+    Args:
+        output_directory (str): Output folder the profiles folder is made in.
+        options (dict): Options the run was started with.
+    """
+    if active_profiler() is None:
+        return
+    profile_directory = f"{output_directory}profiles/"
+    if not path.exists(profile_directory):
+        mkdir(profile_directory)
+    run_name = f"run-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    profiler = stop_profiling(f"{profile_directory}{run_name}.prof")
+    profiler.write_summary(f"{profile_directory}{run_name}.json", options)
+    print(f"Run summary written to {profile_directory}{run_name}.json")
+    if profiler.cprofile is not None:
+        print(f"cProfile stats written to {profile_directory}{run_name}.prof")
+
+
+def driver(bundle_dir: str = None,
+           workers: int = 1,
+           use_cache: bool = True,
+           clear_cache: bool = False,
+           cache_size: int = 1024,
+           incremental: bool = False,
+           export_used_data: bool = False,
+           rebuild_report: bool = False,
+           streaming: bool = False,
+           compact: bool = False,
+           reader: str = None,
+           project: bool = False,
+           since: str = None,
+           profile: bool = False,
+           cprofile: bool = False,
+           colorimetry_cache: bool = False,
+           colorimetry_cache_size: int = 200000,
+           nearest_standard: bool = False,
+           tolerances: str = None,
+           backup_stores: bool = True,
+           data_filepaths: list = None,
+           file_cache: ParsedFileCache = None):
     """Main method of the program.
+
+    Args:
+        bundle_dir (str, optional): Folder holding data_filepaths.confidential and the Output folder. Defaults to
+            None, the folder of the program.
+        workers (int, optional): Number of data files read and parsed at once, and of processes the sets are split
+            across. Defaults to 1.
+        use_cache (bool, optional): Reuses parsed data files that have not changed since the last run. Defaults to True.
+        clear_cache (bool, optional): Empties the parsed file cache before reading. Defaults to False.
+        cache_size (int, optional): Size limit of the parsed file cache in megabytes. Defaults to 1024.
+        incremental (bool, optional): Only reads data files that are new, changed, or still have unused rows, and
+            finds new data with the ingest manifest instead of the full used data. Defaults to False.
+        export_used_data (bool, optional): Writes the used data store out to used_data.xlsx. Defaults to False.
+        rebuild_report (bool, optional): Writes the report workbook even without new comparisons. Defaults to False.
+        streaming (bool, optional): Processes the data one day at a time to bound memory use. Defaults to False.
+        compact (bool, optional): Holds the repeated string columns as shared categoricals and floats as float32
+            where lossless while processing. Defaults to False.
+        reader (str, optional): Spreadsheet reader used for the data files. Defaults to None, using the
+            COLORSHOT_READER environment variable or "auto".
+        project (bool, optional): Only reads the columns in REQUIRED_COLUMNS from the data files. Defaults to False.
+        since (str, optional): Date ("YYYY-MM-DD"); data points measured before it are dropped while the data
+            files are parsed. Defaults to None.
+        profile (bool, optional): Times every stage and writes a JSON run summary to Output/profiles/. Defaults
+            to False.
+        cprofile (bool, optional): Also dumps cProfile stats of the run next to the run summary. Defaults to False.
+        colorimetry_cache (bool, optional): Reuses the colorimetry of standard/comparison pairs calculated in this or
+            earlier runs. Defaults to False.
+        colorimetry_cache_size (int, optional): Most pairs kept in the colorimetry cache. Defaults to 200000.
+        nearest_standard (bool, optional): Reports each comparison of a set with several standards against the
+            latest standard measured before it, instead of rejecting the set. Defaults to False.
+        tolerances (str, optional): Tolerance table (.csv or Excel) every comparison of the report is flagged
+            against. The whole report is written again whenever the tolerances change. Defaults to None, using
+            tolerances.csv in the bundle folder if there is one.
+        backup_stores (bool, optional): Backs up the stores before new data is added to them. Defaults to True.
+        data_filepaths (list, optional): Data files to read. Defaults to None, reading the files listed in
+            data_filepaths.confidential.
+        file_cache (ParsedFileCache, optional): Parsed file cache to use instead of opening the one in the bundle
+            folder, _e.g._ one kept in memory between runs. Defaults to None.
     """
     
+    options = dict(locals())
+    if profile or cprofile:
+        start_profiling(use_cprofile=cprofile)
+    reader = resolve_reader(reader)
+    
     # Get working directory
-    bundle_dir = f"{path.abspath(path.dirname(__file__))}/"
+    if bundle_dir is None:
+        bundle_dir = path.dirname(__file__)
+    bundle_dir = f"{path.abspath(bundle_dir)}/"
+    
+    # Create output directory
+    if not path.exists(f"{bundle_dir}Output"):
+        print(f"Output directory not found. Creating /Output now.")
+        mkdir(f"{bundle_dir}Output")
     
-    # Get data held in the master file
-    print("Getting previous ColorShot entries... ", end="", flush=True)
+    master_store = report_store = manifest = None
     try:
-        master_data = get_data([f"{bundle_dir}Output/used_data.xlsx"], sheet_name="Used Data", include_path=False)
-        print("Success")
-    except FileNotFoundError as e:
-        master_data = pd.DataFrame()
-        print("Did not find a file. Creating a new dataframe.")
-    except PermissionError as e:
-        print("Failed")
-        print("\nThe used_data.xlsx file cannot be accessed. You probably have it open or the permissions for the folder are wonky. Check this and try again.")
-        sys.exit(1)
+        # Open the store of previous ColorShot entries, importing the old master file on the first run
+        master_store = TableStore(f"{bundle_dir}Output/used_data.sqlite", "used_data", key_columns=KEY_COLUMNS)
+        if master_store.is_empty() and path.exists(f"{bundle_dir}Output/used_data.xlsx"):
+            print("Importing previous ColorShot entries from used_data.xlsx... ", end="", flush=True)
+            try:
+                master_store.append(get_data([f"{bundle_dir}Output/used_data.xlsx"], sheet_name="Used Data", include_path=False, reader=reader))
+                print("Success")
+            except PermissionError as e:
+                print("Failed")
+                print("\nThe used_data.xlsx file cannot be accessed. You probably have it open or the permissions for the folder are wonky. Check this and try again.")
+                sys.exit(1)
+        print(f"Found {master_store.count()} previous ColorShot entries.")
+    
+        # Read the QC tolerances, if any
+        if tolerances is None and path.exists(f"{bundle_dir}tolerances.csv"):
+            tolerances = f"{bundle_dir}tolerances.csv"
+        tolerance_table = None
+        if tolerances is not None:
+            try:
+                tolerance_table = ToleranceTable.from_file(tolerances)
+            except (OSError, ValueError) as error:
+                print(f"\nThe tolerances in {tolerances} cannot be used: {error}")
+                sys.exit(1)
+            print(f"Flagging comparisons against the tolerances in {tolerances}.")
+        tolerance_fingerprint = tolerance_table.fingerprint() if tolerance_table is not None else None
+        tolerances_changed = tolerance_fingerprint != read_applied_fingerprint(f"{bundle_dir}Output/")
         
-    # Get data held in the previous report files
-    print("Getting previous report entries... ", end="", flush=True)
-    try:
-        previous_report_data = get_data([f"{bundle_dir}Output/Colorimetry Report.xlsx"], sheet_name="Report", include_path=False)
-        print("Success")
-    except FileNotFoundError as e:
-        previous_report_data = pd.DataFrame()
-        print("Did not find a file. Creating a new dataframe.")
-    except PermissionError as e:
-        print("Failed")
-        print("\nThe Colorimetry Report.xlsx file cannot be accessed. You probably have it open or the permissions for the folder are wonky. Check this and try again.")
-        sys.exit(1)
+        # Open the store of previous report entries, importing the old report file on the first run
+        report_store = TableStore(f"{bundle_dir}Output/report.sqlite", "report")
+        if report_store.is_empty() and path.exists(f"{bundle_dir}Output/Colorimetry Report.xlsx"):
+            print("Importing previous report entries from Colorimetry Report.xlsx... ", end="", flush=True)
+            try:
+                previous_report_data = get_data([f"{bundle_dir}Output/Colorimetry Report.xlsx"], sheet_name="Report", include_path=False, reader=reader)
+                previous_report_data["Date"] = pd.to_datetime(previous_report_data["Date"]).dt.date
+                previous_report_data = previous_report_data.drop(columns=QC_COLUMNS, errors="ignore")  # Recalculated
+                report_store.append(previous_report_data)
+                print("Success")
+            except PermissionError as e:
+                print("Failed")
+                print("\nThe Colorimetry Report.xlsx file cannot be accessed. You probably have it open or the permissions for the folder are wonky. Check this and try again.")
+                sys.exit(1)
     
-    # Get data from the files
-    data_filepaths = get_filepaths(f"{bundle_dir}data_filepaths.confidential")
-    data = get_data(data_filepaths)
+        # Get data from the files
+        if data_filepaths is None:
+            data_filepaths = get_filepaths(f"{bundle_dir}data_filepaths.confidential")
+        cache = file_cache
+        if cache is None:
+            cache = ParsedFileCache(f"{bundle_dir}cache", max_bytes=cache_size * 1024**2)
+        if clear_cache:
+            cache.clear()
+        colorimetry = None
+        if colorimetry_cache:
+            if clear_cache and path.exists(f"{bundle_dir}cache/colorimetry.npz"):
+                remove(f"{bundle_dir}cache/colorimetry.npz")
+            colorimetry = ColorimetryCache(colorimetry_cache_size, f"{bundle_dir}cache/colorimetry.npz")
+            use_colorimetry_cache(colorimetry)
+        manifest = None
+        if incremental:
+            manifest = IngestManifest(f"{bundle_dir}Output/ingest_manifest.sqlite", row_key=",".join(KEY_COLUMNS))
+            file_stats = manifest.files_to_read(data_filepaths)
+            print(f"Found {len(file_stats)} new or changed data files out of {len(data_filepaths)}.")
+            report_missing = not path.exists(f"{bundle_dir}Output/Colorimetry Report.xlsx") and not report_store.is_empty()
+            outputs_pending = rebuild_report or export_used_data or tolerances_changed or report_missing
+            if len(file_stats) == 0 and not outputs_pending:
+                write_profile(f"{bundle_dir}Output/", options)
+                return
+            data_filepaths = list(file_stats)
+        usecols = REQUIRED_COLUMNS if project else None
+        # Back up the stores before any new data is added to them
+        if backup_stores and len(data_filepaths) > 0:
+            backup_file("used_data.sqlite", f"{bundle_dir}Output/")
+            backup_file("report.sqlite", f"{bundle_dir}Output/")
     
-    # Find new data
-    if master_data.columns.size == 0:
-        for column_name in data.columns:
-            master_data = master_data.assign(**{column_name:None})
-    new_data = get_missing_rows(data, master_data)
+        if len(data_filepaths) == 0:  # Nothing to read, only the outputs are written
+            comparison_count = bad_count = 0
+            used_fingerprints = np.array([], dtype=np.uint64)
+            pending_paths = set()
+        elif streaming:
+            # Process the data day by day, adding each day's results to the stores before the next
+            with stage("process_files_streaming", rows=len(data_filepaths)):
+                comparison_count, bad_count, used_fingerprints, pending_paths = process_files_streaming(
+                    data_filepaths,
+                    master_store,
+                    report_store,
+                    f"{bundle_dir}Output/Bad Comparisons.xlsx",
+                    cache=cache if use_cache else None,
+                    compact=compact,
+                    reader=reader,
+                    usecols=usecols,
+                    since=since,
+                    nearest_standard=nearest_standard)
+        else:
+            data = get_data(data_filepaths,
+                            workers=workers,
+                            cache=cache if use_cache else None,
+                            reader=reader,
+                            usecols=usecols,
+                            since=since)
+            if compact:
+                data = CompactSchema.from_frame(data).apply(data)
+        
+            # Find new data
+            with stage("find_new_data", rows=data.shape[0]):
+                if manifest is not None:
+                    if manifest.is_empty() and not master_store.is_empty():  # Seeds the manifest with the used data of earlier runs
+                        manifest.add_rows(key_fingerprints(master_store.read(columns=KEY_COLUMNS)))
+                    new_data = data[~manifest.consumed(key_fingerprints(data))].reset_index(drop=True)
+                else:
+                    new_data = master_store.get_missing_rows(data)
+        
+            # Label new data for colorimetry
+            with stage("mark_names", rows=new_data.shape[0]):
+                new_data = mark_standards(new_data)
+                new_data = mark_shade_names(new_data)
+        
+            # Process sets
+            sets = get_groups(new_data)
+            good_rows, good_comparisons, bad_comparisons = process_sets(sets, new_data, workers=workers,
+                                                                         nearest_standard=nearest_standard)
+        
+            # Handle edge cases where pd.concat() cannot merge list.
+            with stage("store_results", rows=good_comparisons.shape[0]):
+                used_fingerprints = np.array([], dtype=np.uint64)
+                if len(good_rows) > 0:
+                    good_rows = pd.concat(good_rows, ignore_index=True)
+                    used_fingerprints = key_fingerprints(good_rows)
+                    master_store.append(good_rows.drop(columns=["STD", "ShadeName"]))
+                unused = ~np.isin(key_fingerprints(new_data), used_fingerprints)
+                pending_paths = set(new_data.loc[unused, "File Path"])
+                report_store.append(good_comparisons)
+            comparison_count = good_comparisons.shape[0]
+        
+            bad_count = len(bad_comparisons)
     
-    # Label new data for colorimetry
-    new_data = mark_standards(new_data)
-    new_data = mark_shade_names(new_data)
+        if comparison_count == 0:
+            print("No new comparisons found.")
+        if bad_count > 0:
+            print("Some data points could not be assigned a set. Check the 'Bad Comparisons' file for this data.")
+        print("")
+
+        # Write files at the same time, each reading its own connection to the stores
+        writers = {}
+        if not streaming and bad_count > 0:
+            bad_data = pd.concat(bad_comparisons, ignore_index=True)
+            writers["Bad Comparisons.xlsx"] = lambda output_path: write_bad_comparisons(bad_data, output_path)
+        report_needed = comparison_count > 0 or rebuild_report or not path.exists(f"{bundle_dir}Output/Colorimetry Report.xlsx")
+        if tolerances_changed:
+            print("The tolerances changed since the report was written. Flagging every comparison again.")
+            report_needed = True
+        if report_needed and not report_store.is_empty():
+            writers["Colorimetry Report.xlsx"] = lambda output_path: write_report_output(bundle_dir, output_path,
+                                                                                         tolerance_table)
+        elif report_needed:  # No comparisons to write or flag yet
+            write_applied_fingerprint(f"{bundle_dir}Output/", tolerance_fingerprint)
+        if export_used_data:
+            writers["used_data.xlsx"] = lambda output_path: write_used_data_output(bundle_dir, output_path)
+        with stage("sync_lab_store", rows=comparison_count):  # Keeps the Lab values for `driver.py rebuild-report`
+            LabArrayStore(f"{bundle_dir}Output/lab_store").sync(report_store)
+        master_store.close()
+        report_store.close()
+        with stage("write_outputs", rows=len(writers)):
+            results = write_outputs(f"{bundle_dir}Output/", writers, backups=["Colorimetry Report.xlsx", "used_data.xlsx"])
+        failed = [file_name for file_name, result in results.items() if isinstance(result, Exception)]
+        if "Colorimetry Report.xlsx" in results and "Colorimetry Report.xlsx" not in failed:
+            write_applied_fingerprint(f"{bundle_dir}Output/", tolerance_fingerprint)
+        for file_name in failed:
+            print(f"\n{file_name} could not be written: {results[file_name]}")
+            if isinstance(results[file_name], PermissionError):
+                print("Close it if it is open in Excel and run the program again with --rebuild-report or "
+                      "--export-used-data.")
     
-    # Process sets
-    sets = get_groups(new_data)
-    good_rows, good_comparisons, bad_comparisons = process_sets(sets, new_data)
+        # Record consumed data so the next run can skip it
+        if manifest is not None:
+            manifest.add_rows(used_fingerprints)
+            manifest.record_files(file_stats, pending_paths)
+            manifest.close()
     
-    # Handle edge cases where pd.concat() cannot merge list.
-    write_used_data_flag = True
-    if len(good_rows) == 0:
-        write_used_data_flag = False
-    elif len(good_rows) == 1:
-        used_data = good_rows[0]
-    else:
-        good_rows = pd.concat(good_rows, ignore_index=True)
-        used_data = pd.concat([master_data, good_rows], ignore_index=True)
+        if colorimetry is not None:
+            colorimetry.save()
     
-    write_report_flag = True
-    if len(good_comparisons) == 0:
-        print("No new comparisons found.")
-        write_report_flag = False
-    elif len(good_comparisons) == 1:
-        good_comparisons = good_comparisons[0]
-    else:            
-        good_comparisons = pd.concat(good_comparisons, ignore_index=True)
+        if active_profiler() is not None:
+            active_profiler().count("import_seconds", PROGRAM_IMPORT_SECONDS)
+            active_profiler().count("data_files", len(data_filepaths))
+            active_profiler().count("new_comparisons", comparison_count)
+            active_profiler().count("bad_comparisons", bad_count)
+            active_profiler().count("file_cache_hits", cache.hits)
+            active_profiler().count("file_cache_misses", cache.misses)
+            if colorimetry is not None:
+                active_profiler().count("colorimetry_cache_hits", colorimetry.hits)
+                active_profiler().count("colorimetry_cache_misses", colorimetry.misses)
+        write_profile(f"{bundle_dir}Output/", options)
+    finally:  # Also runs when the run fails, _e.g._ in watch mode where the program keeps running
+        for connection in [master_store, report_store, manifest]:
+            if connection is not None:
+                connection.close()
+        use_colorimetry_cache(None)
+        if active_profiler() is not None:
+            stop_profiling()
     
-    write_bad_comparisons_flag = True
-    if len(bad_comparisons) == 0:
-        write_bad_comparisons_flag = False
-    elif len(bad_comparisons) == 1:
-        bad_comparisons = bad_comparisons[0]
-        print("Some data points could not be assigned a set. Check the 'Bad Comparisons' file for this data.")
-    else:
-        bad_comparisons = pd.concat(bad_comparisons, ignore_index=True)
-        print("Some data points could not be assigned a set. Check the 'Bad Comparisons' file for this data.")
-    print("")
-
-    # Process previous report data
-    if previous_report_data.columns.size == 0:  # File did not exist
-        for column_name in good_comparisons.columns:
-            previous_report_data = previous_report_data.assign(**{column_name:None})
-
-    # Back up files
-    backup_file("used_data.xlsx", f"{bundle_dir}Output/")
-    backup_file("Colorimetry Report.xlsx", f"{bundle_dir}Output/")
 
-    # Create output directory
-    if not path.exists(f"{bundle_dir}Output"):
-        print(f"Output directory not found. Creating /Output now.")
-        mkdir(f"{bundle_dir}Output")
+def parse_args(argv: list = None):
+    """Parses the command line options of the program.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to None, using sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Compiles Colorshot data files and reports their colorimetry. "
+                                                 "Run `driver.py query --help` to look up past results, and "
+                                                 "`driver.py rebuild-report --help` to recalculate every comparison.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of data files read and parsed at once, and of processes the sets are split across (default: 1).")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Parse every data file instead of reusing the parsed file cache.")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Empty the parsed file cache before reading the data files.")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Size limit of the parsed file cache in megabytes (default: 1024).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only read data files that are new, changed, or still have unused data points.")
+    parser.add_argument("--export-used-data", action="store_true",
+                        help="Write the used data store out to Output/used_data.xlsx.")
+    parser.add_argument("--rebuild-report", action="store_true",
+                        help="Write Output/Colorimetry Report.xlsx from the report store even without new comparisons.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Process the data one day at a time so memory use is bounded by the largest day.")
+    parser.add_argument("--reader", choices=["auto"] + list(READERS),
+                        help="Spreadsheet reader for the data files (default: $COLORSHOT_READER or auto, the fastest "
+                             "installed reader falling back to pandas).")
+    parser.add_argument("--project", action="store_true",
+                        help="Only read the columns the colorimetry and report need from the data files.")
+    parser.add_argument("--since", metavar="YYYY-MM-DD",
+                        help="Skip data points measured before this date while reading the data files.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every stage and write a JSON run summary to Output/profiles/.")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="Also dump cProfile stats of the run to Output/profiles/.")
+    parser.add_argument("--compact", action="store_true",
+                        help="Hold repeated strings as categoricals and floats as float32 where lossless to save memory.")
+    parser.add_argument("--colorimetry-cache", action="store_true",
+                        help="Reuse the colorimetry of standard/comparison pairs calculated before, kept in cache/colorimetry.npz. "
+                             "Only faster when the same pairs are calculated again; slows down a first run.")
+    parser.add_argument("--colorimetry-cache-size", type=int, default=200000,
+                        help="Most standard/comparison pairs kept in the colorimetry cache (default: 200000).")
+    parser.add_argument("--tolerances", metavar="PATH",
+                        help="Tolerance table (.csv or Excel) the comparisons are flagged against (default: "
+                             "tolerances.csv next to the program, if there is one).")
+    parser.add_argument("--nearest-standard", action="store_true",
+                        help="Compare each data point of a set with several standards against the latest standard "
+                             "measured before it instead of rejecting the set.")
+    parser.add_argument("--import-times", action="store_true",
+                        help="Print how long the program's imports take and exit.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and update the report whenever a data file or a workbook in the drop folder changes.")
+    parser.add_argument("--drop-folder",
+                        help="Folder whose workbooks are read along with the listed data files in watch mode.")
+    parser.add_argument("--poll-interval", type=float, default=2.0,
+                        help="Seconds between checks for changes in watch mode (default: 2).")
+    parser.add_argument("--debounce", type=float, default=5.0,
+                        help="Seconds the files must stay unchanged before the report is updated in watch mode (default: 5).")
+    return parser.parse_args(argv)
 
-    # Write files
-    if write_used_data_flag:
-        write_used_data(used_data,
-                        f"{bundle_dir}Output/used_data.xlsx")
-    if write_report_flag:
-        report_data = pd.concat([previous_report_data, good_comparisons])
-        write_report(report_data,
-                     f"{bundle_dir}Output/Colorimetry Report.xlsx")
-    if write_bad_comparisons_flag:
-        write_bad_comparisons(bad_comparisons,
-                              f"{bundle_dir}Output/Bad Comparisons.xlsx")
-    
 
 ## Main
 if __name__ == "__main__":
-    driver()
+    freeze_support()  # Lets the process pool start workers from the frozen executable
+    if sys.argv[1:2] == ["query"]:
+        from query import main as query
+        sys.exit(query(sys.argv[2:]))
+    if sys.argv[1:2] == ["rebuild-report"]:
+        from lab_store import main as rebuild_report
+        sys.exit(rebuild_report(sys.argv[2:]))
+    options = vars(parse_args())
+    watch_options = {"drop_folder":options.pop("drop_folder"),
+                     "poll_seconds":options.pop("poll_interval"),
+                     "debounce_seconds":options.pop("debounce")}
+    if options.pop("import_times"):
+        report_import_times()
+        sys.exit(0)
+    if options.pop("watch"):
+        from watcher import watch
+        watch(**watch_options, **options)
+        sys.exit(0)
+    driver(**options)
     print("\nFinished. Press enter to exit the program.\n")
     input()
\ No newline at end of file
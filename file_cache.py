@@ -0,0 +1,136 @@
+"""file_cache.py: Keeps parsed data files on disk so unchanged workbooks are not parsed again."""
+
+## Imports
+import os
+import glob
+import hashlib
+from collections import OrderedDict
+import pandas as pd
+
+
+class ParsedFileCache:
+    """On-disk cache of parsed spreadsheet sheets.
+
+    Entries are keyed by the absolute file path, sheet name, modification time, and size of the source file,
+    so editing or replacing a data file invalidates its entry. The least recently used entries are evicted once
+    the cache grows past max_bytes. The most recently used entries can also be kept in memory for processes that
+    read the same files again and again.
+    """
+
+    def __init__(self,
+                 cache_directory: str,
+                 max_bytes: int = 1024**3,
+                 memory_entries: int = 0):
+        """
+        Args:
+            cache_directory (str): Directory the cache entries are stored in. Created if missing.
+            max_bytes (int, optional): Size the cache is trimmed down to after every store. Defaults to 1 GiB.
+            memory_entries (int, optional): Number of parsed sheets also kept in memory. Defaults to 0.
+        """
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def _entry_prefix(self,
+                      file_path: str,
+                      sheet_name: str,
+                      variant: str = ""):
+        key = f"{os.path.abspath(file_path)}|{sheet_name}"
+        if variant:
+            key += f"|{variant}"
+        key = key.encode("utf-8")
+        return os.path.join(self.cache_directory, hashlib.sha1(key).hexdigest())
+
+    def lookup(self,
+               file_path: str,
+               sheet_name: str,
+               variant: str = ""):
+        """Finds the cached sheet of a file if the file has not changed since it was cached.
+
+        Args:
+            file_path (str): Path of the source file.
+            sheet_name (str): Sheet that was parsed.
+            variant (str, optional): Describes any projection or filtering applied while parsing. Defaults to "".
+
+        Returns:
+            tuple: The entry path to store a freshly parsed frame under, and the cached frame or None on a miss.
+        """
+        stat = os.stat(file_path)
+        entry_path = f"{self._entry_prefix(file_path, sheet_name, variant)}-{stat.st_mtime_ns}-{stat.st_size}.pkl"
+        if entry_path in self._memory:
+            self._memory.move_to_end(entry_path)
+            self.hits += 1
+            return entry_path, self._memory[entry_path].copy()  # Callers add columns to the frames they get
+        if os.path.exists(entry_path):
+            try:
+                frame = pd.read_pickle(entry_path)
+            except Exception:  # A corrupt or unreadable entry is treated as a miss and overwritten.
+                pass
+            else:
+                os.utime(entry_path)  # Marks the entry as recently used for eviction
+                self._remember(entry_path, frame)
+                self.hits += 1
+                return entry_path, frame
+        self.misses += 1
+        return entry_path, None
+
+    def store(self,
+              entry_path: str,
+              frame: pd.DataFrame):
+        """Stores a parsed frame and removes stale entries of the same file and sheet.
+
+        Args:
+            entry_path (str): Entry path returned by `lookup`.
+            frame (pd.DataFrame): The parsed sheet.
+        """
+        prefix = entry_path.rsplit("-", 2)[0]
+        for stale_path in glob.glob(f"{glob.escape(prefix)}-*.pkl"):
+            if stale_path != entry_path:
+                os.remove(stale_path)
+        temporary_path = f"{entry_path}.tmp"
+        frame.to_pickle(temporary_path)
+        os.replace(temporary_path, entry_path)
+        self._remember(entry_path, frame)
+        self.evict()
+
+    def _remember(self,
+                  entry_path: str,
+                  frame: pd.DataFrame):
+        """Keeps a copy of a frame in memory, forgetting older versions of the same file and the least recently used."""
+        if self.memory_entries <= 0:
+            return
+        prefix = entry_path.rsplit("-", 2)[0]
+        for stale_path in [path for path in self._memory if path.rsplit("-", 2)[0] == prefix]:
+            del self._memory[stale_path]
+        self._memory[entry_path] = frame.copy()
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def entries(self):
+        """Returns the paths of all cache entries from least to most recently used."""
+        return sorted(glob.glob(os.path.join(glob.escape(self.cache_directory), "*.pkl")),
+                      key=os.path.getmtime)
+
+    def size(self):
+        """Returns the total size of the cache entries in bytes."""
+        return sum(os.path.getsize(entry_path) for entry_path in self.entries())
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entry_paths = self.entries()
+        total_size = sum(os.path.getsize(entry_path) for entry_path in entry_paths)
+        for entry_path in entry_paths:
+            if total_size <= self.max_bytes:
+                break
+            total_size -= os.path.getsize(entry_path)
+            os.remove(entry_path)
+
+    def clear(self):
+        """Removes every cache entry."""
+        self._memory.clear()
+        for entry_path in self.entries():
+            os.remove(entry_path)
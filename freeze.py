@@ -2,7 +2,11 @@ from cx_Freeze import setup, Executable
 
 # Dependencies are automatically detected, but it might need
 # fine tuning.
-build_options = {'packages': [], 'excludes': [], 'include_files':["data_filepaths.confidential"]}
+# Packages the program never imports are excluded to keep the executable small and quick to start.
+build_options = {'packages': [],
+                 'excludes': ['tkinter', 'matplotlib', 'IPython', 'pytest', '_pytest', 'progressbar',
+                              'benchmarks', 'tests', 'pydoc_data', 'lib2to3'],
+                 'include_files':["data_filepaths.confidential"]}
 
 base = 'console'
 
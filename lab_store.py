@@ -0,0 +1,276 @@
+"""lab_store.py: Keeps the Lab values of every reported standard/comparison pair in memory-mapped arrays."""
+
+## Imports
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from data_helpers import LAB_COLUMNS, METRIC_COLUMNS, calculate_colorimetry_batch
+
+VERSION = 1
+SAMPLE_WIDTH = len(LAB_COLUMNS)
+
+
+class LabArrayStore:
+    """Lab values of the report's standard/comparison pairs, kept next to the report store as flat binary arrays.
+
+    samples.f64 holds the distinct L*, a*, b* rows of each batch of pairs. pairs.i64 holds the sample rows of each
+    pair's standard and comparison, and rowids.i64 the report store row of each pair. The arrays are only ever
+    appended to and are read through `np.memmap`, so recalculating every metric reads the pairs a batch at a time
+    without parsing any workbook or holding the history in memory. The counts in lab_store.json are written last,
+    so an interrupted append is ignored.
+    """
+
+    def __init__(self,
+                 directory: str):
+        """
+        Args:
+            directory (str): Folder of the arrays. Created if missing.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.sample_count = 0
+        self.pair_count = 0
+        self._load_counts()
+
+    def _path(self,
+              name: str):
+        return os.path.join(self.directory, name)
+
+    def _load_counts(self):
+        """Reads the counts of complete rows, resetting the store if they do not match the arrays."""
+        if not os.path.exists(self._path("lab_store.json")):
+            self.reset()
+            return
+        try:
+            with open(self._path("lab_store.json")) as file:
+                counts = json.load(file)
+        except (OSError, ValueError):
+            counts = {}
+        sizes = {name:os.path.getsize(self._path(name)) if os.path.exists(self._path(name)) else -1
+                 for name in ["samples.f64", "pairs.i64", "rowids.i64"]}
+        if (counts.get("version") != VERSION
+                or sizes["samples.f64"] < counts.get("samples", 0) * SAMPLE_WIDTH * 8
+                or sizes["pairs.i64"] < counts.get("pairs", 0) * 2 * 8
+                or sizes["rowids.i64"] < counts.get("pairs", 0) * 8):
+            self.reset()
+            return
+        self.sample_count = counts["samples"]
+        self.pair_count = counts["pairs"]
+
+    def _write_counts(self):
+        temporary_path = self._path("lab_store.json.tmp")
+        with open(temporary_path, "w") as file:
+            json.dump({"version":VERSION, "samples":self.sample_count, "pairs":self.pair_count}, file)
+        os.replace(temporary_path, self._path("lab_store.json"))
+
+    def __len__(self):
+        return self.pair_count
+
+    def reset(self):
+        """Empties the store."""
+        for name in ["samples.f64", "pairs.i64", "rowids.i64"]:
+            open(self._path(name), "wb").close()
+        self.sample_count = 0
+        self.pair_count = 0
+        self._write_counts()
+
+    def _array(self,
+               name: str,
+               dtype,
+               count: int,
+               width: int = None):
+        """Maps the complete rows of an array read-only. Empty arrays cannot be mapped, so they are made instead."""
+        shape = (count,) if width is None else (count, width)
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._path(name), dtype=dtype, mode="r", shape=shape)
+
+    def samples(self):
+        """Returns the (samples, 3) array of L*, a*, b* values."""
+        return self._array("samples.f64", np.float64, self.sample_count, SAMPLE_WIDTH)
+
+    def pairs(self):
+        """Returns the (pairs, 2) array of the standard and comparison sample of each pair."""
+        return self._array("pairs.i64", np.int64, self.pair_count, 2)
+
+    def rowids(self):
+        """Returns the report store rowid of each pair."""
+        return self._array("rowids.i64", np.int64, self.pair_count)
+
+    def _append_to(self,
+                   name: str,
+                   values: np.ndarray,
+                   count: int):
+        """Writes values after the complete rows of an array, over anything an interrupted append left."""
+        with open(self._path(name), "r+b") as file:
+            file.seek(count * values.itemsize * (values.shape[1] if values.ndim == 2 else 1))
+            file.write(np.ascontiguousarray(values).tobytes())
+            file.truncate()
+
+    def append(self,
+               rowids: np.ndarray,
+               std_lab: np.ndarray,
+               comparison_lab: np.ndarray):
+        """Appends pairs, storing each distinct Lab row of the batch once.
+
+        Args:
+            rowids (np.ndarray): Report store rowid of each pair, after the last rowid in the store.
+            std_lab (np.ndarray): (pairs, 3) standard L*, a*, b* values.
+            comparison_lab (np.ndarray): (pairs, 3) comparison L*, a*, b* values.
+        """
+        if len(rowids) == 0:
+            return
+        samples, inverse = np.unique(np.vstack([std_lab, comparison_lab]).astype(np.float64),
+                                     axis=0, return_inverse=True)
+        pairs = inverse.reshape(-1).reshape(2, -1).T + self.sample_count
+        self._append_to("samples.f64", samples, self.sample_count)
+        self._append_to("pairs.i64", pairs.astype(np.int64), self.pair_count)
+        self._append_to("rowids.i64", np.asarray(rowids, dtype=np.int64), self.pair_count)
+        self.sample_count += samples.shape[0]
+        self.pair_count += len(rowids)
+        self._write_counts()
+
+    def sync(self,
+             report_store,
+             batch_size: int = 100000):
+        """Appends the pairs of report rows added since the last sync.
+
+        The first sync fills the store from the whole report. A store that does not match the report, _e.g._
+        because the report store was replaced, is filled again from scratch.
+
+        Args:
+            report_store (stores.TableStore): Report store with the L*, a*, b* Standard and Comparison columns.
+            batch_size (int, optional): Report rows read at a time. Defaults to 100000.
+
+        Returns:
+            int: Number of pairs appended.
+        """
+        last_rowid = int(self.rowids()[-1]) if len(self) > 0 else 0
+        if len(self) > 0 and (report_store.count() < len(self)
+                              or len(report_store.rowids("rowid = ?", (last_rowid,))) == 0):
+            self.reset()
+            last_rowid = 0
+        new_rowids = report_store.rowids("rowid > ?", (last_rowid,))
+        columns = [f"{field} Standard" for field in LAB_COLUMNS] + [f"{field} Comparison" for field in LAB_COLUMNS]
+        for start in range(0, len(new_rowids), batch_size):
+            batch_rowids = new_rowids[start:start + batch_size]
+            batch = report_store.read("rowid BETWEEN ? AND ?", (int(batch_rowids[0]), int(batch_rowids[-1])), columns)
+            lab = batch.reindex(columns=columns).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+            self.append(batch_rowids, lab[:, :SAMPLE_WIDTH], lab[:, SAMPLE_WIDTH:])
+        return len(new_rowids)
+
+    def recalculate(self,
+                    batch_size: int = 1000000):
+        """Calculates every metric again from the stored Lab values, one vectorized batch of pairs at a time.
+
+        Args:
+            batch_size (int, optional): Pairs calculated at once. Defaults to 1000000.
+
+        Yields:
+            tuple: Report store rowids of the batch and a dataframe of their METRIC_COLUMNS.
+        """
+        samples = self.samples()
+        pairs = self.pairs()
+        rowids = self.rowids()
+        for start in range(0, len(self), batch_size):
+            batch_pairs = np.asarray(pairs[start:start + batch_size])
+            metrics = calculate_colorimetry_batch(np.asarray(samples[batch_pairs[:, 0]]),
+                                                  np.asarray(samples[batch_pairs[:, 1]]))
+            yield np.asarray(rowids[start:start + batch_size]), pd.DataFrame(dict(zip(METRIC_COLUMNS, metrics)))
+
+
+def rebuild_report(bundle_dir: str,
+                   tolerances: str = None,
+                   batch_size: int = 1000000):
+    """Calculates every reported metric again from the Lab store and writes the report workbook.
+
+    Used after the colorimetry formula or its rounding changes. The colorimetry cache is removed, since its metrics
+    were calculated the old way.
+
+    Args:
+        bundle_dir (str): Folder holding the Output folder, ending in a separator.
+        tolerances (str, optional): Tolerance table the report is flagged against, see `driver.driver`. Defaults
+            to None, using tolerances.csv in the bundle folder if there is one.
+        batch_size (int, optional): Pairs calculated at once. Defaults to 1000000.
+
+    Returns:
+        int: Number of comparisons recalculated.
+    """
+    from stores import TableStore
+    from outputs import write_outputs, write_report_output
+    from qc import ToleranceTable, write_applied_fingerprint
+    from colorimetry_cache import use_cache
+
+    output_directory = f"{bundle_dir}Output/"
+    if not os.path.exists(f"{output_directory}report.sqlite"):
+        raise FileNotFoundError(f"No report.sqlite in {output_directory}. Run the program first.")
+    if tolerances is None and os.path.exists(f"{bundle_dir}tolerances.csv"):
+        tolerances = f"{bundle_dir}tolerances.csv"
+    tolerance_table = ToleranceTable.from_file(tolerances) if tolerances is not None else None
+
+    report_store = TableStore(f"{output_directory}report.sqlite", "report")
+    lab_store = LabArrayStore(f"{output_directory}lab_store")
+    try:
+        added = lab_store.sync(report_store)
+        if added > 0:
+            print(f"Added {added} comparisons to the Lab store.")
+        use_cache(None)  # Cached metrics may come from the old calculation
+        if os.path.exists(f"{bundle_dir}cache/colorimetry.npz"):
+            os.remove(f"{bundle_dir}cache/colorimetry.npz")
+        print(f"Recalculating the colorimetry of {len(lab_store)} comparisons... ", end="", flush=True)
+        for rowids, metrics in lab_store.recalculate(batch_size):
+            report_store.update(rowids, metrics)
+        print("Success")
+    finally:
+        report_store.close()
+
+    results = write_outputs(output_directory,
+                            {"Colorimetry Report.xlsx":lambda output_path: write_report_output(bundle_dir,
+                                                                                               output_path,
+                                                                                               tolerance_table)},
+                            backups=["Colorimetry Report.xlsx"])
+    if not isinstance(results["Colorimetry Report.xlsx"], Exception):
+        write_applied_fingerprint(output_directory,
+                                  tolerance_table.fingerprint() if tolerance_table is not None else None)
+    return len(lab_store)
+
+
+def parse_args(argv: list = None):
+    """Parses the command line options of the rebuild-report command.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to None, using sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(prog="driver.py rebuild-report",
+                                     description="Calculates the colorimetry of every reported comparison again from "
+                                                 "the stored Lab values and writes the report, without reading any "
+                                                 "data file.")
+    parser.add_argument("--bundle-dir", default=os.path.dirname(os.path.abspath(__file__)),
+                        help="Folder holding the Output folder (default: the folder of the program).")
+    parser.add_argument("--tolerances", metavar="PATH",
+                        help="Tolerance table the comparisons are flagged against (default: tolerances.csv next to "
+                             "the program, if there is one).")
+    parser.add_argument("--batch-size", type=int, default=1000000,
+                        help="Comparisons calculated at once (default: 1000000).")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    try:
+        rebuild_report(f"{os.path.abspath(args.bundle_dir)}/", args.tolerances, args.batch_size)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 1
+    return 0
+
+
+## Main
+if __name__ == "__main__":
+    sys.exit(main())
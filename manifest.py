@@ -0,0 +1,109 @@
+"""manifest.py: Records which data files and data points have already been consumed by previous runs."""
+
+## Imports
+import os
+import sqlite3
+import numpy as np
+
+
+class IngestManifest:
+    """SQLite manifest of consumed data files and row fingerprints.
+
+    A file is only read again when it is new, when its modification time or size changed, or when some of its rows
+    could not be used yet (e.g. they ended up in the bad comparisons). Rows are identified by their fingerprints
+    from `data_helpers.row_fingerprints`.
+    """
+
+    def __init__(self,
+                 manifest_path: str,
+                 row_key: str = ""):
+        """
+        Args:
+            manifest_path (str): Path of the SQLite manifest file. Created if missing.
+            row_key (str, optional): Describes which columns the row fingerprints cover. Recorded fingerprints are
+                dropped when it changes, so the manifest can be seeded again. Defaults to "".
+        """
+        self.manifest_path = manifest_path
+        self.connection = sqlite3.connect(manifest_path)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS files ("
+                                    "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, pending INTEGER)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS rows (fingerprint INTEGER PRIMARY KEY)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("CREATE TEMP TABLE candidates (fingerprint INTEGER)")
+            recorded = self.connection.execute("SELECT value FROM settings WHERE name = 'row_key'").fetchone()
+            if recorded is None or recorded[0] != row_key:
+                self.connection.execute("DELETE FROM rows")
+                self.connection.execute("INSERT OR REPLACE INTO settings VALUES ('row_key', ?)", (row_key,))
+
+    def close(self):
+        self.connection.close()
+
+    def is_empty(self):
+        """Returns True if no rows have been recorded as consumed yet."""
+        return self.connection.execute("SELECT 1 FROM rows LIMIT 1").fetchone() is None
+
+    def files_to_read(self,
+                      file_paths: list):
+        """Finds the data files that are new, changed, or still have unused rows.
+
+        Args:
+            file_paths (list): All data file paths.
+
+        Returns:
+            dict: Maps each file path to read to its (mtime_ns, size) at the time of the check.
+        """
+        recorded = {path:(mtime_ns, size, pending)
+                    for path, mtime_ns, size, pending in self.connection.execute("SELECT * FROM files")}
+        to_read = {}
+        for path in file_paths:
+            stat = os.stat(path)
+            current = (stat.st_mtime_ns, stat.st_size)
+            if path not in recorded or recorded[path][:2] != current or recorded[path][2]:
+                to_read[path] = current
+        return to_read
+
+    def consumed(self,
+                 fingerprints: np.ndarray):
+        """Checks which row fingerprints have already been consumed.
+
+        Args:
+            fingerprints (np.ndarray): Row fingerprints to check.
+
+        Returns:
+            np.ndarray: Boolean mask that is True for consumed rows.
+        """
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64).view(np.int64)
+        with self.connection:
+            self.connection.execute("DELETE FROM candidates")
+            self.connection.executemany("INSERT INTO candidates VALUES (?)",
+                                        ((int(fingerprint),) for fingerprint in fingerprints))
+            found = [row[0] for row in self.connection.execute(
+                "SELECT DISTINCT candidates.fingerprint FROM candidates JOIN rows USING (fingerprint)")]
+        return np.isin(fingerprints, np.array(found, dtype=np.int64))
+
+    def add_rows(self,
+                 fingerprints: np.ndarray):
+        """Records row fingerprints as consumed.
+
+        Args:
+            fingerprints (np.ndarray): Fingerprints of the consumed rows.
+        """
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64).view(np.int64)
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO rows VALUES (?)",
+                                        ((int(fingerprint),) for fingerprint in fingerprints))
+
+    def record_files(self,
+                     file_stats: dict,
+                     pending_paths: set = frozenset()):
+        """Records files as read.
+
+        Args:
+            file_stats (dict): Maps file paths to the (mtime_ns, size) returned by `files_to_read`.
+            pending_paths (set, optional): Files that still have unused rows and must be read next time.
+        """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                        ((path, mtime_ns, size, int(path in pending_paths))
+                                         for path, (mtime_ns, size) in file_stats.items()))
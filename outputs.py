@@ -0,0 +1,112 @@
+"""outputs.py: Writes the output workbooks from the stores, and their backups, at the same time through temporary files."""
+
+## Imports
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from stores import TableStore
+from qc import ToleranceTable, QC_COLUMNS, summarize as summarize_qc
+from data_helpers import KEY_COLUMNS, backup_file, write_report_rows, write_used_data
+
+
+@contextmanager
+def atomic_path(file_path: str):
+    """Yields a temporary path next to file_path that replaces file_path once the block finishes without an error.
+
+    A crash while writing leaves the previous file in place instead of a half written one.
+
+    Args:
+        file_path (str): Path of the file to write.
+
+    Yields:
+        str: Temporary path to write to. Removed if the block fails.
+    """
+    directory, name = os.path.split(file_path)
+    root, extension = os.path.splitext(name)
+    temporary_path = os.path.join(directory, f"{root}.tmp-{os.getpid()}-{threading.get_ident()}{extension}")
+    try:
+        yield temporary_path
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def _write_output(output_directory: str,
+                  file_name: str,
+                  writer,
+                  backup: bool):
+    start = time.perf_counter()
+    if backup:
+        backup_file(file_name, output_directory)
+    with atomic_path(os.path.join(output_directory, file_name)) as temporary_path:
+        writer(temporary_path)
+    return time.perf_counter() - start
+
+
+def write_outputs(output_directory: str,
+                  writers: dict,
+                  backups: list = (),
+                  workers: int = None):
+    """Backs up and writes several output files at the same time.
+
+    Each file is backed up first, if asked, then written to a temporary file that replaces it once complete. A
+    file that fails is reported and does not stop the others.
+
+    Args:
+        output_directory (str): Folder of the output files, ending in a separator.
+        writers (dict): Maps each file name to a function writing the file to the path it is given.
+        backups (list, optional): Names of the files backed up before they are replaced. Defaults to ().
+        workers (int, optional): Files written at once. Defaults to None, all of them.
+
+    Returns:
+        dict: Maps each file name to the seconds it took, or to the exception it failed with.
+    """
+    results = {}
+    if len(writers) == 0:
+        return results
+    print(f"Writing {', '.join(writers)}...")
+    with ThreadPoolExecutor(max_workers=workers or len(writers)) as pool:
+        futures = {pool.submit(_write_output, output_directory, file_name, writer, file_name in backups):file_name
+                   for file_name, writer in writers.items()}
+        for future in as_completed(futures):
+            file_name = futures[future]
+            try:
+                results[file_name] = future.result()
+            except Exception as error:
+                results[file_name] = error
+                print(f"  {file_name} could not be written: {error!r}")
+            else:
+                print(f"  {file_name} written in {results[file_name]:.1f} s")
+    return {file_name:results[file_name] for file_name in writers}
+
+
+def write_report_output(bundle_dir: str,
+                        output_path: str,
+                        tolerances: ToleranceTable = None):
+    """Writes the report workbook from the report store, flagging every comparison against the tolerances if given."""
+    report_store = TableStore(f"{bundle_dir}Output/report.sqlite", "report")
+    try:
+        rows = report_store.iter_rows(order_by=["Date", "FLA Comparison"])
+        if tolerances is None:
+            write_report_rows(rows, report_store.columns, output_path)
+            return
+        counts = []
+        write_report_rows(tolerances.evaluate_rows(rows, report_store.columns, counts),
+                          report_store.columns + QC_COLUMNS,
+                          output_path,
+                          extra_sheets=lambda: {"QC Summary":summarize_qc(counts)})
+    finally:
+        report_store.close()
+
+
+def write_used_data_output(bundle_dir: str,
+                           output_path: str):
+    """Writes the used data workbook from the used data store."""
+    master_store = TableStore(f"{bundle_dir}Output/used_data.sqlite", "used_data", key_columns=KEY_COLUMNS)
+    try:
+        write_used_data(master_store.read(), output_path)
+    finally:
+        master_store.close()
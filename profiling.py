@@ -0,0 +1,222 @@
+"""profiling.py: Times the stages of a run and writes a JSON run summary to track performance between runs."""
+
+## Imports
+import sys
+import json
+import time
+import datetime
+import cProfile
+import functools
+import importlib
+import threading
+from contextlib import contextmanager
+
+_active = None  # Profiler of the current run, None when profiling is off
+
+
+def peak_rss_bytes():
+    """Returns the peak resident set size of the process in bytes, or None if it cannot be measured."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        pass
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss)
+
+
+class Profiler:
+    """Records the wall time, CPU time, peak RSS, and row count of every stage of a run.
+
+    Stages can be nested. Each stage records the stage it ran in, so totals are only summed over top level stages.
+    Stages run in other threads record the stage open in their own thread.
+    """
+
+    def __init__(self,
+                 use_cprofile: bool = False):
+        """
+        Args:
+            use_cprofile (bool, optional): Also collects a cProfile of the whole run. Defaults to False.
+        """
+        self.started = datetime.datetime.now()
+        self.stages = []
+        self.counters = {}
+        self._local = threading.local()
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.cprofile = cProfile.Profile() if use_cprofile else None
+
+    def _open_stages(self):
+        """Returns the stages open in the current thread, innermost last."""
+        if not hasattr(self._local, "stages"):
+            self._local.stages = []
+        return self._local.stages
+
+    @contextmanager
+    def stage(self,
+              name: str,
+              rows: int = None):
+        """Times the code run inside the context.
+
+        Args:
+            name (str): Name of the stage.
+            rows (int, optional): Number of rows the stage handles. Can also be set on the yielded record.
+
+        Yields:
+            dict: The stage record. Set its "rows" entry once the row count is known.
+        """
+        open_stages = self._open_stages()
+        record = {"name":name,
+                  "parent":open_stages[-1]["name"] if open_stages else None,
+                  "rows":rows}
+        open_stages.append(record)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - start_wall
+            record["cpu_seconds"] = time.process_time() - start_cpu
+            record["peak_rss_bytes"] = peak_rss_bytes()
+            open_stages.pop()
+            self.stages.append(record)
+
+    def count(self,
+              name: str,
+              value):
+        """Records a counter in the run summary, _e.g._ cache hits."""
+        self.counters[name] = value
+
+    def summary(self,
+                options: dict = None):
+        """Builds the run summary.
+
+        Args:
+            options (dict, optional): Options the run was started with. Defaults to None.
+
+        Returns:
+            dict: JSON serializable run summary.
+        """
+        stage_totals = {}
+        for record in self.stages:
+            totals = stage_totals.setdefault(record["name"], {"calls":0, "wall_seconds":0.0, "cpu_seconds":0.0, "rows":0})
+            totals["calls"] += 1
+            totals["wall_seconds"] += record["wall_seconds"]
+            totals["cpu_seconds"] += record["cpu_seconds"]
+            totals["rows"] += record["rows"] or 0
+        return {"started":self.started.isoformat(timespec="seconds"),
+                "options":options or {},
+                "wall_seconds":time.perf_counter() - self._start_wall,
+                "cpu_seconds":time.process_time() - self._start_cpu,
+                "peak_rss_bytes":peak_rss_bytes(),
+                "stage_totals":stage_totals,
+                "stages":self.stages,
+                "counters":self.counters}
+
+    def write_summary(self,
+                      path: str,
+                      options: dict = None):
+        """Writes the run summary to a JSON file."""
+        with open(path, "w") as file:
+            json.dump(self.summary(options), file, indent=2, default=str)
+
+
+def start_profiling(use_cprofile: bool = False):
+    """Starts profiling the current run.
+
+    Args:
+        use_cprofile (bool, optional): Also collects a cProfile of the run. Defaults to False.
+
+    Returns:
+        Profiler: The profiler stages are recorded in.
+    """
+    global _active
+    _active = Profiler(use_cprofile)
+    if _active.cprofile is not None:
+        _active.cprofile.enable()
+    return _active
+
+
+def stop_profiling(cprofile_path: str = None):
+    """Stops profiling the current run.
+
+    Args:
+        cprofile_path (str, optional): Where the cProfile stats are dumped, if one was collected. Defaults to None.
+
+    Returns:
+        Profiler: The profiler of the run, or None if profiling was off.
+    """
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None and profiler.cprofile is not None:
+        profiler.cprofile.disable()
+        if cprofile_path is not None:
+            profiler.cprofile.dump_stats(cprofile_path)
+    return profiler
+
+
+def active_profiler():
+    return _active
+
+
+@contextmanager
+def stage(name: str,
+          rows: int = None):
+    """Times a stage with the active profiler. Does nothing when profiling is off.
+
+    Yields:
+        dict: The stage record, or a throwaway dict when profiling is off.
+    """
+    if _active is None:
+        yield {}
+        return
+    with _active.stage(name, rows) as record:
+        yield record
+
+
+def import_times(modules: list):
+    """Imports modules one at a time and times each import.
+
+    Args:
+        modules (list): Names of the modules to import.
+
+    Returns:
+        dict: Seconds each import took. Modules that were already imported take 0 seconds.
+    """
+    times = {}
+    for module in modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        times[module] = time.perf_counter() - start
+    return times
+
+
+def profiled(name: str = None,
+             rows = None):
+    """Decorates a function so every call is timed as a stage.
+
+    Args:
+        name (str, optional): Name of the stage. Defaults to the function name.
+        rows (callable, optional): Called with the result and the arguments of the call to count the rows handled.
+            Defaults to None.
+    """
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+            with _active.stage(stage_name) as record:
+                result = function(*args, **kwargs)
+                if rows is not None:
+                    record["rows"] = int(rows(result, *args, **kwargs))
+                return result
+        return wrapper
+    return decorator
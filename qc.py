@@ -0,0 +1,238 @@
+"""qc.py: Flags report comparisons that are outside the colorimetry tolerances of their nuance and hair type."""
+
+## Imports
+import os
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from data_helpers import METRIC_COLUMNS
+
+WILDCARD = "*"
+LEVELS = ["Warn", "Fail"]
+STATUSES = ["Pass", "Warn", "Fail", "No Tolerance"]
+STATUS_COLUMN = "QC Status"
+FLAGGED_COLUMN = "QC Flagged Metrics"
+QC_COLUMNS = [STATUS_COLUMN, FLAGGED_COLUMN]
+KEY_FIELDS = {"Nuance":"Shade Comparison", "Fiber":"Fiber Comparison"}  # Tolerance table column: report column
+
+
+def _normalize_keys(values: pd.Series):
+    """Turns nuances and hair types into the text they are matched on, so 6, 6.0, and "6" are the same nuance."""
+    def normalize(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return WILDCARD
+        if isinstance(value, (float, np.floating)) and float(value).is_integer():
+            value = int(value)
+        value = str(value).strip()
+        return value if value != "" else WILDCARD
+    distinct = pd.unique(values)
+    return values.map(dict(zip(distinct, [normalize(value) for value in distinct]))).astype(object)
+
+
+def limit_columns():
+    """Returns the names of every limit column a tolerance table can have, _e.g._ "dE2000 Warn"."""
+    return [f"{metric} {level}" for metric in METRIC_COLUMNS for level in LEVELS]
+
+
+class ToleranceTable:
+    """Warn and fail limits of the colorimetry metrics per nuance and hair type.
+
+    Each row holds a "Nuance", a "Fiber", and limits in columns named after a metric and a level, _e.g._
+    "dE2000 Warn" and "dE2000 Fail". A comparison is flagged when the size of a metric is over its limit. A "*" or
+    an empty nuance or hair type matches every value, and the most specific row is used: nuance and hair type, then
+    nuance only, then hair type only, then neither.
+    """
+
+    def __init__(self,
+                 tolerances: pd.DataFrame):
+        """
+        Args:
+            tolerances (pd.DataFrame): One row per nuance and hair type with "Nuance", "Fiber", and limit columns.
+
+        Raises:
+            ValueError: When a column is unknown, no limit is given, or a nuance and hair type has several rows.
+        """
+        unknown = [column for column in tolerances.columns if column not in list(KEY_FIELDS) + limit_columns()]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown tolerance columns: {', '.join(map(str, unknown))}. Use Nuance, Fiber, and "
+                             f"'<metric> Warn' or '<metric> Fail' with a metric from {', '.join(METRIC_COLUMNS)}.")
+        self.limit_columns = [column for column in limit_columns() if column in tolerances.columns]
+        if len(self.limit_columns) == 0:
+            raise ValueError("The tolerance table has no limit columns.")
+        table = tolerances.copy()
+        for field in KEY_FIELDS:
+            table[field] = _normalize_keys(table[field]) if field in table.columns else WILDCARD
+        table[self.limit_columns] = table[self.limit_columns].apply(pd.to_numeric, errors="raise").astype(float)
+        duplicated = table.duplicated(subset=list(KEY_FIELDS), keep=False)
+        if duplicated.any():
+            pairs = table.loc[duplicated, list(KEY_FIELDS)].drop_duplicates().itertuples(index=False, name=None)
+            raise ValueError(f"Several tolerances for nuance and fiber {', '.join(map(str, pairs))}.")
+        self.table = table[list(KEY_FIELDS) + self.limit_columns].reset_index(drop=True)
+
+    @classmethod
+    def from_file(cls,
+                  file_path: str):
+        """Reads a tolerance table from a .csv or Excel file."""
+        if file_path.lower().endswith(".csv"):
+            tolerances = pd.read_csv(file_path, dtype={field:object for field in KEY_FIELDS})
+        else:
+            tolerances = pd.read_excel(file_path, dtype={field:object for field in KEY_FIELDS})
+        return cls(tolerances)
+
+    def fingerprint(self):
+        """Returns a hash of the limits, which changes whenever a tolerance does."""
+        return hashlib.sha256(self.table.to_csv(index=False).encode()).hexdigest()
+
+    def limits(self,
+               nuances: pd.Series,
+               fibers: pd.Series):
+        """Finds the limits of every comparison by joining its nuance and hair type with the table.
+
+        The distinct nuance and hair type pairs are joined with the table once per level of specificity, so the
+        cost does not grow with the number of tolerance rows.
+
+        Args:
+            nuances (pd.Series): Nuance of each comparison.
+            fibers (pd.Series): Hair type of each comparison.
+
+        Returns:
+            tuple: (n, limits) array of limits with NaN where none apply, and a boolean array marking the
+                comparisons a tolerance row applies to.
+        """
+        keys = pd.DataFrame({"Nuance":_normalize_keys(pd.Series(nuances).reset_index(drop=True)),
+                             "Fiber":_normalize_keys(pd.Series(fibers).reset_index(drop=True))})
+        codes = keys.groupby(list(KEY_FIELDS), sort=False, dropna=False).ngroup().to_numpy()
+        pairs = keys.drop_duplicates().reset_index(drop=True)  # In code order
+        found = np.zeros(pairs.shape[0], dtype=bool)
+        pair_limits = np.full((pairs.shape[0], len(self.limit_columns)), np.nan)
+        for nuance_specific, fiber_specific in [(True, True), (True, False), (False, True), (False, False)]:
+            lookup = pairs.assign(Nuance=pairs["Nuance"] if nuance_specific else WILDCARD,
+                                  Fiber=pairs["Fiber"] if fiber_specific else WILDCARD)
+            matched = lookup.merge(self.table, on=list(KEY_FIELDS), how="left", validate="many_to_one", indicator=True)
+            matched_rows = ~found & (matched["_merge"] == "both").to_numpy()
+            pair_limits[matched_rows] = matched.loc[matched_rows, self.limit_columns].to_numpy(dtype=float)
+            found |= matched_rows
+        return pair_limits[codes], found[codes]
+
+    def evaluate(self,
+                 report: pd.DataFrame):
+        """Flags the comparisons of a report that are outside their tolerances.
+
+        Only the stored metrics are read, so the whole history can be evaluated again when the tolerances change
+        without calculating any colorimetry.
+
+        Args:
+            report (pd.DataFrame): Report rows with the "Shade Comparison", "Fiber Comparison", and metric columns.
+
+        Returns:
+            pd.DataFrame: The report with a "QC Status" column (Pass, Warn, Fail, or No Tolerance) and a
+                "QC Flagged Metrics" column listing the metrics over their limits, worst first.
+        """
+        limits, found = self.limits(report[KEY_FIELDS["Nuance"]], report[KEY_FIELDS["Fiber"]])
+        metric_levels = {}  # Highest level each metric is over, 0 when within its limits
+        for metric in METRIC_COLUMNS:
+            values = np.abs(pd.to_numeric(report[metric], errors="coerce").to_numpy(dtype=float))
+            metric_levels[metric] = np.zeros(report.shape[0], dtype=np.int8)
+            for level_value, level in enumerate(LEVELS, start=1):
+                if f"{metric} {level}" in self.limit_columns:
+                    over = values > limits[:, self.limit_columns.index(f"{metric} {level}")]  # NaN never flags
+                    metric_levels[metric][over] = level_value
+        severity = np.max(np.column_stack(list(metric_levels.values())), axis=1)
+        flagged = np.full(report.shape[0], "", dtype=object)
+        for level_value, level in reversed(list(enumerate(LEVELS, start=1))):
+            for metric, levels in metric_levels.items():
+                at_level = levels == level_value
+                flagged[at_level] = flagged[at_level] + np.where(flagged[at_level] == "", "", ", ") + f"{metric} ({level})"
+        status = np.array(STATUSES[:len(LEVELS) + 1], dtype=object)[severity]
+        status[~found] = "No Tolerance"
+        flagged[~found] = ""
+        return report.assign(**{STATUS_COLUMN:status, FLAGGED_COLUMN:flagged})
+
+    def evaluate_rows(self,
+                      rows,
+                      columns: list,
+                      counts: list,
+                      batch_size: int = 10000):
+        """Flags streamed report rows a batch at a time.
+
+        Args:
+            rows (iterable): Report rows as tuples.
+            columns (list): Column names of the rows.
+            counts (list): Status counts of each batch are appended to it, see `count_statuses`.
+            batch_size (int, optional): Number of rows evaluated at once. Defaults to 10000.
+
+        Yields:
+            tuple: Each row followed by its QC columns.
+        """
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if len(batch) == 0:
+                return
+            judged = self.evaluate(pd.DataFrame.from_records(batch, columns=columns))
+            counts.append(count_statuses(judged))
+            qc_values = judged[QC_COLUMNS].itertuples(index=False, name=None)
+            for row, qc_row in zip(batch, qc_values):
+                yield tuple(row) + qc_row
+
+
+def count_statuses(judged: pd.DataFrame):
+    """Counts the comparisons of each status per nuance and hair type.
+
+    Args:
+        judged (pd.DataFrame): Report rows flagged by `ToleranceTable.evaluate`.
+
+    Returns:
+        pd.DataFrame: "Nuance" and "Fiber" columns followed by a count column per status.
+    """
+    counts = pd.crosstab([_normalize_keys(judged[KEY_FIELDS["Nuance"]]).rename("Nuance"),
+                          _normalize_keys(judged[KEY_FIELDS["Fiber"]]).rename("Fiber")],
+                         judged[STATUS_COLUMN])
+    return counts.reindex(columns=STATUSES, fill_value=0).reset_index().rename_axis(columns=None)
+
+
+def summarize(counts: list):
+    """Combines status counts into the QC summary sheet.
+
+    Args:
+        counts (list): Status counts as returned by `count_statuses`, _e.g._ one per batch.
+
+    Returns:
+        pd.DataFrame: One row per nuance and hair type plus a "Total" row, with the count of each status, the
+            number of comparisons, and the share of the toleranced comparisons that passed.
+    """
+    columns = ["Nuance", "Fiber"] + STATUSES
+    counts = [count for count in counts if count.shape[0] > 0]
+    if len(counts) == 0:
+        summary = pd.DataFrame(columns=columns)
+    else:
+        summary = pd.concat(counts, ignore_index=True).groupby(["Nuance", "Fiber"], as_index=False)[STATUSES].sum()
+    totals = pd.DataFrame([["Total", ""] + [int(summary[status].sum()) for status in STATUSES]], columns=columns)
+    summary = pd.concat([summary, totals], ignore_index=True)
+    summary[STATUSES] = summary[STATUSES].astype(np.int64)
+    summary["Comparisons"] = summary[STATUSES].sum(axis=1)
+    toleranced = summary["Comparisons"] - summary["No Tolerance"]
+    summary["Pass Rate"] = (summary["Pass"] / toleranced.where(toleranced > 0)).round(3)
+    return summary
+
+
+def read_applied_fingerprint(output_directory: str):
+    """Returns the fingerprint of the tolerances the report was last written with, or None."""
+    file_path = os.path.join(output_directory, "qc_tolerances.sha256")
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path) as file:
+        return file.read().strip()
+
+
+def write_applied_fingerprint(output_directory: str,
+                              fingerprint: str = None):
+    """Records the fingerprint of the tolerances the report was written with. None removes the record."""
+    file_path = os.path.join(output_directory, "qc_tolerances.sha256")
+    if fingerprint is None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        return
+    with open(file_path, "w") as file:
+        file.write(fingerprint)
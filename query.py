@@ -0,0 +1,233 @@
+"""query.py: Looks up past comparisons and measurements in the report and used data stores without reading the workbooks."""
+
+## Imports
+import os
+import sys
+import argparse
+import pandas as pd
+from stores import TableStore, quote_identifier
+from data_helpers import KEY_COLUMNS, STD_TAG
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # How `TableStore` stores datetimes
+
+
+def _shade_name(column: str):
+    """SQL expression of the shade name of a "Name" column, like `data_helpers.mark_shade_names`."""
+    return f"REPLACE({quote_identifier(column)}, '{STD_TAG}', '')"
+
+
+# Maps each field that can be queried to the SQL expression it is read from, per store
+REPORT_FIELDS = {"nuance":quote_identifier("Shade Comparison"),
+                 "fiber":quote_identifier("Fiber Comparison"),
+                 "formula_number":quote_identifier("FLA Comparison"),
+                 "shade_name":_shade_name("Name Comparison"),
+                 "standard":quote_identifier("FLA Standard"),
+                 "standard_shade_name":_shade_name("Name Standard"),
+                 "date":quote_identifier("Date")}
+USED_DATA_FIELDS = {"nuance":quote_identifier("Nuance"),
+                    "fiber":quote_identifier("Fiber"),
+                    "formula_number":quote_identifier("Formula number"),
+                    "shade_name":_shade_name("Name"),
+                    "date":quote_identifier("Date")}
+
+
+def _candidates(value):
+    """Returns the stored values a queried value matches. Numbers typed as text also match stored numbers."""
+    candidates = [value]
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return candidates
+        candidates.append(int(number) if number.is_integer() else number)
+    return candidates
+
+
+def build_condition(fields: dict,
+                    filters: dict,
+                    date_format: str):
+    """Builds the SQL condition for equality and date range filters.
+
+    Args:
+        fields (dict): SQL expression of each field of the store.
+        filters (dict): Wanted value, or list of values, of each field. None values are ignored. "since" and "until"
+            bound the date, including since and excluding until.
+        date_format (str): Format the store's dates are compared in.
+
+    Returns:
+        tuple: The condition, or None without filters, and its parameters.
+    """
+    conditions = []
+    parameters = []
+    for field, value in filters.items():
+        if value is None:
+            continue
+        if field in ("since", "until"):
+            conditions.append(f"{fields['date']} {'>=' if field == 'since' else '<'} ?")
+            parameters.append(pd.Timestamp(value).strftime(date_format))
+            continue
+        if field not in fields:
+            raise ValueError(f"Cannot filter on '{field}'. Choose from {', '.join(fields)}, since, or until.")
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        candidates = [candidate for value in values for candidate in _candidates(value)]
+        conditions.append(f"{fields[field]} IN ({', '.join('?' * len(candidates))})")
+        parameters.extend(candidates)
+    if len(conditions) == 0:
+        return None, ()
+    return " AND ".join(conditions), tuple(parameters)
+
+
+class ColorimetryHistory:
+    """Indexed lookups over the report and used data stores in an Output folder.
+
+    Both stores are indexed on nuance, hair type, formula number, shade name, and date, plus nuance, hair type,
+    and date together, so equality and date range queries read only the matching rows.
+    """
+
+    def __init__(self,
+                 output_directory: str):
+        """
+        Args:
+            output_directory (str): Output folder holding report.sqlite and used_data.sqlite.
+        """
+        self.output_directory = output_directory
+        for file_name in ["report.sqlite", "used_data.sqlite"]:
+            if not os.path.exists(os.path.join(output_directory, file_name)):
+                raise FileNotFoundError(f"No {file_name} in {output_directory}. Run the program first.")
+        self.report_store = TableStore(os.path.join(output_directory, "report.sqlite"), "report")
+        self.used_data_store = TableStore(os.path.join(output_directory, "used_data.sqlite"), "used_data",
+                                          key_columns=KEY_COLUMNS)
+        self.ensure_indexes()
+
+    def close(self):
+        self.report_store.close()
+        self.used_data_store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def ensure_indexes(self):
+        """Creates the indexes the stores do not have yet. Only slow the first time on a large history."""
+        for store, fields in [(self.report_store, REPORT_FIELDS), (self.used_data_store, USED_DATA_FIELDS)]:
+            if len(store.columns) == 0:
+                continue
+            for field, expression in fields.items():
+                store.create_index(field, expression)
+            store.create_index("nuance_fiber_date", f"{fields['nuance']}, {fields['fiber']}, {fields['date']}")
+
+    def comparisons(self,
+                    nuance = None,
+                    fiber = None,
+                    formula_number = None,
+                    shade_name = None,
+                    standard = None,
+                    standard_shade_name = None,
+                    since = None,
+                    until = None,
+                    columns: list = None):
+        """Finds reported comparisons. Every filter is optional and takes one value or a list of values.
+
+        Args:
+            nuance (optional): Nuance of the comparison.
+            fiber (optional): Hair type of the comparison.
+            formula_number (optional): Formula number of the comparison.
+            shade_name (optional): Shade name of the comparison, its name without the "STD" tag.
+            standard (optional): Formula number of the standard compared against.
+            standard_shade_name (optional): Shade name of the standard compared against.
+            since (optional): Earliest date, included.
+            until (optional): Latest date, excluded.
+            columns (list, optional): Report columns to return. Defaults to None, every column.
+
+        Returns:
+            pd.DataFrame: Matching report rows in the order they were reported.
+        """
+        where, parameters = build_condition(REPORT_FIELDS,
+                                            {"nuance":nuance, "fiber":fiber, "formula_number":formula_number,
+                                             "shade_name":shade_name, "standard":standard,
+                                             "standard_shade_name":standard_shade_name,
+                                             "since":since, "until":until},
+                                            "%Y-%m-%d")
+        return self.report_store.read(where, parameters, columns)
+
+    def measurements(self,
+                     nuance = None,
+                     fiber = None,
+                     formula_number = None,
+                     shade_name = None,
+                     since = None,
+                     until = None,
+                     columns: list = None):
+        """Finds used data points. Every filter is optional and takes one value or a list of values.
+
+        Args:
+            nuance (optional): Nuance of the data point.
+            fiber (optional): Hair type of the data point.
+            formula_number (optional): Formula number of the data point.
+            shade_name (optional): Shade name of the data point, its name without the "STD" tag.
+            since (optional): Earliest measurement time, included.
+            until (optional): Latest measurement time, excluded.
+            columns (list, optional): Columns to return. Defaults to None, every column.
+
+        Returns:
+            pd.DataFrame: Matching data points in the order they were used.
+        """
+        where, parameters = build_condition(USED_DATA_FIELDS,
+                                            {"nuance":nuance, "fiber":fiber, "formula_number":formula_number,
+                                             "shade_name":shade_name, "since":since, "until":until},
+                                            DATETIME_FORMAT)
+        return self.used_data_store.read(where, parameters, columns)
+
+
+def parse_args(argv: list = None):
+    """Parses the command line options of the query command.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to None, using sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(prog="driver.py query",
+                                     description="Looks up past comparisons or measurements. Filters can be repeated "
+                                                 "to match any of several values.")
+    parser.add_argument("table", choices=["comparisons", "measurements"],
+                        help="Reported comparisons or used data points.")
+    parser.add_argument("--output-directory", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Output"),
+                        help="Output folder holding the stores (default: the Output folder of the program).")
+    for field in ["nuance", "fiber", "formula-number", "shade-name", "standard", "standard-shade-name"]:
+        parser.add_argument(f"--{field}", action="append")
+    parser.add_argument("--since", metavar="YYYY-MM-DD", help="Earliest date, included.")
+    parser.add_argument("--until", metavar="YYYY-MM-DD", help="Latest date, excluded.")
+    parser.add_argument("--columns", nargs="+", help="Columns to show.")
+    parser.add_argument("--output", help="Write the results to a .csv or .xlsx file instead of printing them.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    filters = {"nuance":args.nuance, "fiber":args.fiber, "formula_number":args.formula_number,
+               "shade_name":args.shade_name, "since":args.since, "until":args.until, "columns":args.columns}
+    if args.table == "comparisons":
+        filters.update(standard=args.standard, standard_shade_name=args.standard_shade_name)
+    elif args.standard or args.standard_shade_name:
+        print("--standard and --standard-shade-name only apply to comparisons.")
+        return 2
+    with ColorimetryHistory(args.output_directory) as history:
+        results = getattr(history, args.table)(**filters)
+    if args.output is None:
+        with pd.option_context("display.max_rows", 50, "display.max_columns", None, "display.width", None):
+            print(results)
+    elif args.output.lower().endswith(".csv"):
+        results.to_csv(args.output, index=False)
+    else:
+        results.to_excel(args.output, index=False)
+    print(f"{results.shape[0]} {args.table} found.")
+    return 0
+
+
+## Main
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""readers.py: Interchangeable spreadsheet readers that all parse a sheet into the same frame as `pd.read_excel`."""
+
+## Imports
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+READER_ENVIRONMENT_VARIABLE = "COLORSHOT_READER"
+DEFAULT_READER = "auto"
+EXCEL_ERROR_CODES = {"#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A"}
+
+
+def _date_cutoff(since):
+    """Returns the cutoff as a datetime and as a prefix of the "%Y%m%d-%H%M%S" date strings of the data files."""
+    since = pd.Timestamp(since).to_pydatetime()
+    return since, since.strftime("%Y%m%d-%H%M%S")
+
+
+def _before_cutoff(value,
+                   cutoff: tuple):
+    """Checks if a raw "Date" cell is before the cutoff. Dates that cannot be compared are kept.
+
+    The data files write dates as "%Y%m%d-%H%M%S" strings, which sort in date order, so strings are compared
+    without parsing them.
+    """
+    if isinstance(value, str):
+        return value != "" and value < cutoff[1]
+    if isinstance(value, datetime.datetime):
+        return value < cutoff[0]
+    return False
+
+
+def read_pandas(source,
+                sheet_name: str,
+                usecols: list = None,
+                since = None):
+    """Reads a sheet with `pd.read_excel` and its default engine. Handles every format pandas can read."""
+    if usecols is not None:
+        wanted = set(usecols)
+        usecols = lambda column: column in wanted
+    data = pd.read_excel(source,
+                         sheet_name=sheet_name,
+                         usecols=usecols)
+    if since is not None and "Date" in data.columns:
+        cutoff = _date_cutoff(since)
+        data = data[~data["Date"].map(lambda value: _before_cutoff(value, cutoff)).astype(bool)].reset_index(drop=True)
+    return data
+
+
+def _convert_value(value):
+    """Converts a raw cell value the way pandas' openpyxl reader converts cells."""
+    if value is None:
+        return ""
+    if type(value) is float:
+        integer = int(value)
+        if integer == value:
+            return integer
+    elif isinstance(value, str) and value in EXCEL_ERROR_CODES:  # Values only mode reads errors as their code
+        return np.nan
+    return value
+
+
+def _trimmed_length(row: list):
+    length = len(row)
+    while length > 0 and isinstance(row[length - 1], str) and row[length - 1] == "":
+        length -= 1
+    return length
+
+
+def _parse_rows(rows,
+                usecols: list = None,
+                since = None):
+    """Builds a frame from raw sheet rows exactly like `pd.read_excel` does after reading the cells.
+
+    Only the projected columns of each row are converted, and rows dated before the cutoff are dropped before they
+    are parsed.
+
+    Args:
+        rows (iterable): Rows of cell values, header first.
+        usecols (list, optional): Names of the columns to keep. Defaults to None, keeping every column.
+        since (optional): Rows dated before this are dropped. Defaults to None, keeping every row.
+
+    Returns:
+        pd.DataFrame: The parsed sheet.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    header = [_convert_value(value) for value in header]
+    positions = range(len(header))
+    if usecols is not None:
+        wanted = set(usecols)
+        positions = [position for position in positions if header[position] in wanted]
+    date_position = header.index("Date") if since is not None and "Date" in header else None
+    cutoff = _date_cutoff(since) if date_position is not None else None
+    data = [header if usecols is None else [header[position] for position in positions]]
+    last_row_with_data = 0 if any(value != "" for value in header) else -1
+    for row in rows:
+        has_data = any(value is not None and value != "" for value in row)
+        if has_data and date_position is not None and date_position < len(row) \
+                and _before_cutoff(row[date_position], cutoff):
+            continue
+        if usecols is None:
+            data.append([_convert_value(value) for value in row])
+        else:
+            data.append([_convert_value(row[position]) if position < len(row) else "" for position in positions])
+        if has_data:
+            last_row_with_data = len(data) - 1
+    data = data[:last_row_with_data + 1]  # Trims trailing empty rows
+    if len(data) == 0:
+        return pd.DataFrame()
+    width = max(_trimmed_length(row) for row in data)  # Trailing empty cells are trimmed, then rows are padded
+    data = [row[:width] + [""] * (width - len(row)) for row in data]
+    try:
+        return TextParser(data, header=0, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def read_openpyxl(source,
+                  sheet_name: str,
+                  usecols: list = None,
+                  since = None):
+    """Streams a sheet with openpyxl in read only, values only mode. Only reads xlsx/xlsm workbooks."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        sheet = workbook[sheet_name]
+        sheet.reset_dimensions()  # Saved dimensions can be wrong, so the sheet is read until it runs out of rows
+        return _parse_rows(sheet.iter_rows(values_only=True), usecols, since)
+    finally:
+        workbook.close()
+
+
+def _convert_calamine_value(value):
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())  # openpyxl reads date cells as datetimes
+    return value
+
+
+def read_calamine(source,
+                  sheet_name: str,
+                  usecols: list = None,
+                  since = None):
+    """Reads a sheet with the Rust based calamine parser from the optional python-calamine package."""
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_object(source)
+    rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+    return _parse_rows(([_convert_calamine_value(value) for value in row] for row in rows), usecols, since)
+
+
+READERS = {"pandas":read_pandas,
+           "openpyxl":read_openpyxl,
+           "calamine":read_calamine}
+
+
+def available_readers():
+    """Returns the names of the readers whose packages are installed, fastest first."""
+    names = []
+    for name, module in [("calamine", "python_calamine"), ("openpyxl", "openpyxl")]:
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names + ["pandas"]
+
+
+def resolve_reader(name: str = None):
+    """Finds the reader to use from a name, the COLORSHOT_READER environment variable, or the default.
+
+    Args:
+        name (str, optional): "auto", "pandas", "openpyxl", or "calamine". Defaults to None, using the environment
+            variable or "auto".
+
+    Returns:
+        str: Name of a known reader or "auto".
+    """
+    if name is None:
+        name = os.environ.get(READER_ENVIRONMENT_VARIABLE, DEFAULT_READER)
+    name = name.lower()
+    if name != "auto" and name not in READERS:
+        raise ValueError(f"Unknown reader '{name}'. Choose from auto, {', '.join(READERS)}.")
+    return name
+
+
+def read_sheet(source,
+               sheet_name: str,
+               reader: str = None,
+               usecols: list = None,
+               since = None):
+    """Reads a sheet with the chosen reader.
+
+    With "auto", the fastest installed reader is tried first and `pd.read_excel` is used if it cannot read the file
+    (_e.g._ an old .xls workbook).
+
+    Args:
+        source (str or file-like): Path or buffer of the workbook.
+        sheet_name (str): Sheet to read.
+        reader (str, optional): Reader name as accepted by `resolve_reader`. Defaults to None.
+        usecols (list, optional): Names of the columns to read. Columns the sheet does not have are skipped.
+            Defaults to None, reading every column.
+        since (optional): Date or timestamp; rows with an earlier "Date" are dropped while parsing. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The sheet, identical whichever reader parsed it.
+    """
+    reader = resolve_reader(reader)
+    if reader != "auto":
+        return READERS[reader](source, sheet_name, usecols, since)
+    for name in available_readers()[:-1]:
+        try:
+            return READERS[name](source, sheet_name, usecols, since)
+        except Exception:
+            if hasattr(source, "seek"):
+                source.seek(0)
+    return read_pandas(source, sheet_name, usecols, since)
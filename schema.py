@@ -0,0 +1,95 @@
+"""schema.py: Compact in-memory representation of Colorshot data with shared categorical dtypes."""
+
+## Imports
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ["Name", "Nuance", "Fiber", "Formula number", "File Path"]
+FLOAT_COLUMNS = ["L*", "a*", "b*", "C", "h°"]
+
+
+def _category_values(values):
+    """Returns the distinct non-missing values sorted, or in order of appearance if they cannot be sorted.
+
+    Sorted categories keep groupby on categorical keys in the same order as on the original strings.
+    """
+    values = pd.unique(pd.Series(values, dtype=object).dropna())
+    try:
+        return sorted(values)
+    except TypeError:  # Mixed numbers and strings
+        return list(values)
+
+
+def downcast_floats(data: pd.DataFrame,
+                    columns: list = FLOAT_COLUMNS):
+    """Stores float columns as float32 where that loses no precision.
+
+    Args:
+        data (pd.DataFrame): Frame to downcast in place.
+        columns (list, optional): Columns to try. Defaults to FLOAT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The same frame.
+    """
+    for column in columns:
+        if column not in data.columns or data[column].dtype != np.float64:
+            continue
+        values = data[column].to_numpy()
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+            data[column] = narrowed
+    return data
+
+
+class CompactSchema:
+    """Shared categorical dtypes for the repeated string columns of Colorshot data.
+
+    Every frame compacted with the same schema shares its categories, so slices, duplicates checks, and concats
+    work on integer codes and stay categorical instead of falling back to object strings. "File Path" is held as
+    an integer code into the path table.
+    """
+
+    def __init__(self,
+                 categories: dict):
+        """
+        Args:
+            categories (dict): Maps each compacted column to its categories.
+        """
+        self.dtypes = {column:pd.CategoricalDtype(values) for column, values in categories.items()}
+
+    @classmethod
+    def from_frame(cls,
+                   data: pd.DataFrame,
+                   columns: list = CATEGORICAL_COLUMNS):
+        """Builds a schema from the values found in a frame.
+
+        Args:
+            data (pd.DataFrame): Frame holding every value the schema needs.
+            columns (list, optional): Columns to compact. Defaults to CATEGORICAL_COLUMNS.
+
+        Returns:
+            CompactSchema: The schema.
+        """
+        return cls({column:_category_values(data[column]) for column in columns if column in data.columns})
+
+    @property
+    def path_table(self):
+        """Returns the data file paths indexed by the codes of the "File Path" column."""
+        return list(self.dtypes["File Path"].categories) if "File Path" in self.dtypes else []
+
+    def apply(self,
+              data: pd.DataFrame):
+        """Converts a frame to the compact representation.
+
+        Args:
+            data (pd.DataFrame): Frame to convert.
+
+        Returns:
+            pd.DataFrame: A compact copy of data.
+        """
+        data = data.copy()
+        for column, dtype in self.dtypes.items():
+            if column in data.columns:
+                data[column] = data[column].astype(dtype)
+        return downcast_floats(data)
+
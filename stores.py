@@ -0,0 +1,435 @@
+"""stores.py: Typed, append-only SQLite tables used as the system of record for the program's outputs."""
+
+## Imports
+import json
+import datetime
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from data_helpers import row_fingerprints, get_missing_rows, drop_present_rows
+from profiling import profiled
+
+
+def quote_identifier(name: str):
+    """Quotes a table or column name for use in SQL, doubling any quotes inside it."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _column_kind(column: pd.Series):
+    """Finds how a column is stored and restored."""
+    if column.isna().all():  # Nothing to infer a type from, so any values are stored as they come
+        return "object"
+    if pd.api.types.is_bool_dtype(column):
+        return "bool"
+    if pd.api.types.is_integer_dtype(column):
+        return "int"
+    if pd.api.types.is_float_dtype(column):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return "datetime"
+    values = column.dropna()
+    if values.shape[0] > 0 and all(isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+                                   for value in values):
+        return "date"
+    return "object"
+
+
+def _widen_kind(kind: str,
+                column: pd.Series):
+    """Finds the kind a column stored as kind must become to also hold the values of column.
+
+    Integers and floats widen to floats, and any other mix of kinds to objects, which are stored as they come.
+    Floats with whole values still fit an integer column, since reads restore missing integers as floats anyway.
+    """
+    if kind == "object" or column.isna().all():
+        return kind
+    column_kind = _column_kind(column)
+    if column_kind == kind:
+        return kind
+    if kind == "int" and column_kind == "float":
+        return "int" if (column.dropna() % 1 == 0).all() else "float"
+    if {kind, column_kind} == {"int", "float"}:
+        return "float"
+    return "object"
+
+
+SQL_TYPES = {"bool":"INTEGER", "int":"INTEGER", "float":"REAL", "datetime":"TEXT", "date":"TEXT", "object":""}
+
+
+class TableStore:
+    """A typed, append-only table in a SQLite database. Stored values are only changed through `update`.
+
+    Column kinds are recorded on creation so frames read back get their dtypes restored. A column whose later values
+    do not fit its kind is widened, _e.g._ from integers to floats or to objects, so no value is lost on reading.
+    Object columns are stored without a type affinity so mixed numbers and strings keep their types.
+
+    Every row carries the fingerprint of its values, indexed so new data can be checked against the store without
+    reading it. The fingerprint covers every column, or only the key columns when the store has them. Stores that
+    are never checked against, _e.g._ staging tables, can skip fingerprinting so appending never reads them back.
+    """
+
+    def __init__(self,
+                 database_path: str,
+                 table_name: str,
+                 key_columns: list = None,
+                 fingerprint: bool = True):
+        """
+        Args:
+            database_path (str): Path of the SQLite database. Created if missing.
+            table_name (str): Table holding the data.
+            key_columns (list, optional): Columns that identify a row. Rows are fingerprinted and compared on these
+                columns alone. Defaults to None, using every column.
+            fingerprint (bool, optional): Fingerprints the rows. Without fingerprints the store cannot be checked
+                against with `contains` or `get_missing_rows`. Defaults to True.
+        """
+        self.database_path = database_path
+        self.table_name = table_name
+        self.key_columns = None if key_columns is None else list(key_columns)
+        self.fingerprint = fingerprint
+        self.connection = sqlite3.connect(database_path)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS _schema ("
+                                    "table_name TEXT, position INTEGER, column_name TEXT, kind TEXT, "
+                                    "PRIMARY KEY (table_name, column_name))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS _keys (table_name TEXT PRIMARY KEY, key_columns TEXT)")
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (fingerprint INTEGER)")
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS updated_rows (row INTEGER PRIMARY KEY)")
+        self._load_schema()
+        if fingerprint:
+            self._check_key()
+
+    def _check_key(self):
+        """Recomputes the stored fingerprints if the store was fingerprinted on other columns."""
+        key = json.dumps(self.key_columns)
+        row = self.connection.execute("SELECT key_columns FROM _keys WHERE table_name = ?",
+                                      (self.table_name,)).fetchone()
+        recorded = json.dumps(None) if row is None else row[0]  # Stores without a recorded key used every column
+        if row is not None and recorded == key:
+            return
+        with self.connection:
+            if recorded != key and self.count() > 0:
+                self._refresh_fingerprints()
+            self.connection.execute("INSERT OR REPLACE INTO _keys VALUES (?, ?)", (self.table_name, key))
+
+    def _load_schema(self):
+        rows = self.connection.execute("SELECT column_name, kind FROM _schema WHERE table_name = ? ORDER BY position",
+                                       (self.table_name,)).fetchall()
+        self.kinds = dict(rows)
+        self.columns = [column for column, _ in rows]
+
+    def close(self):
+        self.connection.close()
+
+    def _fingerprints(self,
+                      data: pd.DataFrame):
+        """Fingerprints rows on the key columns, or on every column of the store without a key."""
+        return row_fingerprints(data.reindex(columns=self.columns if self.key_columns is None else self.key_columns))
+
+    def count(self):
+        """Returns the number of rows in the store."""
+        if len(self.columns) == 0:
+            return 0
+        return self.connection.execute(f"SELECT COUNT(*) FROM {quote_identifier(self.table_name)}").fetchone()[0]
+
+    def is_empty(self):
+        return self.count() == 0
+
+    def create_index(self,
+                     column: str,
+                     expression: str = None):
+        """Indexes a column so reads filtering on it do not scan the table.
+
+        Args:
+            column (str): Column to index. Also names the index.
+            expression (str, optional): SQL expressions to index instead of the column, _e.g._ several quoted
+                columns or a function of a column. Defaults to None.
+        """
+        with self.connection:
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(self.table_name + '_' + column)} "
+                                    f"ON {quote_identifier(self.table_name)} "
+                                    f"({expression or quote_identifier(column)})")
+
+    def distinct(self,
+                 column: str):
+        """Returns the sorted distinct values of a column, without missing values."""
+        if column not in self.kinds:
+            return []
+        return [row[0] for row in self.connection.execute(
+            f"SELECT DISTINCT {quote_identifier(column)} FROM {quote_identifier(self.table_name)} "
+            f"WHERE {quote_identifier(column)} IS NOT NULL ORDER BY {quote_identifier(column)}")]
+
+    def _add_columns(self,
+                     data: pd.DataFrame):
+        """Creates the table or adds the columns of data it does not have yet. Returns True if columns were added."""
+        new_columns = [column for column in data.columns if column not in self.kinds]
+        if len(new_columns) == 0:
+            return False
+        table = quote_identifier(self.table_name)
+        if len(self.columns) == 0:
+            self.connection.execute(f"CREATE TABLE {table} (_fingerprint INTEGER)")
+            if self.fingerprint:
+                self.connection.execute(f"CREATE INDEX {quote_identifier(self.table_name + '_fingerprint')} "
+                                        f"ON {table} (_fingerprint)")
+        for column in new_columns:
+            kind = _column_kind(data[column])
+            self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {quote_identifier(column)} {SQL_TYPES[kind]}")
+            self.connection.execute("INSERT INTO _schema VALUES (?, ?, ?, ?)",
+                                    (self.table_name, len(self.columns), column, kind))
+            self.kinds[column] = kind
+            self.columns.append(column)
+        return True
+
+    def _widen_columns(self,
+                       data: pd.DataFrame):
+        """Widens the recorded kind of every column whose values in data do not fit it.
+
+        The table is rebuilt when a column's type affinity changes, since SQLite would otherwise turn text that
+        looks like a number into one.
+        """
+        widened = {column:_widen_kind(self.kinds[column], data[column])
+                   for column in data.columns if column in self.kinds}
+        widened = {column:kind for column, kind in widened.items() if kind != self.kinds[column]}
+        if len(widened) == 0:
+            return
+        rebuild = any(SQL_TYPES[kind] != SQL_TYPES[self.kinds[column]] for column, kind in widened.items())
+        for column, kind in widened.items():
+            self.connection.execute("UPDATE _schema SET kind = ? WHERE table_name = ? AND column_name = ?",
+                                    (kind, self.table_name, column))
+            self.kinds[column] = kind
+        if rebuild:
+            self._rebuild_table()
+
+    def _rebuild_table(self):
+        """Creates the table again with the type affinities of the recorded kinds, keeping its rowids and indexes."""
+        table = quote_identifier(self.table_name)
+        rebuilt = quote_identifier(self.table_name + "_rebuilt")
+        indexes = [row[0] for row in self.connection.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (self.table_name,))]
+        definitions = ", ".join(f"{quote_identifier(column)} {SQL_TYPES[self.kinds[column]]}".rstrip()
+                                for column in self.columns)
+        selected = ", ".join(["rowid", "_fingerprint"] + [quote_identifier(column) for column in self.columns])
+        self.connection.execute(f"CREATE TABLE {rebuilt} (_fingerprint INTEGER, {definitions})")
+        self.connection.execute(f"INSERT INTO {rebuilt} ({selected}) SELECT {selected} FROM {table}")
+        self.connection.execute(f"DROP TABLE {table}")
+        self.connection.execute(f"ALTER TABLE {rebuilt} RENAME TO {table}")
+        for index in indexes:
+            self.connection.execute(index)
+
+    def _to_records(self,
+                    data: pd.DataFrame):
+        """Converts the rows of data to tuples SQLite can store."""
+        columns = []
+        for column in self.columns:
+            if column not in data.columns:
+                columns.append([None] * data.shape[0])
+                continue
+            values = data[column]
+            kind = self.kinds[column]
+            if kind == "datetime":
+                values = pd.to_datetime(values).dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+            elif kind == "date":
+                values = values.map(lambda value: value.isoformat() if isinstance(value, datetime.date) else value)
+            values = values.astype(object).where(values.notna(), None)
+            columns.append([value.item() if isinstance(value, np.generic) else value for value in values])
+        return list(zip(*columns))
+
+    def append(self,
+               data: pd.DataFrame):
+        """Appends rows to the store, adding any new columns.
+
+        Args:
+            data (pd.DataFrame): Rows to append.
+        """
+        if data.shape[0] == 0:
+            return
+        with self.connection:
+            added = self._add_columns(data)
+            self._widen_columns(data)
+            if added and self.fingerprint and self.key_columns is None and self.count() > 0:
+                self._refresh_fingerprints()
+            fingerprints = [None] * data.shape[0]
+            if self.fingerprint:
+                fingerprints = [int(fingerprint) for fingerprint in self._fingerprints(data).view(np.int64)]
+            placeholders = ", ".join(["?"] * (len(self.columns) + 1))
+            self.connection.executemany(f"INSERT INTO {quote_identifier(self.table_name)} VALUES ({placeholders})",
+                                        ((fingerprint,) + record
+                                         for fingerprint, record in zip(fingerprints, self._to_records(data))))
+
+    def _refresh_fingerprints(self):
+        """Recomputes every stored fingerprint after the columns changed."""
+        rowids = [row[0] for row in self.connection.execute(f"SELECT rowid FROM {quote_identifier(self.table_name)} "
+                                                            f"ORDER BY rowid")]
+        fingerprints = self._fingerprints(self.read()).view(np.int64)
+        self.connection.executemany(f"UPDATE {quote_identifier(self.table_name)} SET _fingerprint = ? WHERE rowid = ?",
+                                    ((int(fingerprint), rowid) for fingerprint, rowid in zip(fingerprints, rowids)))
+
+    def rowids(self,
+               where: str = None,
+               parameters: tuple = ()):
+        """Returns the rowids of the rows meeting a condition, in the order they were appended."""
+        if len(self.columns) == 0:
+            return np.array([], dtype=np.int64)
+        query = f"SELECT rowid FROM {quote_identifier(self.table_name)}"
+        if where is not None:
+            query += f" WHERE {where}"
+        rows = self.connection.execute(f"{query} ORDER BY rowid", parameters).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def update(self,
+               rowids: np.ndarray,
+               data: pd.DataFrame):
+        """Replaces values of existing rows, _e.g._ metrics that were calculated again, keeping fingerprints current.
+
+        Args:
+            rowids (np.ndarray): Rowids of the rows to change, as returned by `rowids`.
+            data (pd.DataFrame): New values of the rows in rowids order. Its columns must be in the store.
+        """
+        unknown = [column for column in data.columns if column not in self.kinds]
+        if len(unknown) > 0:
+            raise KeyError(f"The store has no columns {', '.join(unknown)}.")
+        if len(rowids) == 0:
+            return
+        positions = [self.columns.index(column) for column in data.columns]
+        assignments = ", ".join(f"{quote_identifier(column)} = ?" for column in data.columns)
+        table = quote_identifier(self.table_name)
+        with self.connection:
+            self._widen_columns(data)
+            records = self._to_records(data.reindex(columns=self.columns))
+            self.connection.executemany(f"UPDATE {table} SET {assignments} WHERE rowid = ?",
+                                        (tuple(record[position] for position in positions) + (int(rowid),)
+                                         for record, rowid in zip(records, rowids)))
+            if not self.fingerprint or (self.key_columns is not None and not set(data.columns) & set(self.key_columns)):
+                return
+            self.connection.execute("DELETE FROM updated_rows")
+            self.connection.executemany("INSERT OR IGNORE INTO updated_rows VALUES (?)",
+                                        ((int(rowid),) for rowid in rowids))
+            changed = "rowid IN (SELECT row FROM updated_rows)"
+            fingerprints = self._fingerprints(self.read(changed)).view(np.int64)
+            self.connection.executemany(f"UPDATE {table} SET _fingerprint = ? WHERE rowid = ?",
+                                        ((int(fingerprint), int(rowid))
+                                         for fingerprint, rowid in zip(fingerprints, self.rowids(changed))))
+
+    def read(self,
+             where: str = None,
+             parameters: tuple = (),
+             columns: list = None):
+        """Reads rows from the store in the order they were appended.
+
+        Args:
+            where (str, optional): SQL condition rows must meet. Defaults to None, reading every row.
+            parameters (tuple, optional): Parameters of the condition. Defaults to ().
+            columns (list, optional): Columns to read. Columns the store does not have are skipped. Defaults to
+                None, reading every column.
+
+        Returns:
+            pd.DataFrame: The rows with their dtypes restored.
+        """
+        if len(self.columns) == 0:
+            return pd.DataFrame()
+        columns = self.columns if columns is None else [column for column in columns if column in self.kinds]
+        selected = ", ".join(quote_identifier(column) for column in columns)
+        query = f"SELECT {selected} FROM {quote_identifier(self.table_name)}"
+        if where is not None:
+            query += f" WHERE {where}"
+        cursor = self.connection.execute(f"{query} ORDER BY rowid", parameters)
+        data = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+        for column in columns:
+            kind = self.kinds[column]
+            if kind == "datetime":
+                data[column] = pd.to_datetime(data[column])
+            elif kind == "date":
+                data[column] = data[column].map(lambda value: datetime.date.fromisoformat(value) if isinstance(value, str) else value)
+            elif kind == "float" or (kind == "int" and data[column].isna().any()):
+                data[column] = data[column].astype(float)
+            elif kind == "int":
+                data[column] = data[column].astype("int64")
+            elif kind == "bool" and not data[column].isna().any():
+                data[column] = data[column].astype(bool)
+        return data
+
+    def iter_rows(self,
+                  order_by: list = (),
+                  batch_size: int = 10000):
+        """Streams rows from the store without loading them all at once.
+
+        Args:
+            order_by (list, optional): Columns to sort by, with missing values last. Ties keep the order the rows
+                were appended in. Defaults to (), the append order.
+            batch_size (int, optional): Number of rows fetched from the database at a time. Defaults to 10000.
+
+        Yields:
+            tuple: One row at a time with dates restored.
+        """
+        if len(self.columns) == 0:
+            return
+        selected = ", ".join(quote_identifier(column) for column in self.columns)
+        ordering = "".join(f"{quote_identifier(column)} IS NULL, {quote_identifier(column)}, " for column in order_by)
+        cursor = self.connection.execute(f"SELECT {selected} FROM {quote_identifier(self.table_name)} "
+                                         f"ORDER BY {ordering}rowid")
+        converters = {"date":datetime.date.fromisoformat, "datetime":pd.Timestamp, "bool":bool}
+        converters = [(position, converters[self.kinds[column]]) for position, column in enumerate(self.columns)
+                      if self.kinds[column] in converters]
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if len(batch) == 0:
+                break
+            for row in batch:
+                if len(converters) > 0:
+                    row = list(row)
+                    for position, converter in converters:
+                        if row[position] is not None:
+                            row[position] = converter(row[position])
+                yield tuple(row)
+
+    def contains(self,
+                 fingerprints: np.ndarray):
+        """Checks which row fingerprints are already in the store.
+
+        Args:
+            fingerprints (np.ndarray): Fingerprints from `row_fingerprints` over the columns of the store.
+
+        Returns:
+            np.ndarray: Boolean mask that is True for rows already in the store.
+
+        Raises:
+            ValueError: When the store does not fingerprint its rows.
+        """
+        if not self.fingerprint:
+            raise ValueError(f"The {self.table_name} store does not fingerprint its rows.")
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64).view(np.int64)
+        with self.connection:
+            self.connection.execute("DELETE FROM candidates")
+            self.connection.executemany("INSERT INTO candidates VALUES (?)",
+                                        ((int(fingerprint),) for fingerprint in fingerprints))
+            found = [row[0] for row in self.connection.execute(
+                f"SELECT DISTINCT fingerprint FROM candidates "
+                f"JOIN {quote_identifier(self.table_name)} ON fingerprint = _fingerprint")]
+        return np.isin(fingerprints, np.array(found, dtype=np.int64))
+
+    @profiled("TableStore.get_missing_rows", rows=lambda result, self, data: data.shape[0])
+    def get_missing_rows(self,
+                         data: pd.DataFrame):
+        """Returns the rows of data that are not in the store, like `data_helpers.get_missing_rows`.
+
+        Only the fingerprint index is read when the store has key columns or data has every column of the store.
+        Otherwise the stored rows are read and compared on the columns both share.
+
+        Args:
+            data (pd.DataFrame): Rows to check.
+
+        Returns:
+            pd.DataFrame: The rows of data missing from the store with a fresh index.
+
+        Raises:
+            ValueError: When the store does not fingerprint its rows.
+        """
+        if not self.fingerprint:
+            raise ValueError(f"The {self.table_name} store does not fingerprint its rows.")
+        if self.is_empty():
+            return data.reset_index(drop=True)
+        if self.key_columns is None and not set(self.columns).issubset(data.columns):
+            return get_missing_rows(data, self.read())
+        fingerprints = self._fingerprints(data)
+        return drop_present_rows(data, fingerprints, self.contains(fingerprints))
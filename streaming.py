@@ -0,0 +1,145 @@
+"""streaming.py: Processes data files one day partition at a time so memory is bounded by the largest day."""
+
+## Imports
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from stores import TableStore
+from outputs import atomic_path
+from schema import CompactSchema, CATEGORICAL_COLUMNS
+from data_helpers import (get_data,
+                          mark_standards,
+                          mark_shade_names,
+                          get_groups,
+                          process_set_partition,
+                          key_fingerprints,
+                          write_bad_comparisons_rows)
+
+DAY_COLUMN = "_day"
+
+
+def stage_files(file_paths: list,
+                staging: TableStore,
+                cache = None,
+                reader: str = None,
+                usecols: list = None,
+                since = None):
+    """Reads data files one at a time into a staging store partitioned by day.
+
+    Sets never cross calendar days, so each day of the staging store can be processed on its own. Rows without a
+    date can never be assigned a set and are not staged.
+
+    Args:
+        file_paths (list): Data files to read.
+        staging (TableStore): Store the rows are staged in.
+        cache (file_cache.ParsedFileCache, optional): Cache of previously parsed files. Defaults to None.
+        reader (str, optional): Spreadsheet reader, see `readers.resolve_reader`. Defaults to None.
+        usecols (list, optional): Names of the columns to read. Defaults to None, reading every column.
+        since (optional): Drops rows dated before this while parsing. Defaults to None.
+    """
+    for index, path in enumerate(file_paths):
+        print(f"Staging data file {index + 1} of {len(file_paths)}... ", end="", flush=True)
+        data = get_data([path], cache=cache, reader=reader, usecols=usecols, since=since)
+        data = data[data["Date"].notna()]
+        data[DAY_COLUMN] = pd.to_datetime(data["Date"]).dt.strftime("%Y-%m-%d")
+        staging.append(data)
+        print("Success")
+    staging.create_index(DAY_COLUMN)
+
+
+def process_day(day_data: pd.DataFrame,
+                master_store: TableStore,
+                schema: CompactSchema = None,
+                nearest_standard: bool = False):
+    """Finds the new data of one day and processes its sets.
+
+    Args:
+        day_data (pd.DataFrame): Every staged row of the day.
+        master_store (TableStore): Store of previously used data points.
+        schema (CompactSchema, optional): Schema the day is compacted with before processing. Defaults to None.
+        nearest_standard (bool, optional): Matches comparisons to their nearest preceding standard, see
+            `data_helpers.process_set`. Defaults to False.
+
+    Returns:
+        tuple: New data of the day, list of used rows, report of good comparisons, and list of bad comparisons.
+    """
+    if schema is not None:
+        day_data = schema.apply(day_data)
+    new_data = master_store.get_missing_rows(day_data)
+    new_data = mark_standards(new_data)
+    new_data = mark_shade_names(new_data)
+    set_keys = list(get_groups(new_data).itertuples(index=False, name=None))  # Same set order as `process_sets`
+    used_rows, good_comparisons, bad_comparisons = process_set_partition(new_data, set_keys, nearest_standard)
+    return new_data, used_rows, good_comparisons.to_frame(), bad_comparisons
+
+
+def process_files_streaming(file_paths: list,
+                            master_store: TableStore,
+                            report_store: TableStore,
+                            bad_comparisons_path: str,
+                            cache = None,
+                            compact: bool = False,
+                            reader: str = None,
+                            usecols: list = None,
+                            since = None,
+                            nearest_standard: bool = False):
+    """Processes data files day partition by day partition, flushing every day's results before the next.
+
+    Args:
+        file_paths (list): Data files to process.
+        master_store (TableStore): Store of used data points. Each day's used rows are appended to it.
+        report_store (TableStore): Store of report entries. Each day's comparisons are appended to it.
+        bad_comparisons_path (str): Path of the bad comparisons workbook, written if there are any.
+        cache (file_cache.ParsedFileCache, optional): Cache of previously parsed files. Defaults to None.
+        compact (bool, optional): Processes every day with a `CompactSchema` shared across days. Defaults to False.
+        reader (str, optional): Spreadsheet reader, see `readers.resolve_reader`. Defaults to None.
+        usecols (list, optional): Names of the columns to read. Defaults to None, reading every column.
+        since (optional): Drops rows dated before this while parsing. Defaults to None.
+        nearest_standard (bool, optional): Matches comparisons to their nearest preceding standard, see
+            `data_helpers.process_set`. Defaults to False.
+
+    Returns:
+        tuple: Number of new comparisons, number of bad comparisons, fingerprints of the used rows, and the set of
+            data files with unused rows.
+    """
+    comparison_count = 0
+    used_fingerprints = []
+    pending_paths = set()
+    with tempfile.TemporaryDirectory() as staging_directory:
+        staging = TableStore(os.path.join(staging_directory, "staging.sqlite"), "staging", fingerprint=False)
+        bad_store = TableStore(os.path.join(staging_directory, "staging.sqlite"), "bad_comparisons", fingerprint=False)
+        stage_files(file_paths, staging, cache, reader, usecols, since)
+        days = staging.distinct(DAY_COLUMN)
+        schema = None
+        if compact:
+            schema = CompactSchema({column:staging.distinct(column) for column in CATEGORICAL_COLUMNS
+                                    if column in staging.columns})
+        print("")
+        for index, day in enumerate(days):
+            print(f"\rProcessing day {index + 1} of {len(days)} ({day})...", end="", flush=True)
+            day_data = staging.read(f"{DAY_COLUMN} = ?", (day,)).drop(columns=DAY_COLUMN)
+            new_data, used_rows, good_comparisons, bad_comparisons = process_day(day_data, master_store, schema,
+                                                                             nearest_standard)
+            day_fingerprints = np.array([], dtype=np.uint64)
+            if len(used_rows) > 0:
+                used_rows = pd.concat(used_rows, ignore_index=True)
+                day_fingerprints = key_fingerprints(used_rows)
+                master_store.append(used_rows.drop(columns=["STD", "ShadeName"]))
+            report_store.append(good_comparisons)
+            if len(bad_comparisons) > 0:
+                bad_store.append(pd.concat(bad_comparisons, ignore_index=True))
+            unused = ~np.isin(key_fingerprints(new_data), day_fingerprints)
+            pending_paths.update(new_data.loc[unused, "File Path"])
+            used_fingerprints.append(day_fingerprints)
+            comparison_count += good_comparisons.shape[0]
+        print("")
+        bad_count = bad_store.count()
+        if bad_count > 0:
+            with atomic_path(bad_comparisons_path) as temporary_path:
+                write_bad_comparisons_rows(bad_store.iter_rows(), bad_store.columns, temporary_path)
+        staging.close()
+        bad_store.close()
+    used_fingerprints = np.concatenate(used_fingerprints + [np.array([], dtype=np.uint64)])
+    return comparison_count, bad_count, used_fingerprints, pending_paths
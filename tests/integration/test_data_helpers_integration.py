@@ -4,7 +4,7 @@ import pytest
 import pandas as pd
 
 # Testing module
-from data_helpers import get_filepaths, get_data, get_missing_rows
+from data_helpers import get_filepaths, get_data, get_missing_rows, write_report, REPORT_COLUMNS
 
 
 def test_get_filepaths_integration():
@@ -26,6 +26,31 @@ def test_get_data(test_cases, expected):
                                       format="%Y%m%d-%H%M%S")
     expected["File Path"] = actual["File Path"]
     pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_get_data_parallel():
+    test_cases = ["./tests/integration_files/Test File 1.xlsx",
+                  "./tests/integration_files/Test File 2.xlsx",
+                  "./tests/integration_files/Test File 1.xlsx"]
+    expected = get_data(test_cases)
+    actual = get_data(test_cases, workers=2)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+
+def test_write_report(tmp_path):
+    report = pd.DataFrame({column:[None, None] for column in REPORT_COLUMNS})
+    report["Date"] = [pd.Timestamp("2022-05-05").date(), pd.Timestamp("2022-05-04").date()]
+    report["FLA Comparison"] = ["12345", "6789"]
+    report["Notes"] = ""
+    report["dE2000"] = [1.5, float("nan")]
+    output_path = str(tmp_path / "report.xlsx")
+    write_report(report, output_path)
+    actual = pd.read_excel(output_path, sheet_name="Report")
+    expected_path = str(tmp_path / "expected.xlsx")
+    report.sort_values(by=["Date", "FLA Comparison"]).to_excel(expected_path, sheet_name="Report", index=False)
+    expected = pd.read_excel(expected_path, sheet_name="Report")
+    pd.testing.assert_frame_equal(actual, expected)
     
     
     
@@ -0,0 +1,70 @@
+## Imports
+import os
+import glob
+import json
+import pandas as pd
+
+# Testing module
+from driver import driver
+from stores import TableStore
+
+
+def test_driver_profile_with_tolerances(tmp_path, monkeypatch):
+    file_paths = [os.path.abspath("./tests/integration_files/Test File 1.xlsx"),
+                  os.path.abspath("./tests/integration_files/Test File 2.xlsx")]
+    monkeypatch.chdir(tmp_path)  # Backups are made in the working directory
+    (tmp_path / "tolerances.csv").write_text("Nuance,Fiber,dE2000 Warn,dE2000 Fail\n*,*,1.0,2.0\n")
+    driver(bundle_dir=str(tmp_path), data_filepaths=file_paths, use_cache=False, profile=True)
+
+    sheets = pd.read_excel(tmp_path / "Output" / "Colorimetry Report.xlsx", sheet_name=None)
+    assert list(sheets) == ["Report", "QC Summary"]
+    assert sheets["Report"]["QC Status"].isin(["Pass", "Warn", "Fail"]).all()
+    summaries = glob.glob(str(tmp_path / "Output" / "profiles" / "*.json"))
+    assert len(summaries) == 1
+    with open(summaries[0]) as file:
+        stages = json.dumps(json.load(file))
+    assert "write_report_rows" in stages
+
+
+def test_driver_tolerances_without_comparisons(tmp_path, monkeypatch, capsys):
+    plan = pd.read_excel("./tests/integration_files/Test File 1.xlsx", sheet_name="Plan")
+    data_path = tmp_path / "No Standards.xlsx"
+    with pd.ExcelWriter(data_path) as writer:  # Sets without a standard give no comparisons
+        plan[~plan["Name"].astype(str).str.contains("STD")].to_excel(writer, sheet_name="Plan", index=False)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "tolerances.csv").write_text("Nuance,Fiber,dE2000 Fail\n*,*,2.0\n")
+    for _ in range(2):
+        driver(bundle_dir=str(tmp_path), data_filepaths=[str(data_path)], use_cache=False)
+    output = capsys.readouterr().out
+    assert output.count("The tolerances changed") == 1
+    assert not os.path.exists(tmp_path / "Output" / "Colorimetry Report.xlsx")
+    assert not glob.glob(str(tmp_path / "backups" / "*Colorimetry Report.xlsx"))
+
+
+def test_driver_incremental_flags_without_new_files(tmp_path, monkeypatch, capsys):
+    file_path = os.path.abspath("./tests/integration_files/Test File 1.xlsx")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "first").mkdir()
+    driver(bundle_dir=str(tmp_path / "first"), data_filepaths=[file_path], use_cache=False)
+    used_data = TableStore(str(tmp_path / "first" / "Output" / "used_data.sqlite"), "used_data").read()
+    data_path = tmp_path / "Used.xlsx"
+    with pd.ExcelWriter(data_path) as writer:  # Every data point is used, so the file is not read again
+        used_data.drop(columns=["File Path"]).to_excel(writer, sheet_name="Plan", index=False)
+    driver(bundle_dir=str(tmp_path), data_filepaths=[str(data_path)], use_cache=False, incremental=True)
+    report = pd.read_excel(tmp_path / "Output" / "Colorimetry Report.xlsx")
+    assert "QC Status" not in report.columns
+    capsys.readouterr()
+
+    (tmp_path / "tolerances.csv").write_text("Nuance,Fiber,dE2000 Fail\n*,*,2.0\n")
+    driver(bundle_dir=str(tmp_path), data_filepaths=[str(data_path)], use_cache=False, incremental=True,
+           export_used_data=True)
+    output = capsys.readouterr().out
+    assert "Found 0 new or changed data files" in output
+    assert "The tolerances changed" in output
+    flagged = pd.read_excel(tmp_path / "Output" / "Colorimetry Report.xlsx")
+    assert flagged.shape[0] == report.shape[0]
+    assert flagged["QC Status"].isin(["Pass", "Fail"]).all()
+    assert os.path.exists(tmp_path / "Output" / "used_data.xlsx")
+
+    driver(bundle_dir=str(tmp_path), data_filepaths=[str(data_path)], use_cache=False, incremental=True)
+    assert "Writing" not in capsys.readouterr().out
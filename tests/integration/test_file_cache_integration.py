@@ -0,0 +1,79 @@
+## Imports
+import os
+import shutil
+import pandas as pd
+
+# Testing module
+from file_cache import ParsedFileCache
+from data_helpers import get_data, REQUIRED_COLUMNS
+
+
+def test_get_data_cached(tmp_path):
+    data_path = str(tmp_path / "Test File 1.xlsx")
+    shutil.copyfile("./tests/integration_files/Test File 1.xlsx", data_path)
+    cache = ParsedFileCache(str(tmp_path / "cache"))
+    expected = get_data([data_path])
+    first = get_data([data_path], cache=cache)
+    second = get_data([data_path], cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(second, expected)
+
+
+def test_get_data_cached_projection(tmp_path):
+    data_path = str(tmp_path / "Test File 1.xlsx")
+    shutil.copyfile("./tests/integration_files/Test File 1.xlsx", data_path)
+    cache = ParsedFileCache(str(tmp_path / "cache"))
+    full = get_data([data_path], cache=cache)
+    projected = get_data([data_path], cache=cache, usecols=REQUIRED_COLUMNS)
+    projected_again = get_data([data_path], cache=cache, usecols=REQUIRED_COLUMNS)
+    assert (cache.hits, cache.misses) == (1, 2)
+    expected = full[[column for column in full.columns if column in REQUIRED_COLUMNS + ["File Path"]]]
+    pd.testing.assert_frame_equal(projected, expected)
+    pd.testing.assert_frame_equal(projected_again, expected)
+
+
+def test_cache_invalidated_on_change(tmp_path):
+    data_path = str(tmp_path / "data.xlsx")
+    shutil.copyfile("./tests/integration_files/Test File 1.xlsx", data_path)
+    cache = ParsedFileCache(str(tmp_path / "cache"))
+    get_data([data_path], cache=cache)
+    shutil.copyfile("./tests/integration_files/Test File 2.xlsx", data_path)
+    os.utime(data_path, ns=(0, 0))
+    actual = get_data([data_path], cache=cache)
+    expected = get_data([data_path])
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert len(cache.entries()) == 1
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_cache_eviction_and_clear(tmp_path):
+    data_paths = []
+    for index in range(3):
+        data_path = str(tmp_path / f"data{index}.xlsx")
+        shutil.copyfile("./tests/integration_files/Test File 1.xlsx", data_path)
+        data_paths.append(data_path)
+    cache = ParsedFileCache(str(tmp_path / "cache"), max_bytes=0)
+    get_data(data_paths, cache=cache)
+    assert cache.entries() == []
+    cache.max_bytes = 1024**2
+    get_data(data_paths, cache=cache)
+    assert len(cache.entries()) == 3
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_file_cache_keeps_frames_in_memory(tmp_path):
+    data_path = tmp_path / "data.xlsx"
+    shutil.copy("./tests/integration_files/Test File 1.xlsx", data_path)
+    cache = ParsedFileCache(str(tmp_path / "cache"), memory_entries=1)
+    entry_path, frame = cache.lookup(str(data_path), "Plan")
+    assert frame is None
+    cache.store(entry_path, pd.DataFrame({"a":[1]}))
+    for entry in cache.entries():
+        os.remove(entry)  # Served from memory from now on
+    _, frame = cache.lookup(str(data_path), "Plan")
+    frame["b"] = 2  # Changing a returned frame does not change the cached one
+    _, frame = cache.lookup(str(data_path), "Plan")
+    assert list(frame.columns) == ["a"]
+    assert cache.hits == 2
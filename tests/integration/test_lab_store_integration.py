@@ -0,0 +1,29 @@
+## Imports
+import os
+import pandas as pd
+
+# Testing module
+from stores import TableStore
+from lab_store import LabArrayStore, rebuild_report
+from data_helpers import get_data, mark_standards, mark_shade_names, get_groups, process_sets, METRIC_COLUMNS
+
+
+def test_rebuild_report(tmp_path, monkeypatch):
+    file_paths = [os.path.abspath("./tests/integration_files/Test File 1.xlsx"),
+                  os.path.abspath("./tests/integration_files/Test File 2.xlsx")]
+    data = mark_shade_names(mark_standards(get_data(file_paths)))
+    _, report, _ = process_sets(get_groups(data), data)
+    monkeypatch.chdir(tmp_path)  # Backups are made in the working directory
+    os.makedirs(tmp_path / "Output")
+    report_store = TableStore(str(tmp_path / "Output" / "report.sqlite"), "report")
+    report_store.append(report)
+    LabArrayStore(str(tmp_path / "Output" / "lab_store")).sync(report_store)
+    # Metrics from an outdated calculation
+    report_store.update(report_store.rowids(), report[METRIC_COLUMNS] + 1.0)
+    report_store.close()
+
+    assert rebuild_report(f"{tmp_path}/") == report.shape[0]
+    report_store = TableStore(str(tmp_path / "Output" / "report.sqlite"), "report")
+    pd.testing.assert_frame_equal(report_store.read(), report, check_dtype=False)
+    written = pd.read_excel(tmp_path / "Output" / "Colorimetry Report.xlsx", sheet_name="Report")
+    assert written.shape[0] == report.shape[0]
@@ -0,0 +1,58 @@
+## Imports
+import datetime
+import pytest
+import numpy as np
+import pandas as pd
+
+# Testing module
+from readers import read_sheet, resolve_reader, available_readers
+
+
+@pytest.mark.parametrize("reader", available_readers())
+@pytest.mark.parametrize("path,sheet_name",
+                         [("./tests/integration_files/Test File 1.xlsx", "Plan"),
+                          ("./tests/integration_files/Test File 2.xlsx", "Plan"),
+                          ("./tests/integration_files/get_data expected.xlsx", "Plan")])
+def test_readers_match_read_excel(reader, path, sheet_name):
+    expected = pd.read_excel(path, sheet_name=sheet_name)
+    actual = read_sheet(path, sheet_name, reader)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("reader", available_readers())
+def test_readers_match_read_excel_on_awkward_cells(tmp_path, reader):
+    path = tmp_path / "awkward.xlsx"
+    pd.DataFrame({"Date":["20220502-120000", None, "20220502-120020", None],
+                  "Formula number":[12345, "12345std", None, None],
+                  "L*":[19.0, 20.5, np.nan, None],
+                  "Measured":[datetime.datetime(2022, 5, 2, 12), None, datetime.datetime(2022, 5, 3), None],
+                  "Flag":[True, False, None, None],
+                  "Empty":[None, None, None, None]}).to_excel(path, sheet_name="Plan", index=False)
+    expected = pd.read_excel(path, sheet_name="Plan")
+    actual = read_sheet(path, "Plan", reader)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_resolve_reader(monkeypatch):
+    monkeypatch.delenv("COLORSHOT_READER", raising=False)
+    assert resolve_reader() == "auto"
+    monkeypatch.setenv("COLORSHOT_READER", "Pandas")
+    assert resolve_reader() == "pandas"
+    assert resolve_reader("openpyxl") == "openpyxl"
+    with pytest.raises(ValueError):
+        resolve_reader("xlrd")
+
+
+@pytest.mark.parametrize("reader", available_readers())
+def test_readers_project_and_filter(tmp_path, reader):
+    path = tmp_path / "wide.xlsx"
+    data = pd.DataFrame({"Date":["20220501-235959", "20220502-000000", None, "20220503-120000"],
+                         "User":["a", "b", "c", "d"],
+                         "Name":["Shade01STD", "Shade01", "Shade02", "Shade02STD"],
+                         "Formula number":["F1", 12345, None, "F2"],
+                         "L*":[19.5, 20.0, 21.0, 22.25]})
+    data.to_excel(path, sheet_name="Plan", index=False)
+    actual = read_sheet(path, "Plan", reader, usecols=["Date", "Formula number", "L*", "Missing"], since="2022-05-02")
+    expected = pd.read_excel(path, sheet_name="Plan", usecols=["Date", "Formula number", "L*"])
+    expected = expected.iloc[1:].reset_index(drop=True)  # Undated rows are kept
+    pd.testing.assert_frame_equal(actual, expected)
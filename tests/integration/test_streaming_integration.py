@@ -0,0 +1,38 @@
+## Imports
+import pandas as pd
+
+# Testing module
+from stores import TableStore
+from streaming import process_files_streaming
+from data_helpers import get_data, mark_standards, mark_shade_names, get_groups, process_sets
+
+
+def test_process_files_streaming(tmp_path):
+    file_paths = ["./tests/integration_files/Test File 1.xlsx",
+                  "./tests/integration_files/Test File 2.xlsx"]
+    data = mark_shade_names(mark_standards(get_data(file_paths)))
+    used_rows, expected_report, bad_comparisons = process_sets(get_groups(data), data)
+
+    master_store = TableStore(str(tmp_path / "used_data.sqlite"), "used_data")
+    report_store = TableStore(str(tmp_path / "report.sqlite"), "report")
+    bad_comparisons_path = str(tmp_path / "Bad Comparisons.xlsx")
+    comparison_count, bad_count, used_fingerprints, pending_paths = process_files_streaming(file_paths,
+                                                                                            master_store,
+                                                                                            report_store,
+                                                                                            bad_comparisons_path)
+    assert comparison_count == expected_report.shape[0]
+    pd.testing.assert_frame_equal(report_store.read(), expected_report, check_dtype=False)
+    expected_used = pd.concat(used_rows, ignore_index=True).drop(columns=["STD", "ShadeName"])
+    pd.testing.assert_frame_equal(master_store.read(), expected_used, check_dtype=False)
+    assert len(used_fingerprints) == expected_used.shape[0]
+    assert (bad_count > 0) == (len(bad_comparisons) > 0)
+
+    # A second pass finds nothing new
+    comparison_count, _, used_fingerprints, _ = process_files_streaming(file_paths,
+                                                                        master_store,
+                                                                        report_store,
+                                                                        bad_comparisons_path)
+    assert comparison_count == 0
+    assert len(used_fingerprints) == 0
+    master_store.close()
+    report_store.close()
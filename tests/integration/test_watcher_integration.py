@@ -0,0 +1,40 @@
+## Imports
+import os
+import shutil
+import pandas as pd
+
+# Testing module
+from watcher import watch
+from colorimetry_cache import active_cache
+from profiling import active_profiler
+
+
+def test_watch_updates_report(tmp_path):
+    drop_folder = tmp_path / "drop"
+    drop_folder.mkdir()
+    for name in ["Test File 1.xlsx", "Test File 2.xlsx"]:
+        shutil.copy(f"./tests/integration_files/{name}", drop_folder / name)
+    (tmp_path / "data_filepaths.confidential").write_text("")
+    working_directory = os.getcwd()
+    os.chdir(tmp_path)  # Backups are made relative to the working directory
+    try:
+        watch(bundle_dir=str(tmp_path), drop_folder=str(drop_folder), poll_seconds=0, debounce_seconds=0,
+              max_updates=1)
+    finally:
+        os.chdir(working_directory)
+    report = pd.read_excel(tmp_path / "Output" / "Colorimetry Report.xlsx", sheet_name="Report")
+    assert report.shape[0] > 0
+
+
+
+def test_watch_survives_failed_updates(tmp_path, monkeypatch):
+    drop_folder = tmp_path / "drop"
+    drop_folder.mkdir()
+    shutil.copy("./tests/integration_files/Test File 1.xlsx", drop_folder / "Test File 1.xlsx")
+    (tmp_path / "data_filepaths.confidential").write_text("")
+    (tmp_path / "tolerances.csv").write_text("Nuance,Fiber,dE Fail\n*,*,1.0\n")  # Makes the driver exit
+    monkeypatch.chdir(tmp_path)
+    watch(bundle_dir=str(tmp_path), drop_folder=str(drop_folder), poll_seconds=0, debounce_seconds=0,
+          max_updates=2, profile=True, colorimetry_cache=True)
+    assert active_cache() is None
+    assert active_profiler() is None
@@ -0,0 +1,63 @@
+import numpy as np
+
+from colorimetry_cache import ColorimetryCache, use_cache
+from data_helpers import calculate_colorimetry_batch
+
+
+def make_lab(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(10, 80, (count, 3)).round(2), rng.uniform(10, 80, (count, 3)).round(2))
+
+
+def test_cached_colorimetry_matches_uncached():
+    std_lab, comparison_lab = make_lab(50)
+    std_lab[25:] = std_lab[:25]  # Repeated pairs
+    comparison_lab[25:] = comparison_lab[:25]
+    expected = calculate_colorimetry_batch(std_lab, comparison_lab)
+    cache = ColorimetryCache()
+    previous = use_cache(cache)
+    try:
+        first = calculate_colorimetry_batch(std_lab, comparison_lab)
+        assert (cache.hits, cache.misses) == (0, 25)
+        second = calculate_colorimetry_batch(std_lab[::-1], comparison_lab[::-1])
+        assert (cache.hits, cache.misses) == (25, 25)
+    finally:
+        use_cache(previous)
+    for expected_metric, first_metric, second_metric in zip(expected, first, second):
+        np.testing.assert_array_equal(first_metric, expected_metric)
+        np.testing.assert_array_equal(second_metric, expected_metric[::-1])
+
+
+def test_colorimetry_cache_evicts_least_recently_used():
+    cache = ColorimetryCache(max_entries=2)
+    keys = ColorimetryCache.keys(*make_lab(3))
+    cache.store(keys[:2], np.zeros((2, 7)))
+    cache.lookup(keys[:1])
+    cache.store(keys[2:], np.ones((1, 7)))
+    _, found = cache.lookup(keys)
+    assert list(found) == [True, False, True]
+
+
+def test_colorimetry_cache_persists(tmp_path):
+    cache_path = str(tmp_path / "colorimetry.npz")
+    keys = ColorimetryCache.keys(*make_lab(4))
+    metrics = np.arange(28, dtype=float).reshape(4, 7)
+    cache = ColorimetryCache(cache_path=cache_path)
+    cache.store(keys, metrics)
+    cache.save()
+
+    loaded = ColorimetryCache(cache_path=cache_path)
+    assert len(loaded) == 4
+    actual, found = loaded.lookup(keys)
+    assert found.all()
+    np.testing.assert_array_equal(actual, metrics)
+
+
+def test_distinct_keys():
+    keys = ColorimetryCache.keys(*make_lab(6))
+    keys[3] = keys[0]
+    keys[4, 0] = keys[5, 0] = np.nan  # NaN keys match themselves
+    keys[5] = keys[4]
+    first_rows, inverse = ColorimetryCache.distinct(keys)
+    assert sorted(first_rows) == [0, 1, 2, 4]
+    np.testing.assert_array_equal(keys[first_rows][inverse], keys)
@@ -7,14 +7,26 @@ import pandas as pd
 import numpy as np
 
 from data_helpers import (get_missing_rows, 
+                          row_fingerprints,
                           find_standard, 
                           mark_standards, 
                           extract_shade_name, 
                           mark_shade_names,
                           get_groups,
                           filter_for_group,
+                          split_sets,
+                          process_set,
+                          process_sets,
+                          find_nearest_standards,
+                          set_nearest_standards,
+                          partition_sets,
                           calculate_colorimetry,
-                          report_comparison)
+                          calculate_colorimetry_batch,
+                          round_metric,
+                          report_comparison,
+                          ReportBuilder,
+                          REPORT_COLUMNS)
+from benchmarks.synthetic import make_plan_data, as_read_data
 
 @pytest.mark.parametrize("df1,df2,expected",
                          [(pd.DataFrame({"col1":[1,2,3,4,5], "col2":["a","b","c","d","e"]}),
@@ -29,6 +41,50 @@ def test_get_missing_rows(df1, df2, expected):
     pd.testing.assert_frame_equal(actual, expected)
      
 
+def test_get_missing_rows_normalized():
+    df1 = pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", None, "20220502-120020", None], format="%Y%m%d-%H%M%S"),
+                        "Name":["a", None, "c", None],
+                        "L*":[1, 2, 3, 2]})
+    df2 = pd.DataFrame({"Date":pd.to_datetime(["20220502-120020", None], format="%Y%m%d-%H%M%S"),
+                        "Name":["c", np.nan],
+                        "L*":[3.0, 5.0]})
+    expected = pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", None, None], format="%Y%m%d-%H%M%S"),
+                             "Name":["a", None, None],
+                             "L*":[1, 2, 2]})
+    actual = get_missing_rows(df1, df2)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_row_fingerprints():
+    fresh = pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", None, "20220502-120020"], format="%Y%m%d-%H%M%S"),
+                          "Formula number":["12345std", 5, None],
+                          "L*":[19.1, -0.0, None]})
+    read_back = pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", None, "20220502-120020"], format="%Y%m%d-%H%M%S"),
+                              "Formula number":["12345std", 5.0, np.nan],
+                              "L*":[19.1, 0.0, np.nan]})
+    other = pd.DataFrame({"Date":pd.to_datetime(["20220502-120001", None, "20220502-120020"], format="%Y%m%d-%H%M%S"),
+                          "Formula number":["12345std", "5", None],
+                          "L*":[19.1, 0.0, 1.0]})
+    assert np.array_equal(row_fingerprints(fresh), row_fingerprints(read_back))
+    assert not np.any(row_fingerprints(fresh) == row_fingerprints(other))
+    assert np.array_equal(row_fingerprints(fresh, ["L*"]), row_fingerprints(read_back[["L*"]]))
+
+
+def test_row_fingerprints_ignore_print_options():
+    data = pd.DataFrame({"L*":[39.6328514280803, 0.1]})
+    with np.printoptions(legacy=False):
+        expected = row_fingerprints(data)
+    with np.printoptions(legacy="1.13"):
+        assert np.array_equal(row_fingerprints(data), expected)
+
+
+def test_row_fingerprints_keep_full_precision():
+    floats = pd.DataFrame({"L*":[39.6328514280803, 39.63285142808]})
+    objects = floats.astype(object)
+    assert row_fingerprints(floats)[0] != row_fingerprints(floats)[1]
+    assert np.array_equal(row_fingerprints(floats), row_fingerprints(objects))
+
+
 @pytest.mark.parametrize("input,expected",
                          [
                              ("Shade5ASTD",True),
@@ -77,6 +133,16 @@ def test_mark_shade_names(input, expected):
     assert np.array_equal(actual.values, expected.values)
 
 
+def test_mark_names_match_per_name_functions():
+    names = ["Shade5ASTD", "Gaiav2Shade5A", "Shade5ASTD", None, "STDShadeSTD", "Gaiav2Shade5A", "shade5astd"]
+    actual = mark_shade_names(mark_standards(pd.DataFrame({"Name":names})))
+    assert actual["STD"].dtype == bool
+    assert actual["STD"].tolist() == [find_standard(name) if name is not None else False for name in names]
+    assert actual["ShadeName"].tolist()[:3] == [extract_shade_name(name) for name in names[:3]]
+    assert pd.isna(actual.loc[3, "ShadeName"])
+    assert actual["ShadeName"].tolist()[4:] == ["Shade", "Gaiav2Shade5A", "shade5astd"]
+
+
 @pytest.mark.parametrize("input,expected",
                          [
                              (pd.DataFrame({"Date":["20220502-120000","20220502-120010","20220502-120020","20220502-120030","20220505-120030","20220505-120050"],
@@ -200,6 +266,122 @@ def test_calculate_colorimetry(input_std, input_comparison, expected):
     assert delta_H == expected["delta_H"]
 
 
+def test_split_sets():
+    input_data = pd.DataFrame({"Date":["20220502-120000","20220505-120030","20220502-120010","20220502-120020","20220502-120030","20220505-120050"],
+                               "Name":["ShadeName01","ShadeName02","ShadeName01STD","ShadeName01","ShadeName01STD","ShadeName02STD"],
+                               "Nuance":["5A","6A","5A","5A","5A","6A"],
+                               "Fiber":["BN","BP","BN","BP","BP","BP"]})
+    input_data["Date"] = pd.to_datetime(input_data["Date"],
+                                        format="%Y%m%d-%H%M%S")
+    actual = split_sets(input_data)
+    expected_groups = get_groups(input_data)
+    assert list(actual.keys()) == list(expected_groups.itertuples(index=False, name=None))
+    for group_date, nuance, hair_type in actual:
+        expected = filter_for_group(input_data, group_date, nuance, hair_type)
+        assert list(actual[(group_date, nuance, hair_type)]) == list(expected.index)
+
+
+@pytest.mark.parametrize("names,expected_reason",
+                         [
+                             (["ShadeName01"], "One datapoint"),
+                             (["ShadeName01", "ShadeName02"], "No Standard"),
+                             (["ShadeName01STD", "ShadeName02STD", "ShadeName01"], "Multiple Standards"),
+                             (["ShadeName01", "ShadeName01STD", "ShadeName02"], None)
+                         ])
+def test_process_set(names, expected_reason):
+    count = len(names)
+    input_data = mark_shade_names(mark_standards(pd.DataFrame({
+        "Date":[pd.to_datetime("20220504-143057", format="%Y%m%d-%H%M%S")] * count,
+        "Name":names,
+        "Nuance":["5A"] * count,
+        "Formula number":[f"F{index}" for index in range(count)],
+        "Fiber":["BP"] * count,
+        "L*":[20.0 + index for index in range(count)],
+        "a*":[10.0] * count,
+        "b*":[10.0] * count,
+        "File Path":["./test.xlsx"] * count})))
+    used_rows, good_comparisons, bad_comparisons = process_set(input_data)
+    if expected_reason is None:
+        assert len(bad_comparisons) == 0
+        standard, comparisons = good_comparisons[0]
+        assert list(standard["STD"]) == [True]
+        assert comparisons.shape[0] == count - 1
+        assert used_rows[-1].shape[0] == count
+    else:
+        assert len(good_comparisons) == 0
+        assert list(bad_comparisons[0]["Reason"]) == [expected_reason] * count
+
+
+def make_multiple_standards_set():
+    """One set of shade 5A measured in two sessions, each with its own standard, and a comparison before both."""
+    times = ["08:55", "09:00", "09:05", "09:06", "09:06", "13:00", "13:10", "08:30"]
+    names = ["5A", "5A STD", "5A", "5A", "5A", "5A STD", "5A", "5A"]
+    formulas = ["F0", "S1", "F1", "F2", "F2", "S2", "F3", "F4"]
+    count = len(times)
+    return mark_shade_names(mark_standards(pd.DataFrame({
+        "Date":pd.to_datetime([f"2022-05-04 {time}" for time in times]),
+        "Name":names,
+        "Nuance":["5A"] * count,
+        "Formula number":formulas,
+        "Fiber":["BP"] * count,
+        "L*":[20.0 + index for index in range(count)],
+        "a*":[10.0] * count,
+        "b*":[10.0] * count,
+        "File Path":["./test.xlsx"] * count})))
+
+
+def test_find_nearest_standards():
+    data = make_multiple_standards_set()
+    other_day = data.assign(Date=data["Date"] + pd.Timedelta(days=1))
+    data = pd.concat([data, other_day], ignore_index=True)
+    expected = np.array([-1, -1, 1, -1, 1, -1, 5, -1])  # The first F2 is a re-measure and is left out
+    np.testing.assert_array_equal(find_nearest_standards(data),
+                                  np.concatenate([expected, np.where(expected >= 0, expected + 8, -1)]))
+    np.testing.assert_array_equal(set_nearest_standards(find_nearest_standards(data), np.arange(8, 16)), expected)
+
+
+def test_process_set_nearest_standard():
+    set_data = make_multiple_standards_set()
+    nearest = set_nearest_standards(find_nearest_standards(set_data), np.arange(set_data.shape[0]))
+    used_rows, good_comparisons, bad_comparisons = process_set(set_data, nearest)
+    assert [(list(standard["Formula number"]), list(comparisons["Formula number"]))
+            for standard, comparisons in good_comparisons] == [(["S1"], ["F1", "F2"]), (["S2"], ["F3"])]
+    assert list(bad_comparisons[0]["Formula number"]) == ["F0", "F4"]
+    assert list(bad_comparisons[0]["Reason"]) == ["No Preceding Standard"] * 2
+    assert sum(rows.shape[0] for rows in used_rows) == set_data.shape[0] - 2
+    _, _, rejected = process_set(set_data)
+    assert list(rejected[0]["Reason"]) == ["Multiple Standards"] * (set_data.shape[0] - 1)
+
+
+@pytest.mark.parametrize("input,expected",
+                         [
+                             (np.array([1.0005, 1.0015, 2.675, 0.0625, -0.0625, -6.0665]),
+                              np.array([1.0, 1.002, 2.675, 0.062, -0.062, -6.066]))
+                         ])
+def test_round_metric(input, expected):
+    actual = round_metric(input)
+    assert np.array_equal(actual, expected)
+
+
+def test_calculate_colorimetry_batch():
+    input_std = pd.DataFrame({"L*":[28.500, 61.43, 5.296],
+                              "a*":[8.391, 2.25, 4.492],
+                              "b*":[11.176, -4.96, -6.538]})
+    input_comparison = np.array([[22.433, 9.626, 14.223],
+                                 [61.29, 3.72, -5.39],
+                                 [6.704, 5.902, -10.737]])
+    expected = [[4.895, 1.871, 3.29],
+                [-6.067, -0.14, 1.408],
+                [1.235, 1.47, 1.41],
+                [3.047, -0.43, -4.199],
+                [3.383, 1.754, 4.517],
+                [2.972, 11.755, -6.349],
+                [0.927, 1.396, -1.258]]
+    actual = calculate_colorimetry_batch(input_std, input_comparison)
+    for actual_metric, expected_metric in zip(actual, expected):
+        assert np.array_equal(actual_metric, expected_metric)
+
+
 @pytest.mark.parametrize("input_std,input_comparison,expected",
                          [
                              (
@@ -271,5 +453,63 @@ def test_report_comparison(input_std, input_comparison, expected):
     pd.testing.assert_frame_equal(actual, expected)
 
 
+def test_report_builder():
+    count = 5
+    input_data = pd.DataFrame({
+        "Date":[pd.to_datetime("20220504-143057", format="%Y%m%d-%H%M%S")] * count,
+        "Name":["testSTD", "test1", "test2", "test3STD", "test4"],
+        "Nuance":["5A", "5A", "5A", "6A", "6A"],
+        "Formula number":[f"F{index}" for index in range(count)],
+        "Fiber":["BP"] * count,
+        "L*":[19.1, 20.6, 21.2, 30.5, 31.7],
+        "a*":[8.5, 17.3, 9.1, 4.2, 4.8],
+        "b*":[9.2, 19.7, 10.4, -3.1, -2.9],
+        "File Path":["./test.xlsx"] * count})
+    report = ReportBuilder()
+    report.add_set(input_data.iloc[[0]], input_data.iloc[1:3])
+    report.add_set(input_data.iloc[[3]], input_data.iloc[4:5])
+    actual = report.to_frame()
+    expected = pd.concat([report_comparison(input_data.iloc[[0]], input_data.iloc[[1]]),
+                          report_comparison(input_data.iloc[[0]], input_data.iloc[[2]]),
+                          report_comparison(input_data.iloc[[3]], input_data.iloc[[4]])],
+                         ignore_index=True)
+    assert list(actual.columns) == REPORT_COLUMNS
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_report_builder_empty():
+    actual = ReportBuilder().to_frame()
+    assert actual.shape[0] == 0
+    assert list(actual.columns) == REPORT_COLUMNS
+
+
+def make_marked_data(days=6):
+    return mark_shade_names(mark_standards(as_read_data(make_plan_data(days=days, sets_per_day=15, malformed_rate=0.3))))
+
+
+def test_partition_sets():
+    data = make_marked_data()
+    sets = get_groups(data)
+    partitions = partition_sets(sets, split_sets(data), 4)
+    assert 1 < len(partitions) <= 4
+    assert sum(partitions, []) == list(sets.itertuples(index=False, name=None))
+    partition_days = [{key[0] for key in partition} for partition in partitions]
+    for index, days in enumerate(partition_days):  # No day is split between partitions
+        assert all(days.isdisjoint(other) for other in partition_days[index + 1:])
+
+
+@pytest.mark.parametrize("nearest_standard", [False, True])
+def test_process_sets_parallel_matches_serial(monkeypatch, nearest_standard):
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    data = make_marked_data()
+    sets = get_groups(data)
+    serial = process_sets(sets, data, nearest_standard=nearest_standard)
+    parallel = process_sets(sets, data, workers=2, min_parallel_rows=0, nearest_standard=nearest_standard)
+    pd.testing.assert_frame_equal(parallel[1], serial[1])
+    for serial_frames, parallel_frames in [(serial[0], parallel[0]), (serial[2], parallel[2])]:
+        pd.testing.assert_frame_equal(pd.concat(parallel_frames, ignore_index=True),
+                                      pd.concat(serial_frames, ignore_index=True))
+
+
 if __name__ == "__main__":
     test_get_missing_rows()
\ No newline at end of file
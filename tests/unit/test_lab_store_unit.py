@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from lab_store import LabArrayStore
+from stores import TableStore
+from data_helpers import calculate_colorimetry_batch, METRIC_COLUMNS
+
+
+def make_pairs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    std_lab = np.round(rng.uniform([10.0, -5.0, -5.0], [60.0, 30.0, 30.0], (count, 3)), 2)
+    std_lab[1::2] = std_lab[::2][:count // 2]  # Standards are shared by several comparisons
+    comparison_lab = np.round(std_lab + rng.normal(0, 2, (count, 3)), 2)
+    return std_lab, comparison_lab
+
+
+def make_report(std_lab, comparison_lab):
+    report = pd.DataFrame({"FLA Comparison":[f"F{index}" for index in range(std_lab.shape[0])]})
+    for position, field in enumerate(["L*", "a*", "b*"]):
+        report[f"{field} Standard"] = std_lab[:, position]
+        report[f"{field} Comparison"] = comparison_lab[:, position]
+    for metric, values in zip(METRIC_COLUMNS, calculate_colorimetry_batch(std_lab, comparison_lab)):
+        report[metric] = values
+    return report
+
+
+def test_append_and_reopen(tmp_path):
+    std_lab, comparison_lab = make_pairs(10)
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    store.append(np.arange(1, 6), std_lab[:5], comparison_lab[:5])
+    store.append(np.arange(6, 11), std_lab[5:], comparison_lab[5:])
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    assert len(store) == 10
+    assert store.sample_count < 20  # Shared standards are stored once per batch
+    pairs = np.asarray(store.pairs())
+    np.testing.assert_array_equal(store.samples()[pairs[:, 0]], std_lab)
+    np.testing.assert_array_equal(store.samples()[pairs[:, 1]], comparison_lab)
+    np.testing.assert_array_equal(store.rowids(), np.arange(1, 11))
+
+
+def test_interrupted_append_is_ignored(tmp_path):
+    std_lab, comparison_lab = make_pairs(4)
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    store.append(np.arange(1, 3), std_lab[:2], comparison_lab[:2])
+    with open(tmp_path / "lab_store" / "pairs.i64", "ab") as file:  # Rows written without their counts
+        file.write(b"\xff" * 24)
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    assert len(store) == 2
+    store.append(np.arange(3, 5), std_lab[2:], comparison_lab[2:])
+    pairs = np.asarray(store.pairs())
+    np.testing.assert_array_equal(store.samples()[pairs[:, 1]], comparison_lab)
+
+
+def test_sync_and_recalculate(tmp_path):
+    std_lab, comparison_lab = make_pairs(25)
+    report = make_report(std_lab, comparison_lab)
+    report_store = TableStore(str(tmp_path / "report.sqlite"), "report")
+    report_store.append(report.iloc[:10])
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    assert store.sync(report_store, batch_size=4) == 10
+    report_store.append(report.iloc[10:])
+    assert store.sync(report_store, batch_size=4) == 15
+    assert store.sync(report_store) == 0
+    batches = list(store.recalculate(batch_size=7))
+    assert len(batches) == 4
+    np.testing.assert_array_equal(np.concatenate([rowids for rowids, _ in batches]), report_store.rowids())
+    pd.testing.assert_frame_equal(pd.concat([metrics for _, metrics in batches], ignore_index=True),
+                                  report[METRIC_COLUMNS])
+
+
+def test_sync_resets_for_replaced_report(tmp_path):
+    std_lab, comparison_lab = make_pairs(6)
+    report_store = TableStore(str(tmp_path / "report.sqlite"), "report")
+    report_store.append(make_report(std_lab, comparison_lab))
+    store = LabArrayStore(str(tmp_path / "lab_store"))
+    store.sync(report_store)
+    report_store.close()
+    (tmp_path / "report.sqlite").unlink()
+    report_store = TableStore(str(tmp_path / "report.sqlite"), "report")
+    report_store.append(make_report(std_lab[:3], comparison_lab[:3]))
+    assert store.sync(report_store) == 3
+    assert len(store) == 3
@@ -0,0 +1,45 @@
+"""test_manifest_unit.py: Unit tests for manifest.py"""
+
+## Imports
+import numpy as np
+
+from manifest import IngestManifest
+
+
+def test_files_to_read(tmp_path):
+    file_paths = []
+    for index in range(3):
+        file_path = tmp_path / f"data{index}.xlsx"
+        file_path.write_bytes(b"data")
+        file_paths.append(str(file_path))
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    file_stats = manifest.files_to_read(file_paths)
+    assert list(file_stats) == file_paths
+    manifest.record_files(file_stats, pending_paths={file_paths[1]})
+    assert list(manifest.files_to_read(file_paths)) == [file_paths[1]]
+    (tmp_path / "data2.xlsx").write_bytes(b"changed data")
+    assert list(manifest.files_to_read(file_paths)) == [file_paths[1], file_paths[2]]
+    manifest.close()
+
+
+def test_consumed_rows(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"))
+    assert manifest.is_empty()
+    fingerprints = np.array([1, 2**63 + 5, 2**64 - 1], dtype=np.uint64)
+    manifest.add_rows(fingerprints[1:])
+    assert not manifest.is_empty()
+    actual = manifest.consumed(np.array([2**64 - 1, 1, 2**63 + 5, 1], dtype=np.uint64))
+    assert list(actual) == [True, False, True, False]
+    manifest.close()
+
+
+def test_row_key_change_drops_rows(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"), row_key="Date,Name")
+    manifest.add_rows(np.array([1, 2], dtype=np.uint64))
+    manifest.close()
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"), row_key="Date,Name")
+    assert not manifest.is_empty()
+    manifest.close()
+    manifest = IngestManifest(str(tmp_path / "manifest.sqlite"), row_key="Date,Name,L*")
+    assert manifest.is_empty()
+    manifest.close()
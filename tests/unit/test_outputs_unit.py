@@ -0,0 +1,47 @@
+import os
+import pytest
+
+from outputs import atomic_path, write_outputs
+
+
+def test_atomic_path_keeps_previous_file_on_failure(tmp_path):
+    file_path = str(tmp_path / "report.xlsx")
+    with open(file_path, "w") as file:
+        file.write("previous")
+    with pytest.raises(RuntimeError):
+        with atomic_path(file_path) as temporary_path:
+            with open(temporary_path, "w") as file:
+                file.write("half")
+            raise RuntimeError("crash while writing")
+    assert open(file_path).read() == "previous"
+    assert os.listdir(tmp_path) == ["report.xlsx"]
+
+    with atomic_path(file_path) as temporary_path:
+        with open(temporary_path, "w") as file:
+            file.write("new")
+    assert open(file_path).read() == "new"
+    assert os.listdir(tmp_path) == ["report.xlsx"]
+
+
+def test_write_outputs_reports_each_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Backups are made relative to the working directory
+    output_directory = f"{tmp_path}/"
+    (tmp_path / "a.txt").write_text("old a")
+
+    def write(text):
+        def writer(output_path):
+            with open(output_path, "w") as file:
+                file.write(text)
+        return writer
+
+    def fail(output_path):
+        raise PermissionError("open in Excel")
+
+    results = write_outputs(output_directory, {"a.txt":write("new a"), "b.txt":fail, "c.txt":write("c")},
+                            backups=["a.txt"])
+    assert list(results) == ["a.txt", "b.txt", "c.txt"]
+    assert isinstance(results["b.txt"], PermissionError)
+    assert (tmp_path / "a.txt").read_text() == "new a"
+    assert (tmp_path / "c.txt").read_text() == "c"
+    assert not (tmp_path / "b.txt").exists()
+    assert [path.read_text() for path in (tmp_path / "backups").iterdir()] == ["old a"]
@@ -0,0 +1,79 @@
+"""test_profiling_unit.py: Unit tests for profiling.py"""
+
+## Imports
+import json
+import pandas as pd
+
+import profiling
+from profiling import start_profiling, stop_profiling, stage, profiled, import_times
+
+
+@profiled(rows=lambda result, data: data.shape[0])
+def double(data):
+    return data * 2
+
+
+def test_profiling_off():
+    assert profiling.active_profiler() is None
+    with stage("nothing") as record:
+        pass
+    assert record == {}
+    assert double(pd.DataFrame({"a":[1]}))["a"].tolist() == [2]
+
+
+def test_profiler_records_stages(tmp_path):
+    profiler = start_profiling()
+    try:
+        with stage("outer", rows=3) as record:
+            double(pd.DataFrame({"a":[1, 2, 3]}))
+            double(pd.DataFrame({"a":[4]}))
+            record["rows"] = 4
+        profiler.count("cache_hits", 2)
+    finally:
+        assert stop_profiling() is profiler
+    assert profiling.active_profiler() is None
+    assert [(record["name"], record["parent"], record["rows"]) for record in profiler.stages] == \
+           [("double", "outer", 3), ("double", "outer", 1), ("outer", None, 4)]
+    profiler.write_summary(str(tmp_path / "summary.json"), {"workers":1})
+    with open(tmp_path / "summary.json") as file:
+        summary = json.load(file)
+    assert summary["stage_totals"]["double"]["calls"] == 2
+    assert summary["stage_totals"]["double"]["rows"] == 4
+    assert summary["counters"] == {"cache_hits":2}
+    assert summary["options"] == {"workers":1}
+    assert all(record["wall_seconds"] >= 0 and record["cpu_seconds"] >= 0 for record in summary["stages"])
+
+
+def test_cprofile_dump(tmp_path):
+    start_profiling(use_cprofile=True)
+    double(pd.DataFrame({"a":[1]}))
+    stop_profiling(str(tmp_path / "run.prof"))
+    assert (tmp_path / "run.prof").stat().st_size > 0
+
+
+def test_import_times():
+    times = import_times(["json", "profiling"])
+    assert list(times) == ["json", "profiling"]
+    assert all(seconds >= 0 for seconds in times.values())
+
+
+
+def test_stages_in_threads():
+    import threading
+
+    def work():
+        with stage("worker"):
+            pass
+
+    profiler = start_profiling()
+    try:
+        with stage("outer"):
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+            with stage("inner"):
+                pass
+    finally:
+        stop_profiling()
+    parents = {record["name"]:record["parent"] for record in profiler.stages}
+    assert parents == {"worker":None, "inner":"outer", "outer":None}  # Threads do not nest in each other's stages
@@ -0,0 +1,100 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from qc import ToleranceTable, count_statuses, summarize, QC_COLUMNS
+from data_helpers import METRIC_COLUMNS, write_report_rows
+
+
+def make_report(nuances, fibers, de2000, dl):
+    count = len(nuances)
+    report = pd.DataFrame({"Shade Comparison":nuances, "Fiber Comparison":fibers})
+    for metric in METRIC_COLUMNS:
+        report[metric] = [0.0] * count
+    report["dE2000"] = de2000
+    report["dL*"] = dl
+    return report
+
+
+def make_table():
+    return ToleranceTable(pd.DataFrame({"Nuance":["5A", "5A", "*", "6"],
+                                        "Fiber":["BP", None, "*", "*"],
+                                        "dE2000 Warn":[1.0, 1.5, 2.0, 0.5],
+                                        "dE2000 Fail":[2.0, 2.5, 3.0, 1.0],
+                                        "dL* Fail":[np.nan, np.nan, 1.0, np.nan]}))
+
+
+def test_limits_use_most_specific_row():
+    limits, found = make_table().limits(pd.Series(["5A", "5A", "7B", 6.0, None]),
+                                        pd.Series(["BP", "NW", "BP", "BP", "BP"]))
+    np.testing.assert_array_equal(limits[:, 0], [1.0, 1.5, 2.0, 0.5, 2.0])
+    assert found.all()
+
+
+def test_evaluate():
+    report = make_report(["5A", "5A", "7B", 6.0, "6"], ["BP", "NW", "BP", "BP", "NW"],
+                         [1.5, 0.2, 3.5, 0.7, 0.2], [5.0, 0.0, -2.0, 0.0, 0.0])
+    judged = make_table().evaluate(report)
+    assert list(judged["QC Status"]) == ["Warn", "Pass", "Fail", "Warn", "Pass"]
+    assert list(judged["QC Flagged Metrics"]) == ["dE2000 (Warn)", "", "dE2000 (Fail), dL* (Fail)", "dE2000 (Warn)", ""]
+    pd.testing.assert_frame_equal(judged.drop(columns=QC_COLUMNS), report)
+
+
+def test_evaluate_without_tolerance():
+    table = ToleranceTable(pd.DataFrame({"Nuance":["5A"], "Fiber":["BP"], "dE2000 Fail":[1.0]}))
+    judged = table.evaluate(make_report(["5A", "7B"], ["BP", "BP"], [2.0, 2.0], [0.0, 0.0]))
+    assert list(judged["QC Status"]) == ["Fail", "No Tolerance"]
+
+
+@pytest.mark.parametrize("tolerances",
+                         [
+                             pd.DataFrame({"Nuance":["5A"], "Fiber":["BP"], "dE Fail":[1.0]}),
+                             pd.DataFrame({"Nuance":["5A"], "Fiber":["BP"]}),
+                             pd.DataFrame({"Nuance":["5A", "5A"], "Fiber":["BP", "BP"], "dE2000 Fail":[1.0, 2.0]})
+                         ])
+def test_invalid_tolerances(tolerances):
+    with pytest.raises(ValueError):
+        ToleranceTable(tolerances)
+
+
+def test_fingerprint_changes_with_limits():
+    table = make_table()
+    changed = ToleranceTable(table.table.assign(**{"dE2000 Warn":table.table["dE2000 Warn"] + 0.1}))
+    assert table.fingerprint() == make_table().fingerprint()
+    assert table.fingerprint() != changed.fingerprint()
+
+
+def test_evaluate_rows_matches_evaluate():
+    report = make_report(["5A", "7B", "6"] * 5, ["BP", "NW", "BP"] * 5, list(np.linspace(0, 4, 15)), [0.0] * 15)
+    table = make_table()
+    counts = []
+    rows = list(table.evaluate_rows(report.itertuples(index=False, name=None), list(report.columns), counts,
+                                    batch_size=4))
+    expected = table.evaluate(report)
+    assert rows == list(expected.itertuples(index=False, name=None))
+    assert len(counts) == 4
+    pd.testing.assert_frame_equal(summarize(counts), summarize([count_statuses(expected)]))
+
+
+def test_summarize():
+    judged = make_table().evaluate(make_report(["5A", "5A", "7B"], ["BP", "BP", "BP"], [0.5, 3.0, 2.5], [0.0] * 3))
+    summary = summarize([count_statuses(judged)])
+    assert list(summary["Nuance"]) == ["5A", "7B", "Total"]
+    assert list(summary["Pass"]) == [1, 0, 1]
+    assert list(summary["Fail"]) == [1, 0, 1]
+    assert list(summary["Warn"]) == [0, 1, 1]
+    assert list(summary["Comparisons"]) == [2, 1, 3]
+    assert summary["Pass Rate"].iloc[-1] == pytest.approx(0.333)
+
+
+def test_write_report_rows_with_summary(tmp_path):
+    report = make_table().evaluate(make_report(["5A", "7B"], ["BP", "BP"], [0.5, 3.5], [0.0, 0.0]))
+    report.insert(2, " ", None)
+    output_path = str(tmp_path / "report.xlsx")
+    summary = summarize([count_statuses(report)])
+    write_report_rows(report.itertuples(index=False, name=None), list(report.columns), output_path,
+                      extra_sheets=lambda: {"QC Summary":summary})
+    sheets = pd.read_excel(output_path, sheet_name=None)
+    assert list(sheets) == ["Report", "QC Summary"]
+    assert list(sheets["Report"]["QC Status"]) == ["Pass", "Fail"]
+    assert list(sheets["QC Summary"]["Comparisons"]) == [1, 1, 2]
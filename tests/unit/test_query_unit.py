@@ -0,0 +1,73 @@
+import datetime
+import pytest
+import pandas as pd
+
+from stores import TableStore
+from query import ColorimetryHistory, build_condition, USED_DATA_FIELDS, DATETIME_FORMAT
+from data_helpers import KEY_COLUMNS
+
+
+@pytest.fixture
+def history(tmp_path):
+    used_data = pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", "20220502-120030", "20220610-090000"],
+                                                    format="%Y%m%d-%H%M%S"),
+                              "Name":["Shade01STD", "Shade01", "Shade02"],
+                              "Nuance":["6A", "6A", "5B"],
+                              "Fiber":["BP", "BP", "BN"],
+                              "Formula number":["STD1", 12345, "F2"],
+                              "L*":[20.0, 21.0, 22.0],
+                              "File Path":["./a.xlsx"] * 3})
+    report = pd.DataFrame({"Date":[datetime.date(2022, 5, 2), datetime.date(2022, 6, 10)],
+                           "Name Standard":["Shade01STD", "Shade03STD"],
+                           "Shade Standard":["6A", "5B"],
+                           "FLA Standard":["STD1", "STD3"],
+                           "Fiber Standard":["BP", "BN"],
+                           "Name Comparison":["Shade01", "Shade02"],
+                           "Shade Comparison":["6A", "5B"],
+                           "FLA Comparison":[12345, "F2"],
+                           "Fiber Comparison":["BP", "BN"],
+                           "dE2000":[1.5, 2.5]})
+    store = TableStore(str(tmp_path / "used_data.sqlite"), "used_data", key_columns=KEY_COLUMNS)
+    store.append(used_data)
+    store.close()
+    store = TableStore(str(tmp_path / "report.sqlite"), "report")
+    store.append(report)
+    store.close()
+    with ColorimetryHistory(str(tmp_path)) as history:
+        yield history
+
+
+def test_comparisons(history):
+    assert list(history.comparisons(nuance="6A", fiber="BP", standard="STD1")["dE2000"]) == [1.5]
+    assert list(history.comparisons(formula_number="12345")["Name Comparison"]) == ["Shade01"]  # Typed as text
+    assert list(history.comparisons(standard_shade_name="Shade03")["dE2000"]) == [2.5]
+    assert list(history.comparisons(since="2022-06-01")["dE2000"]) == [2.5]
+    assert list(history.comparisons(until="2022-06-10")["dE2000"]) == [1.5]
+    assert history.comparisons(nuance=["6A", "5B"], columns=["dE2000"]).shape == (2, 1)
+
+
+def test_measurements(history):
+    assert list(history.measurements(shade_name="Shade01")["L*"]) == [20.0, 21.0]
+    assert list(history.measurements(since="2022-05-02 12:00:10", until="2022-07-01")["Name"]) == ["Shade01", "Shade02"]
+    assert history.measurements(nuance="6A", fiber="BN").shape[0] == 0
+
+
+def test_indexes_are_used(history):
+    plan = history.report_store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM report WHERE REPLACE(\"Name Comparison\", 'STD', '') IN (?)", ("x",)).fetchall()
+    assert "USING INDEX" in plan[0][-1]
+
+
+def test_build_condition():
+    where, parameters = build_condition(USED_DATA_FIELDS, {"nuance":None, "fiber":["BP", "BN"], "since":"2022-05-02"},
+                                        DATETIME_FORMAT)
+    assert where == '"Fiber" IN (?, ?) AND "Date" >= ?'
+    assert parameters == ("BP", "BN", "2022-05-02 00:00:00.000000")
+    assert build_condition(USED_DATA_FIELDS, {}, DATETIME_FORMAT) == (None, ())
+    with pytest.raises(ValueError):
+        build_condition(USED_DATA_FIELDS, {"standard":"STD1"}, DATETIME_FORMAT)
+
+
+def test_missing_stores(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ColorimetryHistory(str(tmp_path))
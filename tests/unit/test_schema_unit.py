@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from schema import CompactSchema, downcast_floats
+from data_helpers import get_groups, split_sets, row_fingerprints, get_missing_rows
+
+
+def make_data():
+    return pd.DataFrame({"Date":pd.to_datetime(["20220502-120000","20220502-120010","20220505-120030","20220505-120050"],
+                                               format="%Y%m%d-%H%M%S"),
+                         "Name":["Shade02","Shade02STD","Shade01","Shade01STD"],
+                         "Nuance":["6A","6A","5A","5A"],
+                         "Fiber":["BP","BP","BN",None],
+                         "Formula number":["F1",12345,"F2","F2"],
+                         "L*":[19.1, 20.5, 21.25, np.nan],
+                         "File Path":["./b.xlsx","./b.xlsx","./a.xlsx","./a.xlsx"]})
+
+
+def test_compact_schema_shares_categories():
+    data = make_data()
+    schema = CompactSchema.from_frame(data)
+    compact = schema.apply(data)
+    assert compact["Nuance"].dtype == schema.dtypes["Nuance"]
+    assert list(compact["Nuance"].cat.categories) == ["5A", "6A"]
+    assert schema.path_table == ["./a.xlsx", "./b.xlsx"]
+    assert compact["File Path"].cat.codes.tolist() == [1, 1, 0, 0]
+    assert pd.concat([compact.iloc[:2], compact.iloc[2:]])["Name"].dtype == schema.dtypes["Name"]
+    assert data["Nuance"].dtype == object  # The input is left as it was
+
+
+def test_compact_schema_keeps_results():
+    data = make_data()
+    compact = CompactSchema.from_frame(data).apply(data)
+    pd.testing.assert_frame_equal(get_groups(compact).astype(object), get_groups(data).astype(object))
+    assert {key:list(value) for key, value in split_sets(compact).items()} == \
+           {key:list(value) for key, value in split_sets(data).items()}
+    assert np.array_equal(row_fingerprints(compact), row_fingerprints(data))
+    assert get_missing_rows(compact, data.iloc[:2]).shape[0] == 2
+
+
+@pytest.mark.parametrize("values,expected",
+                         [
+                             ([0.5, 1.25, np.nan], np.float32),
+                             ([19.1, 0.5], np.float64)
+                         ])
+def test_downcast_floats(values, expected):
+    data = downcast_floats(pd.DataFrame({"L*":values}))
+    assert data["L*"].dtype == expected
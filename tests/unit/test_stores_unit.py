@@ -0,0 +1,139 @@
+"""test_stores_unit.py: Unit tests for stores.py"""
+
+## Imports
+import pytest
+import datetime
+import numpy as np
+import pandas as pd
+
+from stores import TableStore
+from data_helpers import get_missing_rows
+
+
+def make_data():
+    return pd.DataFrame({"Date":pd.to_datetime(["20220502-120000", "20220502-120010", "20220503-090000"], format="%Y%m%d-%H%M%S"),
+                         "Name":["ShadeName01", "ShadeName01STD", None],
+                         "Formula number":["12345std", 12345, "6789"],
+                         "L*":[19.11494255, np.nan, 20.5],
+                         "Count":[1, 2, 3]})
+
+
+def test_append_and_read(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    assert store.is_empty()
+    data = make_data()
+    store.append(data)
+    store.append(data.iloc[[0]])
+    store.close()
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    expected = pd.concat([data, data.iloc[[0]]], ignore_index=True)
+    pd.testing.assert_frame_equal(store.read(), expected)
+    pd.testing.assert_frame_equal(store.read('"Count" >= ?', (2,)), data.iloc[1:].reset_index(drop=True))
+    assert store.count() == 4
+
+
+def test_dates_round_trip(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "report")
+    data = pd.DataFrame({"Date":[datetime.date(2022, 5, 4), datetime.date(2022, 5, 5)], " ":[None, None]})
+    store.append(data)
+    pd.testing.assert_frame_equal(store.read(), data)
+
+
+def test_get_missing_rows(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    data = make_data()
+    pd.testing.assert_frame_equal(store.get_missing_rows(data), data)
+    store.append(data.iloc[[1]])
+    new_data = pd.concat([data, data.iloc[[0]]], ignore_index=True).assign(Extra="x")
+    expected = get_missing_rows(new_data, data.iloc[[1]])
+    pd.testing.assert_frame_equal(store.get_missing_rows(new_data), expected)
+    pd.testing.assert_frame_equal(store.get_missing_rows(new_data[["Date", "Name"]]),
+                                  get_missing_rows(new_data[["Date", "Name"]], data.iloc[[1]]))
+
+
+def test_new_columns(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    data = make_data()
+    store.append(data.iloc[:2])
+    store.append(data.iloc[2:].assign(Extra="x"))
+    assert store.columns == list(data.columns) + ["Extra"]
+    assert list(store.read()["Extra"]) == [None, None, "x"]
+    assert store.get_missing_rows(data.iloc[:2].assign(Extra=None)).shape[0] == 0
+
+
+def test_iter_rows(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "report")
+    data = pd.DataFrame({"Date":[datetime.date(2022, 5, 5), datetime.date(2022, 5, 4), datetime.date(2022, 5, 4), datetime.date(2022, 5, 4)],
+                         "FLA Comparison":["B", None, "C", "A"],
+                         "dE2000":[1.0, 2.0, 3.0, 4.0]})
+    store.append(data)
+    expected = data.sort_values(by=["Date", "FLA Comparison"])
+    actual = list(store.iter_rows(order_by=["Date", "FLA Comparison"], batch_size=3))
+    assert actual == list(expected.itertuples(index=False, name=None))
+    assert list(store.iter_rows()) == list(data.itertuples(index=False, name=None))
+
+
+def test_key_columns(tmp_path):
+    data = make_data()
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    store.append(data.iloc[:2])
+    store.close()
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data", key_columns=["Date", "Name", "L*"])
+    changed = data.assign(Count=[7, 8, 9])
+    pd.testing.assert_frame_equal(store.get_missing_rows(changed), changed.iloc[2:].reset_index(drop=True))
+    projected = data[["Date", "Name", "L*"]]
+    pd.testing.assert_frame_equal(store.get_missing_rows(projected), projected.iloc[2:].reset_index(drop=True))
+    store.append(projected.iloc[2:])
+    assert store.get_missing_rows(data).shape[0] == 0
+    assert list(store.read(columns=["Name", "Missing", "Count"]).columns) == ["Name", "Count"]
+
+
+def test_update(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "report")
+    data = make_data()
+    store.append(data)
+    rowids = store.rowids('"Count" >= ?', (2,))
+    assert list(rowids) == [2, 3]
+    store.update(rowids, pd.DataFrame({"L*":[1.5, 2.5]}))
+    expected = data.assign(**{"L*":[data["L*"][0], 1.5, 2.5]})
+    pd.testing.assert_frame_equal(store.read(), expected)
+    assert store.get_missing_rows(expected).shape[0] == 0  # Fingerprints follow the new values
+    assert store.get_missing_rows(data).shape[0] == 2
+
+
+def test_widen_columns(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    store.append(pd.DataFrame({"Formula number":[111, 222], "Nuance":[6, 7]}))
+    store.create_index("Formula number")
+    store.append(pd.DataFrame({"Formula number":["111A", "0333"], "Nuance":[7.5, np.nan]}))
+    store.append(pd.DataFrame({"Formula number":[444], "Nuance":[8]}))
+    store.close()
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    data = store.read()
+    assert list(data["Formula number"]) == [111, 222, "111A", "0333", 444]
+    assert list(data["Nuance"][[0, 1, 2, 4]]) == [6.0, 7.0, 7.5, 8.0]
+    assert store.kinds == {"Formula number":"object", "Nuance":"float"}
+    assert list(store.rowids('"Formula number" = ?', ("0333",))) == [4]
+    assert store.connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'used_data_Formula number'").fetchone()[0] == 1
+    assert store.get_missing_rows(data).shape[0] == 0
+
+
+def test_whole_floats_keep_int_columns(tmp_path):
+    store = TableStore(str(tmp_path / "store.sqlite"), "used_data")
+    store.append(pd.DataFrame({"Nuance":[6, 7]}))
+    store.append(pd.DataFrame({"Nuance":[8.0, np.nan]}))
+    assert store.kinds["Nuance"] == "int"
+    assert list(store.read()["Nuance"][:3]) == [6.0, 7.0, 8.0]
+
+
+def test_without_fingerprints(tmp_path, monkeypatch):
+    store = TableStore(str(tmp_path / "store.sqlite"), "staging", fingerprint=False)
+    data = make_data()
+    store.append(data.iloc[:2])
+    monkeypatch.setattr(store, "read", None)  # New columns must not read the table back
+    store.append(data.iloc[2:].assign(Extra="x"))
+    monkeypatch.undo()
+    assert list(store.read()["Extra"]) == [None, None, "x"]
+    assert store.connection.execute('SELECT COUNT(*) FROM "staging" WHERE _fingerprint IS NOT NULL').fetchone()[0] == 0
+    with pytest.raises(ValueError):
+        store.get_missing_rows(data)
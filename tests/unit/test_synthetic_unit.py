@@ -0,0 +1,28 @@
+import pandas as pd
+
+from benchmarks.synthetic import make_plan_data, make_plan_rows, as_read_data, PLAN_COLUMNS
+from data_helpers import mark_standards, mark_shade_names, get_groups, split_sets, process_set
+
+
+def test_make_plan_data_is_deterministic():
+    pd.testing.assert_frame_equal(make_plan_data(days=2, seed=3), make_plan_data(days=2, seed=3))
+    assert not make_plan_data(days=2, seed=3).equals(make_plan_data(days=2, seed=4))
+
+
+def test_make_plan_rows_has_requested_rows():
+    data = make_plan_rows(1234)
+    assert data.shape[0] == 1234
+    assert list(data.columns) == PLAN_COLUMNS
+
+
+def test_make_plan_data_sets_are_classified():
+    data = mark_shade_names(mark_standards(as_read_data(make_plan_data(days=3, sets_per_day=40, malformed_rate=0.3))))
+    sets = get_groups(data)
+    assert sets.shape[0] == 3 * 40  # Sets of a day never share a nuance and hair type
+
+    positions = split_sets(data)
+    bad_reasons = set()
+    for set_key in sets.itertuples(index=False, name=None):
+        _, _, bad_comparisons = process_set(data.iloc[positions[set_key]].reset_index(drop=True))
+        bad_reasons.update(bad["Reason"].iloc[0] for bad in bad_comparisons)
+    assert len(bad_reasons) == 3
@@ -0,0 +1,41 @@
+from watcher import ChangeDebouncer, find_workbooks, snapshot
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_debouncer_waits_for_files_to_settle():
+    clock = FakeClock()
+    debouncer = ChangeDebouncer(debounce_seconds=5, clock=clock)
+    debouncer.settled = {}
+    assert not debouncer.update({"a.xlsx":(1, 10)})
+    clock.now = 3
+    assert not debouncer.update({"a.xlsx":(2, 20)})  # Still being written
+    clock.now = 7
+    assert not debouncer.update({"a.xlsx":(2, 20)})
+    clock.now = 8
+    assert debouncer.update({"a.xlsx":(2, 20)})
+    clock.now = 20
+    assert not debouncer.update({"a.xlsx":(2, 20)})  # Already reported
+    debouncer.retry()
+    clock.now = 22
+    assert not debouncer.update({"a.xlsx":(2, 20)})  # Waits for the files to settle again before retrying
+    clock.now = 25
+    assert debouncer.update({"a.xlsx":(2, 20)})
+
+
+def test_find_workbooks_and_snapshot(tmp_path):
+    for name in ["b.xlsx", "a.XLS", "~$b.xlsx", "notes.txt"]:
+        (tmp_path / name).write_bytes(b"data")
+    workbooks = find_workbooks(str(tmp_path))
+    assert workbooks == [str(tmp_path / "a.XLS"), str(tmp_path / "b.xlsx")]
+    assert find_workbooks(str(tmp_path / "missing")) == []
+
+    stats = snapshot(workbooks + [str(tmp_path / "missing.xlsx")])
+    assert list(stats) == workbooks
+    assert stats[workbooks[0]][1] == 4
@@ -0,0 +1,155 @@
+"""watcher.py: Watches the data files and a drop folder and updates the report whenever a workbook changes."""
+
+## Imports
+import os
+import time
+import datetime
+from file_cache import ParsedFileCache
+from data_helpers import get_filepaths
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def find_workbooks(folder: str):
+    """Returns the paths of the workbooks in a folder, skipping the lock files Excel keeps next to open workbooks."""
+    if folder is None or not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$"))
+
+
+def snapshot(file_paths: list):
+    """Records the modification time and size of every file that exists.
+
+    Args:
+        file_paths (list): Files to record.
+
+    Returns:
+        dict: Maps each existing file to its (modification time, size).
+    """
+    stats = {}
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError:  # Missing, or being replaced
+            continue
+        stats[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+
+class ChangeDebouncer:
+    """Reports a change once the watched files have stopped changing for a while.
+
+    The instrument writes a workbook in several bursts, so a change is only reported after the snapshots have been
+    the same for debounce_seconds.
+    """
+
+    def __init__(self,
+                 debounce_seconds: float = 5.0,
+                 clock = time.monotonic):
+        """
+        Args:
+            debounce_seconds (float, optional): Time the files must stay the same before a change is reported.
+                Defaults to 5.0.
+            clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+        """
+        self.debounce_seconds = debounce_seconds
+        self.clock = clock
+        self.settled = None  # Snapshot of the last change reported, None before the first one
+        self._latest = None
+        self._changed_at = None
+
+    def update(self,
+               stats: dict):
+        """Takes the latest snapshot.
+
+        Args:
+            stats (dict): Snapshot as returned by `snapshot`.
+
+        Returns:
+            bool: True when the files changed since the last reported change and have since settled.
+        """
+        now = self.clock()
+        if stats != self._latest:
+            self._latest = stats
+            self._changed_at = now
+        if self._latest != self.settled and now - self._changed_at >= self.debounce_seconds:
+            self.settled = self._latest
+            return True
+        return False
+
+    def retry(self):
+        """Reports the current files again once they have stayed the same for debounce_seconds, _e.g._ after an
+        update failed."""
+        self.settled = None
+        self._changed_at = self.clock()
+
+
+def watch(bundle_dir: str = None,
+          drop_folder: str = None,
+          poll_seconds: float = 2.0,
+          debounce_seconds: float = 5.0,
+          max_updates: int = None,
+          **driver_options):
+    """Runs the incremental pipeline every time the data files or the workbooks in the drop folder change.
+
+    The parsed file cache is kept in memory between updates, and the program's modules stay loaded, so an update
+    only costs reading the changed workbooks and processing their new data points. The stores are backed up by the
+    first update of each day rather than by every update. A failed update is reported and retried once the files
+    settle again.
+
+    Args:
+        bundle_dir (str, optional): Folder holding data_filepaths.confidential and the Output folder. Defaults to
+            None, the folder of the program.
+        drop_folder (str, optional): Folder whose workbooks are read along with the listed data files. Defaults to
+            None.
+        poll_seconds (float, optional): Time between checks for changes. Defaults to 2.0.
+        debounce_seconds (float, optional): Time the files must stay the same before an update runs. Defaults to 5.0.
+        max_updates (int, optional): Stops after this many updates. Defaults to None, watching until interrupted.
+        **driver_options: Other options of `driver.driver`. The pipeline always runs incrementally.
+    """
+    from driver import driver
+
+    if bundle_dir is None:
+        bundle_dir = os.path.dirname(os.path.abspath(__file__))
+    bundle_dir = f"{os.path.abspath(bundle_dir)}/"
+    list_path = f"{bundle_dir}data_filepaths.confidential"
+    driver_options["incremental"] = True
+    cache = None
+    if driver_options.pop("use_cache", True):
+        cache = ParsedFileCache(f"{bundle_dir}cache",
+                                max_bytes=driver_options.get("cache_size", 1024) * 1024**2,
+                                memory_entries=256)
+    debouncer = ChangeDebouncer(debounce_seconds)
+    debouncer.settled = {}  # The first update runs as soon as the files have settled
+    updates = 0
+    backup_day = None
+
+    print(f"Watching the data files{f' and {drop_folder}' if drop_folder else ''}. Press Ctrl+C to stop.")
+    try:
+        while max_updates is None or updates < max_updates:
+            file_paths = get_filepaths(list_path) if os.path.exists(list_path) else []
+            file_paths = [file_path for file_path in file_paths if file_path] + find_workbooks(drop_folder)
+            if debouncer.update(snapshot(file_paths + [list_path])):
+                print(f"\n[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] Changes found, updating the report.")
+                start = time.perf_counter()
+                today = datetime.date.today()
+                try:
+                    driver(bundle_dir=bundle_dir,
+                           data_filepaths=[file_path for file_path in file_paths if os.path.exists(file_path)],
+                           file_cache=cache,
+                           use_cache=cache is not None,
+                           backup_stores=today != backup_day,
+                           **driver_options)
+                except (Exception, SystemExit) as error:  # E.g. a workbook still being written or a locked store
+                    print(f"Update failed, retrying once the files settle again: {error!r}")
+                    debouncer.retry()
+                else:
+                    backup_day = today
+                    print(f"Report updated in {time.perf_counter() - start:.1f} s.")
+                driver_options["clear_cache"] = False  # Only clears the cache before the first update
+                updates += 1
+            if max_updates is None or updates < max_updates:
+                time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")